@@ -1,19 +1,87 @@
-import pygame
-from cell import Cell
-from grid import Grid
-from utils import aborted, Heuristic
-from queue import PriorityQueue, Queue
+from array import array
+from cell import Cell, DOWN, UP, RIGHT, LEFT
+from grid import Grid, FOUR_DIRECTIONS
+from utils import Heuristic
+from collections import deque
+from open_list import HeapOpenList, BucketOpenList
+from scratch import SearchScratch, get_scratch, NO_PARENT
+from jump_table import get_jump_table
+from heuristic_table import get_heuristic_table
+from animation import CancelToken
 
-PATH_ANIMATION_SPEED = 100
 
+class SearchCancelled(Exception):
 
-def reconstruct_path(came_from: dict, current: Cell) -> list[Cell]:
-    
-    """Returns (ready for animation) list of path cells"""
-    
+    """Raised out of a search whose trace's cancel token has been cancelled"""
+
+
+class Trace:
+
+    """Compact record of the exploration done by a search,
+        cells are stored as flat indices next to one byte event codes.
+        With a cancel token the search is aborted at the end of its next step once it's cancelled"""
+
+    OPEN = 1
+    VISIT = 2
+    # passed over without being expanded (jump point search scans)
+    SCAN = 3
+
+    def __init__(self, token: CancelToken = None):
+        self.cells = array("I")
+        self.codes = bytearray()
+        self.steps = array("I")
+        self.token = token
+
+    def open(self, index: int) -> None:
+        self.cells.append(index)
+        self.codes.append(Trace.OPEN)
+
+    def visit(self, index: int) -> None:
+        self.cells.append(index)
+        self.codes.append(Trace.VISIT)
+
+    def visit_many(self, indices) -> None:
+        self.cells.extend(int(index) for index in indices)
+        self.codes.extend(bytes([Trace.VISIT]) * len(indices))
+
+    def scan_many(self, indices) -> None:
+        self.cells.extend(indices)
+        self.codes.extend(bytes([Trace.SCAN]) * len(indices))
+
+    def end_step(self) -> None:
+
+        """Marks the end of one expansion, so the visualizer knows what to draw per frame,
+            raises SearchCancelled if the search has been cancelled"""
+
+        if len(self.steps) == 0 or self.steps[-1] != len(self.codes):
+            self.steps.append(len(self.codes))
+        if self.token is not None and self.token.cancelled:
+            raise SearchCancelled()
+
+    def frames(self):
+
+        """Yields (first event, last event) ranges of every recorded expansion"""
+
+        first = 0
+        for last in self.steps:
+            yield first, last
+            first = last
+        if first != len(self.codes):
+            yield first, len(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def reconstruct_path(scratch: SearchScratch, direction_offsets: tuple, current: int) -> list[int]:
+
+    """Returns (ready for animation) list of path cell indices,
+        walking parent direction codes back from the current cell"""
+
+    parents = scratch.parents
     path = []
-    while current in came_from:
-        current = came_from[current]
+    while parents[current] != NO_PARENT:
+        current -= direction_offsets[parents[current]]
         path.append(current)
 
     # reverse the path list, so animation would be from the start cell
@@ -26,13 +94,14 @@ def reconstruct_path(came_from: dict, current: Cell) -> list[Cell]:
     return path
 
 
-def reconstruct_path_bbfs(came_from: dict, current: Cell) -> list[Cell]:
-    
-    """Returns (ready for animation) list of path cells for bbfs alorithm"""
-    
+def reconstruct_path_bbfs(scratch: SearchScratch, direction_offsets: tuple, current: int) -> list[int]:
+
+    """Returns (ready for animation) list of path cell indices for bbfs alorithm"""
+
+    parents = scratch.parents
     path = [current]
-    while current in came_from:
-        current = came_from[current]
+    while parents[current] != NO_PARENT:
+        current -= direction_offsets[parents[current]]
         path.append(current)
 
     path.pop()
@@ -40,370 +109,535 @@ def reconstruct_path_bbfs(came_from: dict, current: Cell) -> list[Cell]:
     return path
 
 
-def can_redraw(cell: Cell) -> bool:
+def to_cells(grid: Grid, path: list[int]) -> list[Cell]:
 
-    """Checks if cell isn't important and can be redrawn"""
+    """Turns list of flat indices into list of cells"""
 
-    if not cell.is_path() and not cell.is_end() and not cell.is_start() and not cell.is_parcel():
-        return True
-    else:
-        return False
+    return [grid.get_cell_by_index(index) for index in path]
+
+
+def start_search(grid: Grid, start: int, slot: int = 0) -> tuple:
 
+    """Prepares reusable scratch buffers of the grid for a new search from the start cell,
+        returns the buffers and the generation of the search"""
 
-def animate_path(
-    win: pygame.surface.Surface, 
-    path: list[Cell], grid: Grid, 
-    animation: bool
-) -> None:
+    scratch = get_scratch(grid, slot)
+    generation = scratch.new_search()
+    scratch.stamps[start] = generation
+    scratch.costs[start] = 0
+    scratch.real_costs[start] = 0
+    scratch.parents[start] = NO_PARENT
+    return scratch, generation
 
-    """Animates path with specified speed"""
 
-    reset_opened_cells(grid, win, animation)
-    clock = pygame.time.Clock()
-    for cell in path:
-        if aborted():
-            return
-        if not cell.is_end() and not cell.is_start() and not cell.is_parcel():
-            cell.make_path()
-        if animation:
-            cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(PATH_ANIMATION_SPEED)
+# heuristics with integer values, with 4-directional moves priorities then fit in a bucket open list
+INTEGER_HEURISTICS = (Heuristic.manhattan, Heuristic.chebyshev)
 
 
-def reset_opened_cells(grid: Grid, win: pygame.surface.Surface, animation: bool):
-    
-    """Resets open cells that are left after the animation"""
-    
-    for row in grid.raw_grid:
-        for cell in row:
-            if cell.is_open():
-                cell.reset()
-                cell.draw(win, animation)
+def search_costs(grid: Grid, scratch: SearchScratch, heuristic=None) -> tuple:
 
+    """Returns the cost buffer for the search (real costs if diagonal moves are allowed)
+        and the open list type fitting its priorities"""
 
-"""ALGORITHMS: """
+    if grid.movement != FOUR_DIRECTIONS:
+        return scratch.real_costs, HeapOpenList
+    if heuristic is not None and heuristic not in INTEGER_HEURISTICS:
+        return scratch.costs, HeapOpenList
+    return scratch.costs, BucketOpenList
+
+
+# directions (codes of grid.direction_offsets) jump point search scans from a jump point
+# by the direction it was reached in: never back, the start scans all four
+JUMP_DIRECTIONS = {0: (0, 2, 3), 1: (1, 2, 3), 2: (2, 0, 1), 3: (3, 0, 1), NO_PARENT: (0, 1, 2, 3)}
+
+
+"""ALGORITHMS:
+    every algorithm works on the grid model only (flat cell indices and adjacency masks),
+    returns list of path cells (without start and end) or None if there is no path,
+    and optionally records its exploration into a Trace.
+    Per-cell search state lives in generation-stamped scratch buffers of the grid:
+    a cell is reached if it's stamped with the search generation, closed if with generation + 1"""
 
 def astar(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
+    open_list_type: type = None,
+    heuristic=None,
 ) -> list[Cell]:
-    open_set = PriorityQueue()
-    count = 0
-    open_set.put((0, count, start))
-    came_from = {}
-    g_score = {cell: float("inf") for row in grid.raw_grid for cell in row}
-    g_score[start] = 0
-    f_score = {cell: float("inf") for row in grid.raw_grid for cell in row}
-    f_score[start] = Heuristic.manhattan(start.get_pos(), end.get_pos())
-
-    open_set_hash = {start}
-    clock = pygame.time.Clock()
-
-    while not open_set.empty():
-        cells_to_redraw = []
-        if aborted():
-            return
-
-        current = open_set.get()[2]
-        open_set_hash.remove(current)
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    terrain, move_costs = grid.flat_terrain, grid.move_costs
+    start, end = start.index, end.index
+    heuristic = heuristic or grid.default_heuristic()
 
-        if current == end:
-            path = reconstruct_path(came_from, current)
-            return path
+    # every step costs at least the lowest weight on the grid, so the scaled heuristic stays admissible
+    h_score = get_heuristic_table(grid, end, heuristic, grid.min_weight())
 
-        for neighbor in current.neighbors:
-            temp_g_score = g_score[current] + 1
+    scratch, generation = start_search(grid, start)
+    g_score, default_open_list_type = search_costs(grid, scratch, heuristic)
+    stamps, parents = scratch.stamps, scratch.parents
 
-            if temp_g_score < g_score[neighbor]:
-                came_from[neighbor] = current
-                g_score[neighbor] = temp_g_score
-                f_score[neighbor] = temp_g_score + Heuristic.manhattan(
-                    neighbor.get_pos(), end.get_pos()
-                )
+    open_set = (open_list_type or default_open_list_type)()
+    open_set.push(start, h_score[start])
 
-                if neighbor not in open_set_hash:
-                    count += 1
-                    open_set.put((f_score[neighbor], count, neighbor))
-                    open_set_hash.add(neighbor)
-                    if neighbor != end and can_redraw(neighbor):
-                        neighbor.make_open()
-                        cells_to_redraw.append(neighbor)
+    while open_set:
+        current = open_set.pop()
 
-        if current != start and can_redraw(current):
-            current.visit()
-            cells_to_redraw.append(current)
+        if current == end:
+            path = reconstruct_path(scratch, grid.direction_offsets, current)
+            return to_cells(grid, path)
 
-        if animation:
-            for cell in cells_to_redraw:
-                cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
+        current_g_score = g_score[current]
+        for offset, direction in neighbor_steps[adjacency[current]]:
+            neighbor = current + offset
+            temp_g_score = current_g_score + move_costs[direction][terrain[neighbor]]
 
+            if stamps[neighbor] < generation or temp_g_score < g_score[neighbor]:
+                stamps[neighbor] = generation
+                parents[neighbor] = direction
+                g_score[neighbor] = temp_g_score
+                f_score = temp_g_score + h_score[neighbor]
 
+                # improved cells that are already open just get lower priority (decrease-key)
+                if trace is not None and neighbor not in open_set and neighbor != end:
+                    trace.open(neighbor)
+                open_set.push(neighbor, f_score)
+
+        if trace is not None:
+            if current != start:
+                trace.visit(current)
+            trace.end_step()
 
 
 def dijkstra(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
+    open_list_type: type = None,
 ) -> list[Cell]:
-    
-    open_set = PriorityQueue()
-    count = 0
-    open_set.put((0, count, start))
-    open_set_hash = {start}
-    distance = {cell: float("inf") for row in grid.raw_grid for cell in row}
-    distance[start] = 0
-    came_from = {}
-    clock = pygame.time.Clock()
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    terrain, move_costs = grid.flat_terrain, grid.move_costs
+    start, end = start.index, end.index
 
-    while not open_set.empty():
-        cells_to_redraw = []
+    scratch, generation = start_search(grid, start)
+    distance, default_open_list_type = search_costs(grid, scratch)
+    stamps, parents = scratch.stamps, scratch.parents
 
-        if aborted():
-            return
+    open_set = (open_list_type or default_open_list_type)()
+    open_set.push(start, 0)
 
-        current: Cell = open_set.get()[2]
-        open_set_hash.remove(current)
+    while open_set:
+        current = open_set.pop()
 
         if current == end:
-            path = reconstruct_path(came_from, current)
-            return path
-
-        for neighbor in current.neighbors:
-            alt_distance = distance[current] + 1
-            if alt_distance < distance[neighbor]:
+            path = reconstruct_path(scratch, grid.direction_offsets, current)
+            return to_cells(grid, path)
+
+        current_distance = distance[current]
+        for offset, direction in neighbor_steps[adjacency[current]]:
+            neighbor = current + offset
+            alt_distance = current_distance + move_costs[direction][terrain[neighbor]]
+            if stamps[neighbor] < generation or alt_distance < distance[neighbor]:
+                stamps[neighbor] = generation
                 distance[neighbor] = alt_distance
-                came_from[neighbor] = current
-                if neighbor not in open_set_hash:
-                    count += 1
-                    open_set.put((alt_distance, count, neighbor))
-                    open_set_hash.add(neighbor)
-                    if neighbor != end and can_redraw(neighbor):
-                        neighbor.make_open() 
-                        cells_to_redraw.append(neighbor)
-
-        if current != start and can_redraw(current):
-            current.visit()
-            cells_to_redraw.append(current)
-
-        if animation:
-            for cell in cells_to_redraw:
-                cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
+                parents[neighbor] = direction
+                if trace is not None and neighbor not in open_set and neighbor != end:
+                    trace.open(neighbor)
+                open_set.push(neighbor, alt_distance)
+
+        if trace is not None:
+            if current != start:
+                trace.visit(current)
+            trace.end_step()
 
 
 def dfs(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
 ) -> list[Cell]:
-    marked = {cell: False for row in grid.raw_grid for cell in row}
-    stack = [start]
-    came_from = {}
-    clock = pygame.time.Clock()
-    while len(stack) > 0:
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    start, end = start.index, end.index
 
-        if aborted():
-            return
+    scratch, generation = start_search(grid, start)
+    stamps, parents = scratch.stamps, scratch.parents
+    marked = generation + 1
 
+    stack = [start]
+    while len(stack) > 0:
         current = stack.pop()
 
         if current == end:
-            path = reconstruct_path(came_from, current)
-            return path
-
-        if not marked[current]:
-            marked[current] = True
-            for neighbor in current.neighbors:
-                if not marked[neighbor]:
+            path = reconstruct_path(scratch, grid.direction_offsets, current)
+            return to_cells(grid, path)
+
+        if stamps[current] != marked:
+            stamps[current] = marked
+            for offset, direction in neighbor_steps[adjacency[current]]:
+                neighbor = current + offset
+                if stamps[neighbor] != marked:
+                    stamps[neighbor] = generation
                     stack.append(neighbor)
-                    came_from[neighbor] = current
-                    if current != start and not current.is_visited() and animation and can_redraw(current):
-                        current.make_open()
-                        current.draw(win, animation)
-                        pygame.display.update()
-
-        if current != start and not current.is_visited() and animation and can_redraw(current):
-            current.visit()
-            current.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
+                    parents[neighbor] = direction
 
-        if current != start and can_redraw(current):
-            current.visit()
+            if trace is not None and current != start:
+                trace.visit(current)
+                trace.end_step()
 
 
 def bfs(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
 ) -> list[Cell]:
-    queue = Queue()
-    explored = {start}
-    queue.put(start)
-    came_from = {}
-    clock = pygame.time.Clock()
-    while not queue.empty():
-        cells_to_redraw = []
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    start, end = start.index, end.index
 
-        if aborted():
-            return
+    scratch, generation = start_search(grid, start)
+    explored, parents = scratch.stamps, scratch.parents
 
-        current = queue.get()
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
 
         if current == end:
-            path = reconstruct_path(came_from, current)
-            return path
-
-        for neighbor in current.neighbors:
-            if neighbor not in explored:
-                explored.add(neighbor)
-                queue.put(neighbor)
-                came_from[neighbor] = current
-                if neighbor != end and can_redraw(neighbor):
-                    neighbor.make_open()
-                    cells_to_redraw.append(neighbor)
+            path = reconstruct_path(scratch, grid.direction_offsets, current)
+            return to_cells(grid, path)
 
-        if current != start and can_redraw(current):
-            current.visit()
-            cells_to_redraw.append(current)
+        for offset, direction in neighbor_steps[adjacency[current]]:
+            neighbor = current + offset
+            if explored[neighbor] != generation:
+                explored[neighbor] = generation
+                queue.append(neighbor)
+                parents[neighbor] = direction
+                if trace is not None and neighbor != end:
+                    trace.open(neighbor)
 
-        if animation:
-            for cell in cells_to_redraw:
-                cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
+        if trace is not None:
+            if current != start:
+                trace.visit(current)
+            trace.end_step()
 
 
 def bidirectional_bfs(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
+) -> list[Cell]:
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    start, end = start.index, end.index
+
+    forward, forward_generation = start_search(grid, start, slot=0)
+    backwards, backwards_generation = start_search(grid, end, slot=1)
+    explored_forward, came_from_forward = forward.stamps, forward.parents
+    explored_backwards, came_from_backwards = backwards.stamps, backwards.parents
+
+    Qf = deque([start])
+    Qb = deque([end])
+
+    while Qf and Qb:
+        u = Qf.popleft()
+        v = Qb.popleft()
+
+        if explored_backwards[u] == backwards_generation:
+            path = (
+                reconstruct_path(forward, grid.direction_offsets, u)
+                + reconstruct_path_bbfs(backwards, grid.direction_offsets, u)
+            )
+            return to_cells(grid, path)
+
+        for offset, direction in neighbor_steps[adjacency[u]]:
+            neighbor = u + offset
+            if explored_forward[neighbor] != forward_generation:
+                explored_forward[neighbor] = forward_generation
+                Qf.append(neighbor)
+                came_from_forward[neighbor] = direction
+                if trace is not None and neighbor != end and neighbor != start:
+                    trace.open(neighbor)
+
+        for offset, direction in neighbor_steps[adjacency[v]]:
+            neighbor = v + offset
+            if explored_backwards[neighbor] != backwards_generation:
+                explored_backwards[neighbor] = backwards_generation
+                Qb.append(neighbor)
+                came_from_backwards[neighbor] = direction
+                if trace is not None and neighbor != end and neighbor != start:
+                    trace.open(neighbor)
+
+        if trace is not None:
+            if u != start and u != end:
+                trace.visit(u)
+            if v != end and v != start:
+                trace.visit(v)
+            trace.end_step()
+
+
+def bidirectional_search(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+    heuristic=None,
+) -> list[Cell]:
+
+    """Dijkstra (A* if heuristic is given) from both ends at once, the side with the smaller
+        open list is expanded, so neither search front grows much wider than the other. Every edge
+        between the two searches gives a path candidate, the best one is the answer once the lowest
+        keys of both sides together reach its cost. A* uses the average of both heuristics as potentials
+        (forward plus, backward minus), which keeps both searches consistent, so the test holds with
+        a consistent heuristic (the potentials of the two ends cancel out in it). Halved potentials guide
+        each side less than A*'s heuristic, mazes with long detours can take more expansions than A*"""
+
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    terrain, move_costs = grid.flat_terrain, grid.move_costs
+    start, end = start.index, end.index
+
+    forward, forward_generation = start_search(grid, start, slot=0)
+    backwards, backwards_generation = start_search(grid, end, slot=1)
+
+    forward_costs, open_list_type = search_costs(grid, forward, heuristic)
+    backwards_costs = search_costs(grid, backwards, heuristic)[0]
+    if heuristic is None:
+        to_end = to_start = None
+    else:
+        # keys are doubled, so the potentials (to_end - to_start) / 2 stay integer if heuristics are,
+        # keys start at the heuristic between the ends and never go down, fine for a bucket open list
+        to_end = get_heuristic_table(grid, end, heuristic, grid.min_weight())
+        to_start = get_heuristic_table(grid, start, heuristic, grid.min_weight())
+
+    forward_open, backwards_open = open_list_type(), open_list_type()
+    forward_open.push(start, 0 if to_end is None else to_end[start])
+    backwards_open.push(end, 0 if to_end is None else to_start[end])
+
+    # (scratch, generation, costs, open list, potential sign, other side's stamps, generation and costs)
+    sides = (
+        (forward, forward_generation, forward_costs, forward_open, 1, backwards.stamps, backwards_generation, backwards_costs),
+        (backwards, backwards_generation, backwards_costs, backwards_open, -1, forward.stamps, forward_generation, forward_costs),
+    )
+    scale = 1 if heuristic is None else 2
+    best_cost, meeting = float("inf"), None
+    # lowest keys of both sides, only the expanded side's one changes
+    keys = [forward_open.peek()[0], backwards_open.peek()[0]]
+
+    while keys[0] + keys[1] < scale * best_cost:
+        backward = len(backwards_open) < len(forward_open)
+        scratch, generation, g_score, open_set, sign, other_stamps, other_generation, other_g_score = sides[backward]
+        stamps, parents = scratch.stamps, scratch.parents
+        closed = generation + 1
+
+        current = open_set.pop()
+        stamps[current] = closed
+        current_g_score = g_score[current]
+        current_terrain = terrain[current]
+
+        for offset, direction in neighbor_steps[adjacency[current]]:
+            neighbor = current + offset
+            # forward search pays for entering the neighbor, backward one for leaving it (entering current)
+            temp_g_score = current_g_score + move_costs[direction][current_terrain if backward else terrain[neighbor]]
+
+            if other_stamps[neighbor] >= other_generation and temp_g_score + other_g_score[neighbor] < best_cost:
+                # parents of the neighbor on both sides lead to paths at most this expensive
+                best_cost = temp_g_score + other_g_score[neighbor]
+                meeting = neighbor
+
+            stamp = stamps[neighbor]
+            if stamp < generation or stamp != closed and temp_g_score < g_score[neighbor]:
+                stamps[neighbor] = generation
+                parents[neighbor] = direction
+                g_score[neighbor] = temp_g_score
+                if trace is not None and neighbor not in open_set and neighbor != end and neighbor != start:
+                    trace.open(neighbor)
+                if to_end is None:
+                    open_set.push(neighbor, temp_g_score)
+                else:
+                    open_set.push(neighbor, 2 * temp_g_score + sign * (to_end[neighbor] - to_start[neighbor]))
+
+        if trace is not None:
+            if current != start and current != end:
+                trace.visit(current)
+            trace.end_step()
+
+        # one side ran out of cells, every path has been seen
+        if not open_set:
+            break
+        keys[backward] = open_set.peek()[0]
+
+    if meeting is None:
+        return None
+
+    path = (
+        reconstruct_path(forward, grid.direction_offsets, meeting)
+        + reconstruct_path_bbfs(backwards, grid.direction_offsets, meeting)
+    )
+    return to_cells(grid, path)
+
+
+def bidirectional_dijkstra(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+) -> list[Cell]:
+    return bidirectional_search(grid, start, end, trace)
+
+
+def bidirectional_astar(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+    heuristic=None,
 ) -> list[Cell]:
-    Qf = Queue()
-    Qb = Queue()
-    explored_forward = {start}
-    explored_backwards = {end}
-    Qf.put(start)
-    Qb.put(end)
-    came_from_forward = {}
-    came_from_backwards = {}
-    clock = pygame.time.Clock()
-
-    while not Qf.empty() and not Qb.empty():
-
-        cells_to_redraw = []
-        if aborted():
-            return
-
-        u = Qf.get()
-        v = Qb.get()
-
-        if u in explored_backwards:
-            path = reconstruct_path(came_from_forward, u) + reconstruct_path_bbfs(came_from_backwards, u)
-            return path
-
-        for neighbor in u.neighbors:
-            if neighbor not in explored_forward:
-                explored_forward.add(neighbor)
-                Qf.put(neighbor)
-                came_from_forward[neighbor] = u
-                if neighbor != end and neighbor != start and can_redraw(neighbor):
-                    neighbor.make_open()
-                    cells_to_redraw.append(neighbor)
-
-        for neighbor in v.neighbors:
-            if neighbor not in explored_backwards:
-                explored_backwards.add(neighbor)
-                Qb.put(neighbor)
-                came_from_backwards[neighbor] = v
-                if neighbor != end and neighbor != start and can_redraw(neighbor):
-                    neighbor.make_open()
-                    cells_to_redraw.append(neighbor)
-
-        if u != start and u != end and can_redraw(u):
-            u.visit()
-            cells_to_redraw.append(u)
-
-        if v != end and v != start and can_redraw(v):
-            v.visit()
-            cells_to_redraw.append(v)
-
-        if animation:
-            for cell in cells_to_redraw:
-                cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
+    return bidirectional_search(grid, start, end, trace, heuristic or grid.default_heuristic())
 
 
 def gbfs(
-    win: pygame.surface.Surface,
     grid: Grid,
     start: Cell,
     end: Cell,
-    animation: bool,
-    speed: int = 0,
+    trace: Trace = None,
+    open_list_type: type = HeapOpenList,
+    heuristic=None,
 )-> list[Cell]:
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    start, end = start.index, end.index
+    h_score = get_heuristic_table(grid, end, heuristic or grid.default_heuristic())
+
+    scratch, generation = start_search(grid, start)
+    visited, parents = scratch.stamps, scratch.parents
+
+    queue = open_list_type()
+    queue.push(start, h_score[start])
+    while queue:
+        current_cell = queue.pop()
+
+        if trace is not None and current_cell != start:
+            trace.visit(current_cell)
 
-    queue = PriorityQueue()
-    visited = {start}
-    came_from = {}
-    count = 0
-    queue.put((Heuristic.manhattan(start.get_pos(), end.get_pos()), count, start))
-    clock = pygame.time.Clock()
-    while not queue.empty():
-        cells_to_redraw = []
-
-        if aborted():
-            return
-
-        current_cell = queue.get()[2]
-
-        if current_cell != start and can_redraw(current_cell):
-            current_cell.visit()
-            cells_to_redraw.append(current_cell)
-
-        for neighbor in current_cell.neighbors:
-            if neighbor not in visited:
-                count += 1
-                if neighbor.is_end() or neighbor.is_parcel():
-                    path = [current_cell]
-                    while current_cell in came_from:
-                        current_cell = came_from[current_cell]
-                        path.append(current_cell)
-                    path.reverse()
-                    path.pop(0)
-                    return path
+        for offset, direction in neighbor_steps[adjacency[current_cell]]:
+            neighbor = current_cell + offset
+            if visited[neighbor] != generation:
+                if neighbor == end:
+                    parents[neighbor] = direction
+                    path = reconstruct_path(scratch, grid.direction_offsets, neighbor)
+                    return to_cells(grid, path)
 
                 else:
-                    came_from[neighbor] = current_cell
-                    visited.add(neighbor)
-                    queue.put((Heuristic.manhattan(neighbor.get_pos(), end.get_pos()), count, neighbor))
-                    if neighbor != start and can_redraw(neighbor):
-                        neighbor.make_open()
-                        cells_to_redraw.append(neighbor)
-
-        if animation:
-            for cell in cells_to_redraw:
-                cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
\ No newline at end of file
+                    parents[neighbor] = direction
+                    visited[neighbor] = generation
+                    queue.push(neighbor, h_score[neighbor])
+                    if trace is not None and neighbor != start:
+                        trace.open(neighbor)
+
+        if trace is not None:
+            trace.end_step()
+
+
+def jump_point_search(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+    open_list_type: type = BucketOpenList,
+) -> list[Cell]:
+
+    """A* over jump points of a 4-connected uniform cost grid: straight runs of cells are scanned
+        without being expanded until a cell with a forced neighbor (open beside it, blocked beside
+        the cell before it) or the end is found, vertical scans also stop where a horizontal scan
+        would find one. Scans are looked up in the grid's cached jump table. Terrain weights break
+        the symmetry it relies on, so weighted grids (and diagonal movement) are searched by plain A*"""
+
+    if grid.is_weighted() or grid.movement != FOUR_DIRECTIONS:
+        return astar(grid, start, end, trace)
+
+    columns = grid.total_columns
+    direction_offsets = grid.direction_offsets
+    start, (end_row, end_col), end = start.index, end.get_pos(), end.index
+
+    table = get_jump_table(grid)
+    jumps, adjacency = table.jumps, grid.adjacency
+    h_score = get_heuristic_table(grid, end)
+
+    scratch, generation = start_search(grid, start)
+    stamps, g_score, parents = scratch.stamps, scratch.costs, scratch.parents
+    jump_parents = {}
+
+    def jump(current: int, direction: int) -> tuple:
+
+        """Scans from the current cell in the direction, returns the jump point (or None) and the last scanned cell"""
+
+        offset = direction_offsets[direction]
+        distance = jumps[direction][current]
+        found = distance >= 0
+        if not found:
+            distance = -1 - distance
+
+        # the end stops the scan too, on its way or (vertical scans) through a horizontal scan from its row
+        row, col = divmod(current, columns)
+        if direction > 1:
+            if row == end_row and 0 <= (end_col - col) * offset <= distance:
+                return end, end
+        else:
+            steps = (end_row - row) * (offset // columns)
+            if 0 <= steps <= distance:
+                crossing = current + steps * offset
+                if (
+                    crossing == end
+                    or end > crossing and not adjacency[crossing] & RIGHT and end - crossing <= table.scan_length(crossing + 1, 2) + 1
+                    or end < crossing and not adjacency[crossing] & LEFT and crossing - end <= table.scan_length(crossing - 1, 3) + 1
+                ):
+                    return crossing, crossing
+
+        last = current + distance * offset
+        return (last if found else None), last
+
+    open_set = open_list_type()
+    open_set.push(start, h_score[start])
+
+    while open_set:
+        current = open_set.pop()
+
+        if current == end:
+            # fill in straight runs between jump points, without the start and the end
+            path = []
+            while current != start:
+                parent = jump_parents[current]
+                path.extend(range(current, parent, -direction_offsets[parents[current]]))
+                current = parent
+            path.reverse()
+            path.pop()
+            return to_cells(grid, path)
+
+        mask = adjacency[current]
+        for direction in JUMP_DIRECTIONS[parents[current]]:
+            if mask & (DOWN, UP, RIGHT, LEFT)[direction]:
+                continue
+
+            offset = direction_offsets[direction]
+            jump_point, last = jump(current + offset, direction)
+            if trace is not None:
+                trace.scan_many(table.scanned_cells(current + offset, direction, last))
+            if jump_point is None:
+                continue
+
+            temp_g_score = g_score[current] + (jump_point - current) // offset
+            if stamps[jump_point] < generation or temp_g_score < g_score[jump_point]:
+                stamps[jump_point] = generation
+                parents[jump_point] = direction
+                g_score[jump_point] = temp_g_score
+                jump_parents[jump_point] = current
+                f_score = temp_g_score + h_score[jump_point]
+
+                if trace is not None and jump_point not in open_set and jump_point != end:
+                    trace.open(jump_point)
+                open_set.push(jump_point, f_score)
+
+        if trace is not None:
+            if current != start:
+                trace.visit(current)
+            trace.end_step()
@@ -0,0 +1,85 @@
+from queue import Queue, Empty
+
+ANIMATION_FPS = 60
+
+
+class CancelToken:
+
+    """Cooperative cancellation of a job running in a worker thread: the UI thread cancels,
+        the job checks the flag between its steps, which is much cheaper than polling events"""
+
+    def __init__(self):
+        self.cancelled = False
+
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class Animator:
+
+    """Runs animation steps of a job in a worker thread at the given number of steps per second:
+        as many steps as fit into one frame are batched, then the frame is handed to the UI thread
+        through a queue and the worker waits until it's drawn (so the grid never changes while it's
+        drawn), the UI thread holds the frame rate. Aborting goes through the cancel token,
+        the worker never touches the event queue"""
+
+    def __init__(self, speed: int, fps: int = ANIMATION_FPS, token: CancelToken = None):
+        self.fps = fps
+        self.token = token or CancelToken()
+        self.set_speed(speed)
+        self.pending_steps = 0
+
+        # frame rates of frames waiting to be drawn (worker to UI thread) and confirmations of drawn ones back
+        self.frame_requests = Queue(maxsize=1)
+        self.drawn_frames = Queue(maxsize=1)
+
+
+    def set_speed(self, speed: int) -> None:
+
+        """Changes the speed, the UI thread may do it while the job runs"""
+
+        self.speed = max(1, speed)
+        self.steps_per_frame = max(1, round(self.speed / self.fps))
+
+
+    def step(self) -> bool:
+
+        """Counts one animation step and hands over a frame once frame's steps are used up,
+            returns False if the animation has been aborted"""
+
+        self.pending_steps += 1
+        if self.pending_steps >= self.steps_per_frame:
+            return self.frame()
+        return True
+
+
+    def frame(self) -> bool:
+
+        """Waits until everything changed since the last frame is drawn by the UI thread,
+            returns False if the animation has been aborted"""
+
+        self.pending_steps = 0
+        if self.token.cancelled:
+            return False
+        self.frame_requests.put(min(self.speed, self.fps))
+        self.drawn_frames.get()
+        return not self.token.cancelled
+
+
+    def next_frame(self, timeout: float) -> int:
+
+        """(UI thread) Returns frame rate of the frame the worker waits to have drawn,
+            None if it doesn't ask for one within the timeout"""
+
+        try:
+            return self.frame_requests.get(timeout=timeout)
+        except Empty:
+            return None
+
+
+    def frame_drawn(self) -> None:
+
+        """(UI thread) Lets the worker continue after its frame has been drawn"""
+
+        self.drawn_frames.put(True)
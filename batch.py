@@ -0,0 +1,158 @@
+import os
+import time
+import signal
+import numpy as np
+from multiprocessing import Pool, shared_memory
+from cell import WALL
+from grid import Grid
+from algo import Trace, astar
+
+# tasks handed to every worker process, more than one so workers finishing early pick up the rest
+CHUNKS_PER_PROCESS = 4
+
+# grid of the worker process, attached to the snapshot once by the pool initializer
+_worker = {}
+
+
+class QueryResult:
+
+    """Answer to one (start, end) query: flat indices of the whole path (start and end included,
+        None if there is none), its cost, search time and, if asked for, number of expanded cells"""
+
+    __slots__ = ("path", "cost", "seconds", "expanded")
+
+    def __init__(self, path: list[int], cost: float, seconds: float, expanded: int = None):
+        self.path = path
+        self.cost = cost
+        self.seconds = seconds
+        self.expanded = expanded
+
+    def __repr__(self):
+        length = None if self.path is None else len(self.path)
+        return f"QueryResult(length={length}, cost={self.cost}, seconds={self.seconds:.6f}, expanded={self.expanded})"
+
+
+class GridSnapshot:
+
+    """Read-only copy of the grid's cell states, adjacency masks and terrain in one shared memory block,
+        worker processes map it instead of getting a copy of the map each. Only non-zero parts
+        of the map are written into it, so open parts of huge maps stay unallocated like in the grid"""
+
+    def __init__(self, grid: Grid):
+        size = grid.total_rows * grid.total_columns
+        self.memory = shared_memory.SharedMemory(create=True, size=3 * size)
+        layers = np.ndarray((3,) + grid.grid_size, dtype=np.uint8, buffer=self.memory.buf)
+        for first, last in grid.row_bands():
+            for layer, source in zip(layers, (grid.states, grid.adjacency_array, grid.terrain)):
+                band = source[first:last]
+                np.copyto(layer[first:last], band, where=band != 0)
+        del layers
+
+        # everything a worker needs to put the grid back together, small enough to pickle
+        self.layout = (self.memory.name, grid.grid_size, grid.movement, tuple(grid.terrain_counts))
+
+
+    def close(self) -> None:
+        self.memory.close()
+        self.memory.unlink()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach_grid(layout: tuple) -> tuple:
+
+    """Returns headless grid reading the snapshot's shared memory (writes into it raise TypeError)
+        and the attached memory block, which has to be kept open as long as the grid is used"""
+
+    name, grid_size, movement, terrain_counts = layout
+    memory = shared_memory.SharedMemory(name=name)
+
+    rows, columns = grid_size
+    size = rows * columns
+    grid = Grid(None, grid_size, (columns, rows), (0, 0))
+    grid.set_movement(movement)
+
+    view = memory.buf.toreadonly()
+    grid.flat_states, grid.adjacency, grid.flat_terrain = view[:size], view[size:2 * size], view[2 * size:3 * size]
+    grid.states = np.frombuffer(grid.flat_states, dtype=np.uint8).reshape(grid_size)
+    grid.adjacency_array = np.frombuffer(grid.adjacency, dtype=np.uint8).reshape(grid_size)
+    grid.terrain = np.frombuffer(grid.flat_terrain, dtype=np.uint8).reshape(grid_size)
+    grid.terrain_counts = list(terrain_counts)
+    return grid, memory
+
+
+def path_cost(grid: Grid, path: list[int]) -> float:
+
+    """Returns cost of the path (flat indices, start included), the terrain of every entered cell is paid"""
+
+    columns, terrain, move_costs = grid.total_columns, grid.flat_terrain, grid.move_costs
+    cost = 0
+    for a, b in zip(path, path[1:]):
+        diagonal = a % columns != b % columns and a // columns != b // columns
+        cost += move_costs[4 if diagonal else 0][terrain[b]]
+    return cost
+
+
+def run_query(grid: Grid, algorithm, start: int, end: int, count_expanded: bool = False) -> QueryResult:
+
+    """Runs the algorithm for one query and returns the whole path with its stats"""
+
+    # algorithms expect two different cells, the app never puts the start and the end on one
+    if start == end:
+        return QueryResult(None if grid.flat_states[start] == WALL else [start], 0, 0.0, 0 if count_expanded else None)
+
+    trace = Trace() if count_expanded else None
+    started = time.perf_counter()
+    path = algorithm(grid, grid.get_cell_by_index(start), grid.get_cell_by_index(end), trace)
+    seconds = time.perf_counter() - started
+    expanded = trace.codes.count(Trace.VISIT) if count_expanded else None
+
+    if path is None:
+        return QueryResult(None, None, seconds, expanded)
+    # algorithms return path cells between the start and the end (ready for animation)
+    path = [start] + [cell.index for cell in path] + [end]
+    return QueryResult(path, path_cost(grid, path), seconds, expanded)
+
+
+def init_worker(layout: tuple, algorithm, count_expanded: bool) -> None:
+    # workers forked from the app inherit the SDL handler turning SIGTERM into a quit event,
+    # they wouldn't stop when the pool is terminated
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker["grid"], _worker["memory"] = attach_grid(layout)
+    _worker["algorithm"] = algorithm
+    _worker["count_expanded"] = count_expanded
+
+
+def run_worker_query(query: tuple) -> QueryResult:
+    start, end = query
+    return run_query(_worker["grid"], _worker["algorithm"], start, end, _worker["count_expanded"])
+
+
+def find_paths(
+    grid: Grid,
+    queries: list[tuple],
+    algorithm=astar,
+    processes: int = None,
+    count_expanded: bool = False,
+) -> list[QueryResult]:
+
+    """Answers (start, end) queries (flat cell indices) on the grid, results come in the order of queries.
+        Queries are spread over a pool of processes (one per core by default) sharing a snapshot of
+        the grid, the algorithm has to be picklable (module level function or functools.partial of one).
+        With a single process they run right here on the grid, without the snapshot"""
+
+    queries = list(queries)
+    processes = min(processes or os.cpu_count() or 1, len(queries))
+    if processes <= 1:
+        return [run_query(grid, algorithm, start, end, count_expanded) for start, end in queries]
+
+    chunk_size = max(1, len(queries) // (processes * CHUNKS_PER_PROCESS))
+    with GridSnapshot(grid) as snapshot:
+        with Pool(processes, init_worker, (snapshot.layout, algorithm, count_expanded)) as pool:
+            return pool.map(run_worker_query, queries, chunk_size)
@@ -0,0 +1,289 @@
+"""Headless benchmark of every pathfinding algorithm on every maze across grid sizes.
+
+Usage:
+    python benchmark.py [--sizes 34x64,136x256 | --large] [--repeats 3] [--output results.json]
+                        [--baseline benchmark_baseline.json] [--save-baseline]
+
+Results are printed (or written) as JSON, with --baseline every case is compared
+to the stored one and the exit code is 1 if anything has regressed."""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tracemalloc
+import numpy as np
+
+# the app module creates its window on import, benchmark never shows it
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = ((34, 64), (136, 256), (544, 1024))
+# pure Python maze generation alone takes minutes on these
+LARGE_SIZES = ((2176, 4096),)
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmark_baseline.json")
+SEED = 7
+REPEATS = 3
+# allowed slowdown against the baseline before a case counts as regressed, relative to how much
+# faster or slower the whole run is (another machine shifts every case by about the same ratio)
+TIME_TOLERANCE = 0.25
+# cases faster than this (in the baseline or now) are too noisy to compare times
+MIN_COMPARED_TIME = 0.01
+
+
+def parse_sizes(text: str) -> list[tuple]:
+
+    """Parses comma separated ROWSxCOLUMNS sizes"""
+
+    sizes = []
+    for size in text.split(","):
+        rows, columns = size.lower().split("x")
+        sizes.append((int(rows), int(columns)))
+    return sizes
+
+
+def build_grid(rows: int, columns: int, states: bytes = None):
+
+    """Returns headless grid (one pixel per cell), optionally filled with given cell states"""
+
+    from grid import Grid
+
+    grid = Grid(None, (rows, columns), (columns, rows), (0, 0))
+    if states is not None:
+        grid.flat_states[:] = states
+        grid.update_neighbors_for_every_cell()
+    return grid
+
+
+def default_endpoints(grid) -> tuple:
+
+    """Returns flat indices of the cells in the left and right quarter of the middle row"""
+
+    row = grid.total_rows // 2
+    return row * grid.total_columns + grid.total_columns // 4, row * grid.total_columns + grid.total_columns * 3 // 4
+
+
+def endpoints(grid) -> tuple:
+
+    """Returns start and end cells of a generated maze"""
+
+    from cell import START, END
+
+    states = grid.states.reshape(-1)
+    start, end = np.flatnonzero(states == START)[0], np.flatnonzero(states == END)[0]
+    return grid.get_cell_by_index(int(start)), grid.get_cell_by_index(int(end))
+
+
+def place_endpoints(grid) -> None:
+
+    """Puts the start on the open cell nearest to its default place and the end on the nearest one
+        reachable from the start, mazes may have built walls over them or cut them apart"""
+
+    from cell import START, END, WALL, UNVISITED
+    from components import ComponentIndex
+
+    states = grid.states.reshape(-1)
+    states[np.isin(states, (START, END))] = UNVISITED
+    grid.update_neighbors_for_every_cell()
+
+    rows, columns = np.divmod(np.arange(len(states)), grid.total_columns)
+    def nearest(index: int, candidates: np.ndarray) -> int:
+        row, column = divmod(index, grid.total_columns)
+        distances = np.where(candidates, abs(rows - row) + abs(columns - column), len(states))
+        return int(distances.argmin())
+
+    default_start, default_end = default_endpoints(grid)
+    start = nearest(default_start, states != WALL)
+    labels = ComponentIndex(grid).labels_of_rows(0, grid.total_rows).ravel()
+    reachable = (labels == labels[start]) & (np.arange(len(states)) != start)
+    if not reachable.any():
+        raise ValueError("maze has no cell reachable from the start")
+    end = nearest(default_end, reachable)
+
+    states[start], states[end] = START, END
+    grid.update_neighbors_for_every_cell()
+
+
+def generate_maze(maze_gen, rows: int, columns: int) -> bytes:
+
+    """Generates the maze with a fixed seed and returns cell states of the grid,
+        with the start and end placed afterwards"""
+
+    grid = build_grid(rows, columns)
+    start, end = default_endpoints(grid)
+    grid.get_cell_by_index(start).make_start()
+    grid.get_cell_by_index(end).make_end()
+    random.seed(SEED)
+    maze_gen(grid)
+    place_endpoints(grid)
+    return bytes(grid.flat_states)
+
+
+def peak_open_size(trace) -> int:
+
+    """Returns the largest number of cells opened but not yet visited during the search,
+        None if the algorithm doesn't record opened cells"""
+
+    from algo import Trace
+
+    if Trace.OPEN not in trace.codes:
+        return None
+
+    size = peak = 0
+    for code in trace.codes:
+        if code == Trace.OPEN:
+            size += 1
+            peak = max(peak, size)
+        elif code == Trace.VISIT:
+            size -= 1
+    return peak
+
+
+def run_case(algorithm, states: bytes, rows: int, columns: int, repeats: int) -> dict:
+
+    """Measures one algorithm on one maze, every run gets a fresh grid so cached search state doesn't help"""
+
+    from algo import Trace
+
+    def fresh_search(trace=None):
+        grid = build_grid(rows, columns, states)
+        start, end = endpoints(grid)
+        return grid, lambda: algorithm(grid, start, end, trace)
+
+    trace = Trace()
+    _, search = fresh_search(trace)
+    path = search()
+
+    _, search = fresh_search()
+    tracemalloc.start()
+    search()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeats):
+        _, search = fresh_search()
+        started = time.perf_counter()
+        search()
+        times.append(time.perf_counter() - started)
+
+    return {
+        "time": min(times),
+        "expanded": trace.codes.count(Trace.VISIT),
+        "peak_open": peak_open_size(trace),
+        "path_length": None if path is None else len(path),
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmark(sizes: list[tuple], repeats: int, log=sys.stderr) -> dict:
+
+    """Runs every algorithm on every maze for every grid size"""
+
+    import main
+
+    cases = []
+    for rows, columns in sizes:
+        for maze_name, maze_gen in main.MAZE_FUNCTIONS.items():
+            states = generate_maze(maze_gen, rows, columns)
+            for algorithm_name, algorithm in main.ALGORITHM_FUNCTIONS.items():
+                result = run_case(algorithm, states, rows, columns, repeats)
+                case = {"algorithm": str(algorithm_name), "maze": str(maze_name), "rows": rows, "columns": columns}
+                case.update(result)
+                cases.append(case)
+                print(
+                    f"{rows}x{columns} {maze_name} / {algorithm_name}: {result['time']:.4f}s, "
+                    f"{result['expanded']} expanded, path {result['path_length']}",
+                    file=log,
+                )
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": SEED,
+        "cases": cases,
+    }
+
+
+def case_key(case: dict) -> tuple:
+    return case["algorithm"], case["maze"], case["rows"], case["columns"]
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TIME_TOLERANCE) -> list[str]:
+
+    """Returns descriptions of cases that got slower or explore/answer differently than in the baseline"""
+
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    pairs = [(case, baseline_cases[case_key(case)]) for case in results["cases"] if case_key(case) in baseline_cases]
+    timed = [(case, old) for case, old in pairs if min(case["time"], old["time"]) >= MIN_COMPARED_TIME]
+    timed_keys = {case_key(case) for case, _ in timed}
+    # how much slower (or faster) this run is overall, times are compared after taking it out
+    speed_ratio = statistics.median(case["time"] / old["time"] for case, old in timed) if timed else 1.0
+    regressions = []
+
+    for case, old in pairs:
+
+        name = "{}x{} {} / {}".format(case["rows"], case["columns"], case["maze"], case["algorithm"])
+        if case["path_length"] != old["path_length"]:
+            regressions.append(f"{name}: path length {old['path_length']} -> {case['path_length']}")
+        if case["expanded"] > old["expanded"]:
+            regressions.append(f"{name}: expanded {old['expanded']} -> {case['expanded']}")
+        if case_key(case) in timed_keys and case["time"] / old["time"] > speed_ratio * (1 + tolerance):
+            regressions.append(
+                f"{name}: time {old['time']:.4f}s -> {case['time']:.4f}s "
+                f"({case['time'] / old['time']:.2f}x, whole run {speed_ratio:.2f}x)"
+            )
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless pathfinding benchmark")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES, help="comma separated ROWSxCOLUMNS")
+    parser.add_argument("--large", action="store_true", help="add several thousand cells per side grids")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timed runs per case, the fastest counts")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    parser.add_argument("--baseline", help="compare results with this stored run")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store results as {DEFAULT_BASELINE}")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # app module loads its theme and images relative to the repository
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+
+    sizes = list(args.sizes) + (list(LARGE_SIZES) if args.large else [])
+    results = run_benchmark(sizes, args.repeats)
+    text = json.dumps(results, indent=2)
+
+    if output:
+        with open(output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w") as file:
+            file.write(text)
+
+    if baseline_path:
+        with open(baseline_path) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression, file=sys.stderr)
+        if regressions:
+            return 1
+        print("no regressions against the baseline", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,149 +10,177 @@ VISITED_COLOR_2 = (64, 227, 206)
 VISITED_COLOR_1 = (64, 206, 227)
 GREY = (130, 127, 125)
 
+# cell states, stored as one byte per cell in the grid state array
+UNVISITED = 0
+WALL = 1
+OPEN = 2
+VISITED_1 = 3
+VISITED_2 = 4
+PATH = 5
+START = 6
+END = 7
+PARCEL = 8
+
+STATE_COLORS = (UNVISITED_COLOR, WALL_COLOR, OPEN_COLOR, VISITED_COLOR_1, VISITED_COLOR_2, PATH_COLOR)
+
+# neighbor direction bits of the grid adjacency masks (in the order neighbors are visited)
+DOWN = 1
+UP = 2
+RIGHT = 4
+LEFT = 8
+DOWN_RIGHT = 16
+DOWN_LEFT = 32
+UP_RIGHT = 64
+UP_LEFT = 128
+
 
 class Cell:
+
+	"""Thin view of a single grid cell, the state itself lives in the grid"""
+
+	__slots__ = ("grid", "row", "col", "index")
+
 	point_a_img = None
 	point_b_img = None
 	point_parcel_img = None
-	visited_color = VISITED_COLOR_1
+	source_imgs = None
+	visited_state = VISITED_1
 
-	def __init__(self, row, col, width, grid_size, grid_position):
+	def __init__(self, grid, row, col):
+		self.grid = grid
 		self.row = row
 		self.col = col
-		self.width = width
-		self.total_rows, self.total_columns = grid_size
-		self.color = UNVISITED_COLOR
-		self.neighbors = []
-		self.neighbor_by_direction = {}
-		self.x = grid_position[0] + self.col * self.width
-		self.y = grid_position[1] + self.row * self.width
-	
+		self.index = row * grid.total_columns + col
+
+
+	def __eq__(self, other):
+		return isinstance(other, Cell) and self.index == other.index and self.grid is other.grid
+
+	def __hash__(self):
+		return self.index
+
+
+	@property
+	def width(self):
+		return self.grid.gap
+
+	@property
+	def x(self):
+		return self.grid.cell_screen_position(self.row, self.col)[0]
+
+	@property
+	def y(self):
+		return self.grid.cell_screen_position(self.row, self.col)[1]
+
+	@property
+	def state(self):
+		return self.grid.flat_states[self.index]
+
+	@property
+	def weight(self):
+		return self.grid.weight(self.index)
+
+	@property
+	def color(self):
+		state = self.state
+		if state == START:
+			return Cell.point_a_img
+		elif state == END:
+			return Cell.point_b_img
+		elif state == PARCEL:
+			return Cell.point_parcel_img
+		return STATE_COLORS[state]
+
 
 	def get_pos(self):
 		return self.row, self.col
 
 
 	def is_visited(self):
-		return self.color == Cell.visited_color
+		return self.state == Cell.visited_state
 
 	def is_open(self):	
-		return self.color == OPEN_COLOR
+		return self.state == OPEN
 
 	def is_wall(self):
-		return self.color == WALL_COLOR
+		return self.state == WALL
 
 	def is_start(self):
-		return self.color == Cell.point_a_img
+		return self.state == START
 
 	def is_end(self):
-		return self.color == Cell.point_b_img
+		return self.state == END
 	
 	def is_path(self):
-		return self.color == PATH_COLOR
+		return self.state == PATH
 
 	def is_unvisited(self):
-		return self.color == UNVISITED_COLOR
+		return self.state == UNVISITED
 
 	def is_parcel(self):
-		return self.color == Cell.point_parcel_img
+		return self.state == PARCEL
 
 
 	def reset(self):
-		self.color = UNVISITED_COLOR
+		self.grid.set_state(self.index, UNVISITED)
 
 	def make_start(self):
-		self.color = Cell.point_a_img
+		self.grid.set_state(self.index, START)
 
 	def visit(self):
-		self.color = Cell.visited_color
+		self.grid.set_state(self.index, Cell.visited_state)
 
 	def make_open(self):
-		self.color = OPEN_COLOR
+		self.grid.set_state(self.index, OPEN)
 
 	def make_wall(self):
-		self.color = WALL_COLOR
+		self.grid.set_state(self.index, WALL)
 
 	def make_end(self):
-		self.color = Cell.point_b_img	
+		self.grid.set_state(self.index, END)
 
 	def make_path(self):
-		self.color = PATH_COLOR
+		self.grid.set_state(self.index, PATH)
 
 	def make_parcel(self):
-		self.color = Cell.point_parcel_img
-
-
-	def draw(self, win, animation=False):
-
-		"""Draws individual cell to the screen, 
-			also draws it's borders if animation is running"""
-
-		if self.is_start() or self.is_end() or self.is_parcel():
-			pygame.draw.rect(win, UNVISITED_COLOR, (self.x, self.y, self.width, self.width))
-			win.blit(self.color, (self.x, self.y))	
-		else:
-			pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.width))
-
-		if animation:
-			pygame.draw.line(win, GREY, (self.x, self.y), (self.x,  self.y + self.width))
-			pygame.draw.line(win, GREY, (self.x + self.width, self.y), (self.x + self.width, self.y + self.width))
-			pygame.draw.line(win, GREY, (self.x, self.y), (self.x + self.width, self.y))
-			pygame.draw.line(win, GREY, (self.x, self.y + self.width), (self.x + self.width,  self.y + self.width))
-
+		self.grid.set_state(self.index, PARCEL)
 
 
-	def update_neighbors(self, grid):
-		
-		"""Updates list of neighbors for this cell"""
-		
-		self.neighbors = []
-		if self.row < self.total_rows - 1 and not grid[self.row + 1][self.col].is_wall(): #down
-			self.neighbors.append(grid[self.row + 1][self.col])
-
-		if self.row > 0 and not grid[self.row - 1][self.col].is_wall(): #up
-			self.neighbors.append(grid[self.row - 1][self.col])
-
-		if self.col < self.total_columns - 1 and not grid[self.row][self.col + 1].is_wall(): #right
-			self.neighbors.append(grid[self.row][self.col + 1])
+	@property
+	def neighbors(self):
 
-		if self.col > 0 and not grid[self.row][self.col - 1].is_wall(): #left
-			self.neighbors.append(grid[self.row][self.col - 1])
+		"""List of neighbor cells reachable in one move (diagonal ones too if the grid allows diagonal movement)"""
 
+		return [self.grid.get_cell_by_index(index) for index in self.grid.neighbor_indices(self.index)]
 
-	def update_neighbors_by_direction(self, grid):
 
-		"""Updates dictionary of neighbors for this cell (key is neighbor direction)"""
+	@property
+	def neighbor_by_direction(self):
 
-		self.neighbor_by_direction = {}
-		if self.row < self.total_rows - 1 : 
-			self.neighbor_by_direction["down"] = grid[self.row + 1][self.col]
-		else:
-			self.neighbor_by_direction["down"] = None
+		"""Dictionary of neighbors for this cell (key is neighbor direction)"""
 
-		if self.row > 0: 
-			self.neighbor_by_direction["up"] = grid[self.row - 1][self.col]
-		else:
-			self.neighbor_by_direction["up"] = None
-
-		if self.col < self.total_columns - 1:
-			self.neighbor_by_direction["right"] = grid[self.row][self.col + 1]
-		else:
-			self.neighbor_by_direction["right"] = None
-
-		if self.col > 0: 
-			self.neighbor_by_direction["left"] = grid[self.row][self.col - 1]
-		else:
-			self.neighbor_by_direction["left"] = None
+		grid = self.grid
+		return {
+			"down": grid.get_cell(self.row + 1, self.col) if self.row < grid.total_rows - 1 else None,
+			"up": grid.get_cell(self.row - 1, self.col) if self.row > 0 else None,
+			"right": grid.get_cell(self.row, self.col + 1) if self.col < grid.total_columns - 1 else None,
+			"left": grid.get_cell(self.row, self.col - 1) if self.col > 0 else None,
+		}
 	
 	@staticmethod
 	def scale_cell_imgs(width, height)-> None:
 		
-		"""Scales cell images based on window dimensions"""
+		"""Scales cell images based on cell size, images are loaded only once so zooming can rescale them"""
+
+		if Cell.source_imgs is None:
+			Cell.source_imgs = tuple(
+				pygame.image.load(os.path.join('assets', 'imgs', name)).convert_alpha()
+				for name in ('letter-a.png', 'letter-b.png', 'parcel.png')
+			)
 
-		Cell.point_a_img = pygame.transform.scale(pygame.image.load(os.path.join('assets\imgs', 'letter-a.png')).convert_alpha(), (width, height))
-		Cell.point_b_img = pygame.transform.scale(pygame.image.load(os.path.join('assets\imgs', 'letter-b.png')).convert_alpha(), (width, height))
-		Cell.point_parcel_img = pygame.transform.scale(pygame.image.load(os.path.join('assets\imgs', 'parcel.png')).convert_alpha(), (width, height))
+		Cell.point_a_img, Cell.point_b_img, Cell.point_parcel_img = (
+			pygame.transform.scale(img, (width, height)) for img in Cell.source_imgs
+		)
 
 	
 
@@ -0,0 +1,224 @@
+import numpy as np
+from weakref import WeakKeyDictionary
+from cell import WALL
+from grid import Grid
+
+# label of wall cells
+NO_COMPONENT = -1
+
+_indices_by_grid = WeakKeyDictionary()
+
+
+class ComponentIndex:
+
+    """Connected components of cells that aren't walls, so unreachable targets are known without a search.
+        Every diagonal move needs an open cell beside it, so components are the same for every movement policy.
+        Runs of open cells in rows are found with NumPy one band of rows at a time and joined in a union-find
+        where they touch vertically. Cells aren't labeled one by one: only where each run starts is kept,
+        a cell's run is looked up from it (cells opened later get labels of their own).
+        Opened cells join their neighbors' components, new walls only force a relabeling
+        if the open cells around them aren't connected around the wall (the component may split)"""
+
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.rebuild()
+
+
+    def rebuild(self) -> None:
+
+        """Labels all components from scratch"""
+
+        grid = self.grid
+        self.walls_version = grid.walls_version
+        self.applied_edits = len(grid.wall_edits)
+        self.parents = []
+        self.opened = {}
+
+        starts = []
+        # last row of the previous band, its runs may touch runs in the first row of the next one
+        above = None
+        for first, last in grid.row_bands():
+            open_cells = grid.states[first:last] != WALL
+            run_starts = open_cells.copy()
+            run_starts[:, 1:] &= ~open_cells[:, :-1]
+            runs = np.cumsum(run_starts, dtype=np.int64).reshape(open_cells.shape) + (len(self.parents) - 1)
+
+            starts.append(np.flatnonzero(run_starts) + first * grid.total_columns)
+            self.parents.extend(range(len(self.parents), int(runs[-1, -1]) + 1))
+            self.join_rows(open_cells[:-1], run_starts[:-1], runs[:-1], open_cells[1:], run_starts[1:], runs[1:])
+            if above is not None:
+                self.join_rows(*above, open_cells[:1], run_starts[:1], runs[:1])
+            above = open_cells[-1:].copy(), run_starts[-1:].copy(), runs[-1:].copy()
+
+        # flat index of the first cell of every run, in order, in the smallest type that holds any index
+        self.run_starts = np.concatenate(starts).astype(np.min_scalar_type(grid.total_rows * grid.total_columns))
+
+
+    def join_rows(self, upper_open, upper_starts, upper_runs, lower_open, lower_starts, lower_runs) -> None:
+
+        """Joins runs of the upper rows with the runs touching them in the rows below,
+            taken where the overlap begins (one of the runs starts there)"""
+
+        touching = upper_open & lower_open & (upper_starts | lower_starts)
+        for upper, lower in zip(upper_runs[touching].tolist(), lower_runs[touching].tolist()):
+            self.union(upper, lower)
+
+
+    def label(self, index: int) -> int:
+
+        """Returns the label of an open cell (not necessarily the root of its component)"""
+
+        label = self.opened.get(index)
+        if label is None:
+            label = int(np.searchsorted(self.run_starts, index, side="right")) - 1
+        return label
+
+
+    def labels_of_rows(self, first: int, last: int) -> np.ndarray:
+
+        """Returns component roots of cells in the rows, NO_COMPONENT for walls"""
+
+        grid = self.grid
+        walls = grid.states[first:last] == WALL
+        indices = np.flatnonzero(~walls) + first * grid.total_columns
+        labels = np.searchsorted(self.run_starts, indices, side="right") - 1
+        for index, label in self.opened.items():
+            position = np.searchsorted(indices, index)
+            if position < len(indices) and indices[position] == index:
+                labels[position] = label
+
+        runs, inverse = np.unique(labels, return_inverse=True)
+        roots = np.array([self.find(run) for run in runs.tolist()], dtype=np.int64)
+        result = np.full(walls.shape, NO_COMPONENT, dtype=np.int64)
+        result[~walls] = roots[inverse.ravel()]
+        return result
+
+
+    def find(self, label: int) -> int:
+        parents = self.parents
+        while parents[label] != label:
+            parents[label] = parents[parents[label]]
+            label = parents[label]
+        return label
+
+
+    def union(self, first: int, second: int) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parents[max(first, second)] = min(first, second)
+
+
+    def update(self) -> None:
+
+        """Replays wall edits made since the last update in order, relabels everything
+            after a rebuild of adjacency or when a new wall may have split a component"""
+
+        grid = self.grid
+        if grid.walls_version != self.walls_version:
+            self.rebuild()
+            return
+
+        edits = grid.wall_edits[self.applied_edits:]
+        if not edits:
+            return
+        self.applied_edits = len(grid.wall_edits)
+
+        # walls as they were before the edits (every edit toggles the cell), updated while replaying them
+        walls = {}
+        for index in edits:
+            walls[index] = not walls.get(index, grid.flat_states[index] == WALL)
+
+        for index in edits:
+            walls[index] = not walls[index]
+            if walls[index]:
+                if self.may_split(index, walls):
+                    self.rebuild()
+                    return
+                self.opened.pop(index, None)
+            else:
+                self.open_cell(index, walls)
+
+
+    def is_wall(self, index: int, walls: dict) -> bool:
+        return walls.get(index, self.grid.flat_states[index] == WALL)
+
+
+    def ring(self, index: int) -> list:
+
+        """Returns the 8 cells around the cell in circular order (None outside of the map),
+            consecutive ones are orthogonal neighbors of each other"""
+
+        grid = self.grid
+        row, col = divmod(index, grid.total_columns)
+        return [
+            (row + d_row) * grid.total_columns + col + d_col
+            if 0 <= row + d_row < grid.total_rows and 0 <= col + d_col < grid.total_columns else None
+            for d_row, d_col in ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+        ]
+
+
+    def open_cell(self, index: int, walls: dict) -> None:
+
+        """Gives the opened cell its own component joined with components of its open neighbors"""
+
+        label = len(self.parents)
+        self.parents.append(label)
+        self.opened[index] = label
+        for neighbor in self.ring(index)[::2]:
+            if neighbor is not None and not self.is_wall(neighbor, walls):
+                self.union(label, self.label(neighbor))
+
+
+    def may_split(self, index: int, walls: dict) -> bool:
+
+        """Checks if open orthogonal neighbors of the new wall lie on more than one
+            open stretch of the ring around it, if they don't they stay connected"""
+
+        is_open = [neighbor is not None and not self.is_wall(neighbor, walls) for neighbor in self.ring(index)]
+        if all(is_open):
+            return False
+
+        # walk the ring starting after a closed cell, counting stretches with an orthogonal neighbor in them
+        first = is_open.index(False)
+        stretches, in_stretch, counted = 0, False, False
+        for step in range(1, 9):
+            position = (first + step) % 8
+            if not is_open[position]:
+                in_stretch = False
+                continue
+            if not in_stretch:
+                in_stretch, counted = True, False
+            if position % 2 == 0 and not counted:
+                stretches += 1
+                counted = True
+        return stretches > 1
+
+
+    def same_component(self, first: int, second: int) -> bool:
+
+        """Checks if there is a path between the two cells (neither of them may be a wall)"""
+
+        states = self.grid.flat_states
+        if states[first] == WALL or states[second] == WALL:
+            return False
+        return self.find(self.label(first)) == self.find(self.label(second))
+
+
+def get_components(grid: Grid) -> ComponentIndex:
+
+    """Returns the grid's component index, brought up to date with wall edits"""
+
+    index = _indices_by_grid.get(grid)
+    if index is None:
+        index = _indices_by_grid[grid] = ComponentIndex(grid)
+    else:
+        index.update()
+    return index
+
+
+def reachable(grid: Grid, start: int, *targets: int) -> bool:
+
+    """Checks if every target can be reached from the start, answered from the component index"""
+
+    components = get_components(grid)
+    return all(components.same_component(start, target) for target in targets)
@@ -0,0 +1,139 @@
+import numpy as np
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+from cell import Cell
+from grid import Grid
+from algo import Trace, to_cells
+
+# distance of cells that can't reach the target
+UNREACHED = -1
+# fields kept per grid (end and parcel, plus a couple of recently dragged targets)
+MAX_FIELDS = 4
+
+_fields_by_grid = WeakKeyDictionary()
+
+
+class DistanceField:
+
+    """Unweighted distances (number of moves) from every cell to the target, computed as a wavefront
+        over the adjacency masks with NumPy: one vectorized step per distance level"""
+
+    def __init__(self, grid: Grid, target: int):
+        self.grid = grid
+        self.target = target
+        self.walls_key = (grid.walls_version, len(grid.wall_edits))
+        self.distances = self.compute()
+        self.flat = self.distances.ravel()
+
+
+    def compute(self) -> np.ndarray:
+        grid = self.grid
+        adjacency = np.frombuffer(grid.adjacency, dtype=np.uint8)
+        distances = np.full(len(adjacency), UNREACHED, dtype=np.int32)
+
+        # which adjacency masks allow a move in each direction under the grid's movement policy
+        allowed = np.zeros((len(grid.direction_offsets), len(grid.neighbor_steps)), dtype=bool)
+        for mask, steps in enumerate(grid.neighbor_steps):
+            for _, direction in steps:
+                allowed[direction, mask] = True
+        directions = [
+            (offset, allowed[direction])
+            for direction, offset in enumerate(grid.direction_offsets)
+            if allowed[direction].any()
+        ]
+
+        distances[self.target] = 0
+        frontier = np.array([self.target], dtype=np.intp)
+        level = 0
+
+        while len(frontier):
+            level += 1
+            masks = adjacency[frontier]
+            reached = np.concatenate([frontier[moves[masks]] + offset for offset, moves in directions])
+            reached = reached[distances[reached] == UNREACHED]
+            frontier = np.unique(reached)
+            distances[frontier] = level
+
+        return distances.reshape(grid.grid_size)
+
+
+    def is_valid(self) -> bool:
+
+        """Checks if walls haven't changed since the field has been computed"""
+
+        return self.walls_key == (self.grid.walls_version, len(self.grid.wall_edits))
+
+
+    def path_from(self, source: int) -> list[int]:
+
+        """Follows decreasing distance from the source to the target, returns path cell indices
+            (without both of them) or None if the target can't be reached"""
+
+        flat, grid = self.flat, self.grid
+        distance = int(flat[source])
+        if distance == UNREACHED:
+            return None
+
+        path = []
+        current = source
+        while distance > 1:
+            distance -= 1
+            for offset in grid.neighbor_offsets[grid.adjacency[current]]:
+                if flat[current + offset] == distance:
+                    current += offset
+                    break
+            path.append(current)
+
+        return path
+
+
+    def record_wavefront(self, trace: Trace, source: int) -> None:
+
+        """Records cells closer to the target than the source, one distance level per step"""
+
+        limit = int(self.flat[source])
+        if limit == UNREACHED:
+            limit = int(self.flat.max()) + 1
+
+        inside = np.flatnonzero((self.flat > 0) & (self.flat < limit))
+        inside = inside[np.argsort(self.flat[inside], kind="stable")]
+        level_ends = np.cumsum(np.bincount(self.flat[inside])[1:])
+
+        first = len(trace)
+        trace.visit_many(inside)
+        for last in level_ends:
+            trace.steps.append(first + int(last))
+
+
+def get_distance_field(grid: Grid, target: int) -> DistanceField:
+
+    """Returns cached distance field to the target, recomputed after wall edits"""
+
+    fields = _fields_by_grid.setdefault(grid, OrderedDict())
+    field = fields.get(target)
+    if field is None or not field.is_valid():
+        field = fields[target] = DistanceField(grid, target)
+        if len(fields) > MAX_FIELDS:
+            fields.popitem(last=False)
+    fields.move_to_end(target)
+    return field
+
+
+def wavefront(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+) -> list[Cell]:
+
+    """BFS from the end done as a cached vectorized wavefront, the path is found
+        by walking down the distances from the start"""
+
+    field = get_distance_field(grid, end.index)
+    if trace is not None:
+        field.record_wavefront(trace, start.index)
+
+    path = field.path_from(start.index)
+    if path is None:
+        return None
+    return to_cells(grid, path)
@@ -0,0 +1,392 @@
+"""Offscreen export of a run (maze generation followed by the search and its path) into an animated
+GIF or a sequence of PNG frames, rendered straight from the grid without a window or screen capture.
+
+Usage:
+    python export.py OUTPUT [--size 34x64] [--cell-size 10] [--maze "Recursive Division Maze"]
+                            [--algorithm "A* Search"] [--speed 250] [--fps 50] [--seed 7]
+
+OUTPUT ending with .gif is written as a GIF, anything else is a directory of PNG frames next to
+an ffmpeg concat list (frames.txt) with the duration of every frame. Frames are encoded while
+the run goes on and unchanged frames only lengthen the previous one, so memory doesn't grow with
+the length of the run."""
+
+import os
+import sys
+import time
+import struct
+import random
+import argparse
+import numpy as np
+import pygame
+from cell import Cell, UNVISITED_COLOR, GREY, WALL, START
+from grid import Grid, MIN_WEIGHT, MAX_WEIGHT
+from renderer import terrain_cell_colors, MIN_LINED_CELL_SIZE
+from animation import Animator
+from visualizer import Player
+
+# the app module creates its window on import, export never shows it
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GRID_SIZE = (34, 64)  # (rows, columns)
+CELL_SIZE = 10
+ANIMATION_SPEED = 250
+# browsers show GIF frames shorter than 2 centiseconds for 10, 50 fps is the fastest safe rate
+EXPORT_FPS = 50
+# how long the finished run stays on the last frame before the GIF loops, in seconds
+FINAL_PAUSE = 2.0
+TERRAIN_LEVELS = MAX_WEIGHT - MIN_WEIGHT + 1
+# codes of the GIF's LZW compression are at most 12 bits wide
+MAX_LZW_CODES = 4096
+# longest data sub-block of a GIF
+MAX_SUB_BLOCK = 255
+
+
+def lzw_encode(pixels: bytes, min_code_size: int) -> bytes:
+
+    """Compresses palette indices with GIF's variable code width LZW, the code table
+        is cleared once it's full"""
+
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    table = {}
+
+    output = bytearray()
+    bits = clear_code
+    bit_count = code_size
+
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        key = prefix << 8 | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+
+        bits |= prefix << bit_count
+        bit_count += code_size
+        # decoder widens its codes once the table outgrows them
+        if next_code >= 1 << code_size and code_size < 12:
+            code_size += 1
+
+        if next_code < MAX_LZW_CODES:
+            table[key] = next_code
+            next_code += 1
+        else:
+            bits |= clear_code << bit_count
+            bit_count += code_size
+            table = {}
+            code_size = min_code_size + 1
+            next_code = end_code + 1
+
+        while bit_count >= 8:
+            output.append(bits & 0xFF)
+            bits >>= 8
+            bit_count -= 8
+        prefix = pixel
+
+    bits |= prefix << bit_count
+    bit_count += code_size
+    if next_code >= 1 << code_size and code_size < 12:
+        code_size += 1
+    bits |= end_code << bit_count
+    bit_count += code_size
+    output += bits.to_bytes((bit_count + 7) // 8, "little")
+    return bytes(output)
+
+
+class GifWriter:
+
+    """Streams frames into an animated GIF with one global palette: only the changed rectangle of every
+        frame is compressed and written (the rest of the previous frame is kept), nothing is buffered"""
+
+    def __init__(self, path: str, size: tuple, palette: np.ndarray, loop: bool = True):
+        self.file = open(path, "wb")
+        width, height = size
+
+        table_bits = max(1, (len(palette) - 1).bit_length())
+        self.min_code_size = max(2, table_bits)
+        color_table = np.zeros((1 << table_bits, 3), dtype=np.uint8)
+        color_table[:len(palette)] = palette
+
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF0 | (table_bits - 1), 0, 0))
+        self.file.write(color_table.tobytes())
+        if loop:
+            self.file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+        # frame delays are rounded to centiseconds, the error is carried over to the next frame
+        self.elapsed = 0.0
+        self.written_delay = 0
+
+
+    def write_frame(self, image: np.ndarray, rect: tuple, duration: float) -> None:
+        left, top, width, height = rect
+        self.elapsed += duration
+        delay = max(2, round(self.elapsed * 100) - self.written_delay)
+        self.written_delay += delay
+
+        # graphic control extension (keep the previous frame under this one) and image descriptor
+        self.file.write(b"!\xf9\x04\x04" + struct.pack("<H", delay) + b"\x00\x00")
+        self.file.write(b"," + struct.pack("<HHHHB", left, top, width, height, 0))
+
+        data = lzw_encode(image[top:top + height, left:left + width].tobytes(), self.min_code_size)
+        self.file.write(bytes((self.min_code_size,)))
+        for first in range(0, len(data), MAX_SUB_BLOCK):
+            block = data[first:first + MAX_SUB_BLOCK]
+            self.file.write(bytes((len(block),)) + block)
+        self.file.write(b"\x00")
+
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.write(b";")
+            self.file.close()
+
+
+class FrameSequenceWriter:
+
+    """Writes every frame as a PNG into the directory and lists them with their durations
+        in an ffmpeg concat file (ffmpeg -f concat -i frames.txt run.mp4)"""
+
+    def __init__(self, directory: str, palette: np.ndarray):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.palette = palette
+        self.frame_count = 0
+        self.last_frame = None
+        self.concat_list = open(os.path.join(directory, "frames.txt"), "w")
+
+
+    def write_frame(self, image: np.ndarray, rect: tuple, duration: float) -> None:
+        name = f"frame_{self.frame_count:05d}.png"
+        surface = pygame.surfarray.make_surface(self.palette[image].transpose(1, 0, 2))
+        pygame.image.save(surface, os.path.join(self.directory, name))
+        self.concat_list.write(f"file '{name}'\nduration {duration:.4f}\n")
+        self.frame_count += 1
+        self.last_frame = name
+
+
+    def close(self) -> None:
+        if not self.concat_list.closed:
+            # concat demuxer ignores the duration of the last entry unless it's listed once more
+            if self.last_frame is not None:
+                self.concat_list.write(f"file '{self.last_frame}'\n")
+            self.concat_list.close()
+
+
+def build_tiles(cell_size: int) -> tuple:
+
+    """Returns palette indexed tiles of cells (indexed by state * TERRAIN_LEVELS + terrain cost) looking
+        like the app's ones and their palette: colors of cells, grid lines and of the start, end and parcel
+        images, which are reduced to fewer shades if there are too many of them for one palette"""
+
+    cell_colors = terrain_cell_colors()
+    lined = cell_size >= MIN_LINED_CELL_SIZE
+
+    Cell.scale_cell_imgs(cell_size, cell_size)
+    image_tiles = []
+    for image in (Cell.point_a_img, Cell.point_b_img, Cell.point_parcel_img):
+        tile = pygame.Surface((cell_size, cell_size))
+        tile.fill(UNVISITED_COLOR)
+        tile.blit(image, (0, 0))
+        image_tiles.append(pygame.surfarray.array3d(tile).transpose(1, 0, 2))
+    image_pixels = np.stack(image_tiles).astype(np.int32)
+
+    colors = np.concatenate((cell_colors.reshape(-1, 3), [GREY]))
+    palette = np.unique(np.concatenate((colors, image_pixels.reshape(-1, 3))), axis=0)
+    shift = 0
+    while len(palette) > 256:
+        shift += 1
+        image_pixels = image_pixels >> shift << shift
+        palette = np.unique(np.concatenate((colors, image_pixels.reshape(-1, 3))), axis=0)
+
+    keys = palette @ np.array([1 << 16, 1 << 8, 1])
+    def palette_index(pixels: np.ndarray) -> np.ndarray:
+        return np.searchsorted(keys, pixels @ np.array([1 << 16, 1 << 8, 1])).astype(np.uint8)
+
+    tiles = np.empty((len(cell_colors), TERRAIN_LEVELS, cell_size, cell_size), dtype=np.uint8)
+    tiles[:] = palette_index(cell_colors)[:, :, None, None]
+    if lined:
+        lines = tiles[np.arange(len(cell_colors)) != WALL]
+        lines[:, :, 0, :] = lines[:, :, :, 0] = palette_index(np.array(GREY))
+        tiles[np.arange(len(cell_colors)) != WALL] = lines
+    tiles[START:] = palette_index(image_pixels)[:, None]
+    if lined:
+        tiles[START:, :, 0, :] = tiles[START:, :, :, 0] = palette_index(np.array(GREY))
+
+    return tiles.reshape(-1, cell_size, cell_size), palette.astype(np.uint8)
+
+
+class FrameExporter:
+
+    """Draws the grid offscreen into a palette indexed image and hands it to the writer: only
+        cells changed since the last frame are redrawn and written, a frame is held back until
+        the next one differs from it, so unchanged frames just lengthen it"""
+
+    def __init__(self, grid: Grid, writer, tiles: np.ndarray):
+        self.grid = grid
+        self.writer = writer
+        self.tiles = tiles
+        self.cell_size = tiles.shape[1]
+
+        rows, columns = grid.grid_size
+        lined = self.cell_size >= MIN_LINED_CELL_SIZE
+        # right and bottom border lines of the map, grey (like every grid line) in the tiles' palette
+        self.image = np.full((rows * self.cell_size + lined, columns * self.cell_size + lined), tiles[0, 0, 0], dtype=np.uint8)
+        self.keys = None
+        # rectangle of the frame waiting to be written and how long it has been shown
+        self.pending = None
+        self.pending_duration = 0.0
+        self.frame_count = 0
+
+
+    @property
+    def size(self) -> tuple:
+        return self.image.shape[1], self.image.shape[0]
+
+
+    def capture(self, duration: float) -> None:
+
+        """Adds the grid as it is now as a frame shown for duration seconds"""
+
+        grid = self.grid
+        keys = grid.states * TERRAIN_LEVELS + grid.terrain
+        if self.keys is None:
+            changed_rows, changed_columns = slice(0, grid.total_rows), slice(0, grid.total_columns)
+        else:
+            changed = keys != self.keys
+            rows, columns = np.flatnonzero(changed.any(axis=1)), np.flatnonzero(changed.any(axis=0))
+            if not len(rows):
+                self.pending_duration += duration
+                return
+            changed_rows, changed_columns = slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1)
+
+        self.flush()
+        self.keys = keys
+        size = self.cell_size
+        region = self.tiles[keys[changed_rows, changed_columns]]
+        top, left = changed_rows.start * size, changed_columns.start * size
+        height, width = region.shape[0] * size, region.shape[1] * size
+        self.image[top:top + height, left:left + width] = region.transpose(0, 2, 1, 3).reshape(height, width)
+
+        if self.frame_count == 0:
+            self.pending = (0, 0) + self.size
+        else:
+            self.pending = (left, top, width, height)
+        self.pending_duration = duration
+        self.frame_count += 1
+
+
+    def flush(self) -> None:
+        if self.pending is not None:
+            self.writer.write_frame(self.image, self.pending, self.pending_duration)
+            self.pending = None
+
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+
+class ExportAnimator(Animator):
+
+    """Animator of a job running offscreen, every frame goes to the exporter instead of the UI thread"""
+
+    def __init__(self, exporter: FrameExporter, speed: int, fps: int = EXPORT_FPS):
+        super().__init__(speed, fps)
+        self.exporter = exporter
+
+
+    def frame(self) -> bool:
+        self.pending_steps = 0
+        self.exporter.capture(1 / min(self.speed, self.fps))
+        return True
+
+
+def open_writer(output: str, size: tuple, palette: np.ndarray):
+
+    """Returns GIF writer for a .gif output, PNG frame sequence writer for anything else. Both take
+        write_frame(image, (left, top, width, height), duration) with the part of the palette indexed
+        image changed since the previous frame and how long it's shown, and close()"""
+
+    if output.lower().endswith(".gif"):
+        return GifWriter(output, size, palette)
+    return FrameSequenceWriter(output, palette)
+
+
+def export_run(
+    output: str,
+    grid_size: tuple = GRID_SIZE,
+    cell_size: int = CELL_SIZE,
+    maze_name: str = None,
+    algorithm_name: str = None,
+    speed: int = ANIMATION_SPEED,
+    fps: int = EXPORT_FPS,
+    seed: int = None,
+) -> int:
+
+    """Generates the maze (if one is given) and runs the algorithm on a headless grid,
+        exporting both animations. Returns the number of written frames"""
+
+    import main
+
+    if seed is not None:
+        random.seed(seed)
+
+    rows, columns = grid_size
+    grid = Grid(None, grid_size, (columns * cell_size, rows * cell_size), (0, 0))
+    start = grid[rows // 2][columns // 2 - 2]
+    end = grid[rows // 2][columns // 2 + 2]
+    start.make_start()
+    end.make_end()
+
+    tiles, palette = build_tiles(cell_size)
+    exporter = FrameExporter(grid, None, tiles)
+    exporter.writer = open_writer(output, exporter.size, palette)
+    try:
+        exporter.capture(1 / fps)
+        if maze_name is not None:
+            main.MAZE_FUNCTIONS[maze_name](grid, ExportAnimator(exporter, speed, fps))
+
+        algorithm = main.ALGORITHM_FUNCTIONS[algorithm_name or main.Algorithms.ASTAR]
+        recording = main.run_algorithm(grid, start, end, [], algorithm)
+        if recording is not None:
+            player = Player(recording, grid, speed)
+            while not player.finished():
+                player.advance(1 / fps)
+                exporter.capture(1 / fps)
+        exporter.capture(FINAL_PAUSE)
+    finally:
+        exporter.close()
+    return exporter.frame_count
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offscreen export of a pathfinding run")
+    parser.add_argument("output", help="GIF file (.gif) or directory for PNG frames")
+    parser.add_argument("--size", default="{}x{}".format(*GRID_SIZE), help="grid size as ROWSxCOLUMNS")
+    parser.add_argument("--cell-size", type=int, default=CELL_SIZE, help="pixels per cell")
+    parser.add_argument("--maze", help="maze generated first, as named in the app (none by default)")
+    parser.add_argument("--algorithm", help="algorithm as named in the app (A* by default)")
+    parser.add_argument("--speed", type=int, default=ANIMATION_SPEED, help="animation steps per second")
+    parser.add_argument("--fps", type=int, default=EXPORT_FPS, help="frames per second")
+    parser.add_argument("--seed", type=int, help="random seed of the maze")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    rows, columns = args.size.lower().split("x")
+
+    # app module loads its theme and images relative to the repository
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+
+    started = time.perf_counter()
+    frames = export_run(output, (int(rows), int(columns)), args.cell_size, args.maze, args.algorithm, args.speed, args.fps, args.seed)
+    print(f"{frames} frames written to {output} in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
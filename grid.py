@@ -1,85 +1,412 @@
 import pygame
-from cell import Cell
+import numpy as np
+from contextlib import contextmanager
+from storage import zeroed_buffer
+from utils import Heuristic
+from cell import Cell, UNVISITED, WALL, START, END, PARCEL, DOWN, UP, RIGHT, LEFT, DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT
 
 
 GREY = (130, 127, 125)
 
+# whole grid operations work on bands of rows of about this many cells, so their temporary arrays stay small
+BAND_CELLS = 1 << 20
+
+# zoom limits, in pixels per cell side
+MIN_CELL_SIZE = 1
+MAX_CELL_SIZE = 64
+
+# traversal weight of a cell is the cost of stepping onto it, plain cells weigh 1
+MIN_WEIGHT = 1
+MAX_WEIGHT = 9
+
+# movement policies: no diagonal moves, diagonal moves only between two open cells beside the move,
+# diagonal moves if at least one of the cells beside the move is open (cutting the corner of the other one)
+FOUR_DIRECTIONS = 0
+NO_CORNER_CUTTING = 1
+CORNER_CUTTING = 2
+
+DIAGONAL_COST = 2 ** 0.5
+
+# adjacency bits of the direction codes (positions in direction_offsets)
+DIRECTION_BITS = (DOWN, UP, RIGHT, LEFT, DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+# orthogonal directions beside each of the diagonal ones
+DIAGONAL_SIDES = (DOWN | RIGHT, DOWN | LEFT, UP | RIGHT, UP | LEFT)
+
+
+class GridRow:
+
+    """Row of cell views, created on access so the grid doesn't hold a Cell object per cell"""
+
+    __slots__ = ("grid", "row")
+
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [self.grid.get_cell(self.row, j) for j in range(*col.indices(self.grid.total_columns))]
+        if col < 0:
+            col += self.grid.total_columns
+        return self.grid.get_cell(self.row, col)
+
+    def __iter__(self):
+        for j in range(self.grid.total_columns):
+            yield self.grid.get_cell(self.row, j)
+
+    def __len__(self):
+        return self.grid.total_columns
+
+
 class Grid:
     def __init__(self, win, grid_size, grid_dimensions, grid_position):
         self.win = win 
         self.grid_size = grid_size
         self.total_rows, self.total_columns = grid_size
         self.width, self.height  = grid_dimensions
-        self.gap = self.width // self.total_columns
         self.line_color = GREY
         self.grid_position = grid_position
         self.x, self.y = self.grid_position
-        self.raw_grid  = self.init_cells()
-        
 
+        # viewport: grid area on the screen shows the map zoomed to gap pixels per cell,
+        # scrolled by (view_x, view_y) map pixels, the whole map fits in by default if it can
+        self.gap = self.fitting_cell_size()
+        self.view_x, self.view_y = 0, 0
+        self.clamp_view()
+
+        # one byte per cell: flat buffer for fast scalar access, numpy view of the same memory for whole grid operations,
+        # storage is allocated lazily in chunks, so untouched parts of the map (all unvisited) cost no memory
+        self.flat_states = zeroed_buffer(self.total_rows * self.total_columns)
+        self.states = np.frombuffer(self.flat_states, dtype=np.uint8).reshape(self.grid_size)
+
+        # bitmask of blocked directions (DOWN | UP | RIGHT | LEFT and the diagonal ones, wall or edge of the map)
+        # for every cell, cells with no walls around are zero, so open parts of the map stay unallocated here as well
+        self.adjacency = zeroed_buffer(self.total_rows * self.total_columns)
+        self.adjacency_array = np.frombuffer(self.adjacency, dtype=np.uint8).reshape(self.grid_size)
+        columns = self.total_columns
+        self.direction_offsets = (columns, -columns, 1, -1, columns + 1, columns - 1, -columns + 1, -columns - 1)
+        self.step_costs = (1,) * 4 + (DIAGONAL_COST,) * 4
+        self.movement = FOUR_DIRECTIONS
+        self.neighbor_steps = self.init_neighbor_steps()
+        self.neighbor_offsets = self.init_neighbor_offsets()
+        self.adjacency_deferred = False
+
+        # cells whose wall state was toggled since adjacency was last rebuilt from scratch,
+        # incremental searches replay them, a rebuild bumps the version instead
+        self.wall_edits = []
+        self.walls_version = 0
+        self.update_neighbors_for_every_cell()
+
+        # one byte per cell: terrain cost of stepping onto the cell on top of the base cost of 1 (weight - 1),
+        # zero for plain cells so maps without weights stay unallocated, counts of cells per cost give the minimum weight
+        self.flat_terrain = zeroed_buffer(self.total_rows * self.total_columns)
+        self.terrain = np.frombuffer(self.flat_terrain, dtype=np.uint8).reshape(self.grid_size)
+        self.terrain_counts = [self.total_rows * self.total_columns] + [0] * (MAX_WEIGHT - MIN_WEIGHT)
+        # cost of a move by direction code and terrain cost of the entered cell
+        self.move_costs = [
+            tuple(step_cost * (cost + MIN_WEIGHT) for cost in range(MAX_WEIGHT - MIN_WEIGHT + 1))
+            for step_cost in self.step_costs
+        ]
+
+        # cells changed since the renderer drew the last frame
+        self.dirty_cells = set()
+        self.all_dirty = True
+
+
+    def init_neighbor_offsets(self) -> list[tuple]:
+
+        """Returns flat index offsets of neighbors for every possible adjacency mask"""
+
+        return [tuple(offset for offset, _ in steps) for steps in self.neighbor_steps]
+
+
+    def init_neighbor_steps(self) -> list[tuple]:
+
+        """Returns (offset, direction code) pairs of reachable neighbors for every possible adjacency mask
+            under the movement policy, direction code is the position of the offset in direction_offsets"""
+
+        def allowed(mask: int, code: int) -> bool:
+            if mask & DIRECTION_BITS[code]:
+                return False
+            if code < 4:
+                return True
+            blocked_sides = mask & DIAGONAL_SIDES[code - 4]
+            if self.movement == NO_CORNER_CUTTING:
+                return not blocked_sides
+            if self.movement == CORNER_CUTTING:
+                return blocked_sides != DIAGONAL_SIDES[code - 4]
+            return False
 
-    def init_cells(self):
+        return [
+            tuple((offset, code) for code, offset in enumerate(self.direction_offsets) if allowed(mask, code))
+            for mask in range(256)
+        ]
 
-        """Populates grid with cell objects"""
 
-        raw_grid = []
+    def set_movement(self, movement: int) -> None:
 
-        for i in range(self.total_rows):
-            raw_grid.append([])
-            for j in range(self.total_columns):
-                raw_grid[i].append(Cell(i, j, self.gap, self.grid_size, self.grid_position))
+        """Switches the movement policy, searches cached for the old one are invalidated
+            the same way as by a rebuild of adjacency"""
+
+        if movement == self.movement:
+            return
+        self.movement = movement
+        self.neighbor_steps = self.init_neighbor_steps()
+        self.neighbor_offsets = self.init_neighbor_offsets()
+        self.wall_edits.clear()
+        self.walls_version += 1
+
+
+    def default_heuristic(self):
+
+        """Returns the tightest admissible heuristic for the movement policy"""
+
+        return Heuristic.manhattan if self.movement == FOUR_DIRECTIONS else Heuristic.octil
+
+
+    @property
+    def raw_grid(self) -> list[GridRow]:
+        return [GridRow(self, i) for i in range(self.total_rows)]
+
+
+    def set_state(self, index: int, state: int) -> None:
+
+        """Changes state of the cell, keeping adjacency of its neighbors up to date"""
+
+        wall_toggled = (self.flat_states[index] == WALL) != (state == WALL)
+        self.flat_states[index] = state
+        self.dirty_cells.add(index)
+        if wall_toggled and not self.adjacency_deferred:
+            self.update_neighbors_around(index)
+            self.wall_edits.append(index)
+
+
+    def set_weight(self, index: int, weight: int) -> None:
+
+        """Changes traversal weight of the cell, clamped to MIN_WEIGHT..MAX_WEIGHT"""
+
+        cost = min(max(weight, MIN_WEIGHT), MAX_WEIGHT) - MIN_WEIGHT
+        old_cost = self.flat_terrain[index]
+        if cost != old_cost:
+            self.terrain_counts[old_cost] -= 1
+            self.terrain_counts[cost] += 1
+            self.flat_terrain[index] = cost
+            self.dirty_cells.add(index)
+
+
+    def weight(self, index: int) -> int:
+        return self.flat_terrain[index] + MIN_WEIGHT
+
+
+    def is_weighted(self) -> bool:
+        return self.terrain_counts[0] != self.total_rows * self.total_columns
+
+
+    def min_weight(self) -> int:
+
+        """Returns the lowest traversal weight on the grid, admissible heuristics are scaled by it"""
+
+        return next(cost for cost, count in enumerate(self.terrain_counts) if count) + MIN_WEIGHT
+
+
+    def clear_weights(self) -> None:
+
+        """Resets every cell to the plain weight"""
+
+        if not self.is_weighted():
+            return
+        for first, last in self.row_bands():
+            band = self.terrain[first:last]
+            band[band != 0] = 0
+        self.terrain_counts = [self.total_rows * self.total_columns] + [0] * (MAX_WEIGHT - MIN_WEIGHT)
+        self.all_dirty = True
+
+
+    def update_neighbors_around(self, index: int) -> None:
+
+        """Updates adjacency bits pointing at the cell after it became or stopped being a wall"""
+
+        row, col = divmod(index, self.total_columns)
+        not_wall = self.flat_states[index] != WALL
+        adjacency = self.adjacency
+
+        below, above = row < self.total_rows - 1, row > 0
+        right, left = col < self.total_columns - 1, col > 0
+        columns = self.total_columns
+
+        for neighbor_exists, offset, bit in (
+            (below, columns, UP),
+            (above, -columns, DOWN),
+            (right, 1, LEFT),
+            (left, -1, RIGHT),
+            (below and right, columns + 1, UP_LEFT),
+            (below and left, columns - 1, UP_RIGHT),
+            (above and right, -columns + 1, DOWN_LEFT),
+            (above and left, -columns - 1, DOWN_RIGHT),
+        ):
+            if neighbor_exists:
+                if not_wall:
+                    adjacency[index + offset] &= 0xFF ^ bit
+                else:
+                    adjacency[index + offset] |= bit
 
-        return raw_grid
-        
 
-    def draw_grid_lines(self) -> None:
+    @contextmanager
+    def bulk_edit(self):
 
-        """Draws horizontal and vertical grid lines"""
+        """Suspends incremental adjacency updates while lots of walls are changed,
+            adjacency is rebuilt once when the block is left"""
 
-        for i in range(self.total_rows + 1):
-            pygame.draw.line(self.win, self.line_color, (self.x, self.y + i * self.gap), (self.x + self.width, self.y + i * self.gap))
-            for j in range(self.total_columns + 1):
-                pygame.draw.line(self.win, self.line_color, (self.x + j * self.gap, self.y), (self.x + j * self.gap, self.y + self.height))
+        deferred = self.adjacency_deferred
+        self.adjacency_deferred = True
+        try:
+            yield self
+        finally:
+            self.adjacency_deferred = deferred
+            if not deferred:
+                self.update_neighbors_for_every_cell()
+
+
+    def neighbor_indices(self, index: int) -> list[int]:
+
+        """Returns flat indices of neighbors reachable from the cell in one move"""
+
+        return [index + offset for offset in self.neighbor_offsets[self.adjacency[index]]]
+
+
+    def fitting_cell_size(self) -> int:
+
+        """Returns the largest cell size the whole map fits the grid area with"""
+
+        cell_size = min(self.width // self.total_columns, self.height // self.total_rows)
+        return max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, cell_size))
+
+
+    def clamp_view(self) -> None:
+
+        """Keeps the map inside of the grid area, maps smaller than the area are centered"""
+
+        map_width, map_height = self.total_columns * self.gap, self.total_rows * self.gap
+        if map_width <= self.width:
+            self.view_x = -((self.width - map_width) // 2)
+        else:
+            self.view_x = max(0, min(self.view_x, map_width - self.width))
+        if map_height <= self.height:
+            self.view_y = -((self.height - map_height) // 2)
+        else:
+            self.view_y = max(0, min(self.view_y, map_height - self.height))
+
+
+    def pan(self, dx: int, dy: int) -> None:
+
+        """Scrolls the view by given number of screen pixels"""
+
+        view = self.view_x, self.view_y
+        self.view_x += dx
+        self.view_y += dy
+        self.clamp_view()
+        if (self.view_x, self.view_y) != view:
+            self.all_dirty = True
+
+
+    def zoom(self, cell_size: int, anchor: tuple = None) -> None:
+
+        """Changes cell size, the map point under the anchor screen position
+            (center of the grid area by default) stays in place,
+            zooming out stops once the whole map fits the grid area"""
+
+        cell_size = max(self.fitting_cell_size(), min(MAX_CELL_SIZE, cell_size))
+        if cell_size == self.gap:
+            return
+
+        if anchor is None:
+            anchor = (self.x + self.width // 2, self.y + self.height // 2)
+        anchor_x, anchor_y = int(anchor[0] - self.x), int(anchor[1] - self.y)
+
+        self.view_x = (self.view_x + anchor_x) * cell_size // self.gap - anchor_x
+        self.view_y = (self.view_y + anchor_y) * cell_size // self.gap - anchor_y
+        self.gap = cell_size
+        self.clamp_view()
+        self.all_dirty = True
+
+
+    def center_view_on(self, row: int, col: int) -> None:
+
+        """Scrolls the view so the cell is in the middle of the grid area"""
+
+        self.view_x = col * self.gap + self.gap // 2 - self.width // 2
+        self.view_y = row * self.gap + self.gap // 2 - self.height // 2
+        self.clamp_view()
+        self.all_dirty = True
+
+
+    def visible_cells(self) -> tuple:
+
+        """Returns (first row, last row, first column, last column) of cells in the view,
+            last ones exclusive"""
+
+        gap = self.gap
+        first_row = max(0, self.view_y // gap)
+        first_col = max(0, self.view_x // gap)
+        last_row = min(self.total_rows, (self.view_y + self.height) // gap + 1)
+        last_col = min(self.total_columns, (self.view_x + self.width) // gap + 1)
+        return first_row, last_row, first_col, last_col
+
+
+    def cell_screen_position(self, row: int, col: int) -> tuple:
+
+        """Returns screen position of top left corner of the cell"""
+
+        return self.x + col * self.gap - self.view_x, self.y + row * self.gap - self.view_y
 
  
     def update_neighbors_for_every_cell(self) -> None:
-        for row in self.raw_grid:
-            for cell in row:
-                cell.update_neighbors(self.raw_grid)
 
+        """Rebuilds adjacency masks of all cells from the current walls,
+            only masks that have changed are written"""
 
-    def update_neighbors_by_direction_for_every_cell(self) -> None:
-        for row in self.raw_grid:
-            for cell in row:
-                cell.update_neighbors_by_direction(self.raw_grid)
+        for first, last in self.row_bands():
+            # walls of the band with one row above and below, cells beyond the edges count as walls
+            top, bottom = max(first - 1, 0), min(last + 1, self.total_rows)
+            walls = np.ones((last - first + 2, self.total_columns + 2), dtype=bool)
+            walls[top - first + 1:bottom - first + 1, 1:-1] = self.states[top:bottom] == WALL
 
+            masks = walls[2:, 1:-1] * np.uint8(DOWN)
+            masks |= walls[:-2, 1:-1] * np.uint8(UP)
+            masks |= walls[1:-1, 2:] * np.uint8(RIGHT)
+            masks |= walls[1:-1, :-2] * np.uint8(LEFT)
+            masks |= walls[2:, 2:] * np.uint8(DOWN_RIGHT)
+            masks |= walls[2:, :-2] * np.uint8(DOWN_LEFT)
+            masks |= walls[:-2, 2:] * np.uint8(UP_RIGHT)
+            masks |= walls[:-2, :-2] * np.uint8(UP_LEFT)
 
-    def draw_under_grid_lines(self) -> None:
-        
-        """Method meant to be called before drawing grid lines 
-            so cells would look divided by the lines"""
+            band = self.adjacency_array[first:last]
+            np.copyto(band, masks, where=band != masks)
+        self.wall_edits.clear()
+        self.walls_version += 1
 
-        for row in self.raw_grid:
-            for cell in row:
-                if not cell.is_wall():
-                    cell.draw(self.win)
 
-    def draw_over_grid_lines(self) -> None:
+    def row_bands(self):
 
-        """Method meant to be called after drawing grid lines 
-            so cells would look like they are connected"""
+        """Yields (first row, last row) ranges splitting the grid into bands of about BAND_CELLS cells"""
 
-        for row in self.raw_grid:
-            for cell in row:
-                if cell.is_wall(): 
-                    cell.draw(self.win)
+        rows_per_band = max(1, BAND_CELLS // self.total_columns)
+        for first in range(0, self.total_rows, rows_per_band):
+            yield first, min(first + rows_per_band, self.total_rows)
 
 
     def get_cell(self, row: int, col: int) -> Cell:
 
         """Returns cell object based on row and column"""
 
-        return self.raw_grid[row][col]
+        return Cell(self, row, col)
+
+
+    def get_cell_by_index(self, index: int) -> Cell:
+
+        """Returns cell object based on flat index"""
+
+        return Cell(self, *divmod(index, self.total_columns))
     
 
     def get_rc_of_under_mouse_cell(self, mpos) -> tuple:
@@ -88,8 +415,8 @@ class Grid:
         
         x, y = mpos
 
-        row =  (y - self.y) // self.gap
-        col = (x - self.x) // self.gap
+        row =  (y - self.y + self.view_y) // self.gap
+        col = (x - self.x + self.view_x) // self.gap
         
         return int(row), int(col) 
     
@@ -98,59 +425,76 @@ class Grid:
         
         """Clears the grid with an optional cell type exception"""
         
-        if start_end_except == True and barrier_except == True:       
-            for row in self.raw_grid:
-                for  cell in row:
-                    if not cell.is_start() and not cell.is_end() and not cell.is_parcel() and not cell.is_wall(): 
-                        cell.reset()
+        if start_end_except == True and barrier_except == True:
+            kept_states = (START, END, PARCEL, WALL)
 
         elif start_end_except == True:
-            for row in self.raw_grid:
-                for  cell in row:
-                    if not cell.is_start() and not cell.is_end() and not cell.is_parcel(): 
-                        cell.reset()
+            kept_states = (START, END, PARCEL)
 
         else:
-            for row in self.raw_grid:
-                for  cell in row: 
-                        cell.reset()
+            kept_states = ()
 
+        # unvisited cells aren't written, so untouched chunks of the map stay unallocated
+        for first, last in self.row_bands():
+            band = self.states[first:last]
+            band[~np.isin(band, kept_states + (UNVISITED,))] = UNVISITED
+        self.all_dirty = True
+        if not barrier_except:
+            self.clear_weights()
+        if WALL not in kept_states and not self.adjacency_deferred:
+            self.update_neighbors_for_every_cell()
 
-    def draw_grid_frame(self) -> None:
-        pygame.draw.line(self.win, GREY, ((self.x - 3, self.y)), (self.x - 3, self.y + self.height), width=5)
-        pygame.draw.line(self.win, GREY, ((self.x + self.width + 3, self.y)), (self.x + self.width + 3, self.y + self.height), width=5)
-        pygame.draw.line(self.win, GREY, ((0,self.y - 2)), (self.win.get_width(), self.y - 2), width=5)
-        pygame.draw.line(self.win, GREY, ((0, self.y + self.height + 2)), (self.win.get_width(), self.y + self.height + 2), width=5)
+
+    def draw_grid_frame(self, surface: pygame.surface.Surface = None) -> None:
+        if surface is None:
+            surface = self.win
+        pygame.draw.line(surface, GREY, ((self.x - 3, self.y)), (self.x - 3, self.y + self.height), width=5)
+        pygame.draw.line(surface, GREY, ((self.x + self.width + 3, self.y)), (self.x + self.width + 3, self.y + self.height), width=5)
+        pygame.draw.line(surface, GREY, ((0,self.y - 2)), (surface.get_width(), self.y - 2), width=5)
+        pygame.draw.line(surface, GREY, ((0, self.y + self.height + 2)), (surface.get_width(), self.y + self.height + 2), width=5)
 
 
     def make_all_cells_wall(self, start_end_except=False) -> None:
 
         """Recoloring all cells with wall color"""
 
-        if start_end_except:
-            for row in self.raw_grid:
-                for cell in row:
-                    if not cell.is_start() and not cell.is_end() and not cell.is_parcel():
-                        cell.make_wall()
-        else:
-            for row in self.raw_grid:
-                for cell in row:
-                     cell.make_wall()
+        for first, last in self.row_bands():
+            band = self.states[first:last]
+            if start_end_except:
+                band[~np.isin(band, (START, END, PARCEL))] = WALL
+            else:
+                band[:] = WALL
+
+        self.all_dirty = True
+
+        if not self.adjacency_deferred:
+            self.update_neighbors_for_every_cell()
+
+
+    def mouse_in_view(self) -> bool:
+
+        """Checks if mouse is inside of the grid area, whether there is a cell under it or not"""
+
+        mpos = pygame.mouse.get_pos()
+        return self.x < mpos[0] < self.x + self.width and self.y < mpos[1] < self.y + self.height
 
 
     def mouse_on_the_grid(self) -> bool:
 
-        """Checks if mouse on the grid"""
+        """Checks if mouse on the grid (inside of the grid area and over a cell of the map)"""
         
         mpos = pygame.mouse.get_pos()
         if (mpos[0] > self.x and mpos[0] < (self.x + self.width) 
         and mpos[1] > self.y and mpos[1] < (self.y + self.height)):
-            return True
+            row, col = self.get_rc_of_under_mouse_cell(mpos)
+            return 0 <= row < self.total_rows and 0 <= col < self.total_columns
         else:
             return False
 
 
-    def __getitem__(self, row):
-        return self.raw_grid[row]
+    def __getitem__(self, row) -> GridRow:
+        if row < 0:
+            row += self.total_rows
+        return GridRow(self, row)
 
 
@@ -1,3 +1,4 @@
+import math
 import pygame
 import pygame_gui
 import cell
@@ -7,13 +8,27 @@ from grid import GREY
 
 
 GUI_ELEMENT_OFFSET = 20
+# size of legend cells, doesn't follow grid zoom
+LEGEND_CELL_SIZE = 20
+
+# animation speed range in steps per second, slider moves over it on a logarithmic scale
+MIN_ANIMATION_SPEED = 10
+MAX_ANIMATION_SPEED = 100000
+
+
+def selected_option(menu: pygame_gui.elements.UIDropDownMenu) -> str:
+
+    """Returns text of the selected option, newer pygame_gui versions select (text, id) pairs"""
+
+    option = menu.selected_option
+    return option[0] if isinstance(option, tuple) else option
 
 
 class GUI:
 
     """GUI handler class"""
 
-    def __init__(self, win, ui_manager, grid, algorithms, mazes, width, height, animation_speed):
+    def __init__(self, win, ui_manager, grid, algorithms, mazes, brushes, movements, heuristics, width, height, animation_speed):
         
         self.algo_menu = pygame_gui.elements.UIDropDownMenu(
             options_list=[algo for algo in algorithms],
@@ -73,47 +88,47 @@ class GUI:
         )
 
         self.unvisited_cell_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + grid.gap, height - 30), (90, grid.gap)),
+            relative_rect=pygame.Rect((grid.x + LEGEND_CELL_SIZE, height - 30), (90, LEGEND_CELL_SIZE)),
             text="-unvisited",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.visited_cell_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 800 + grid.gap, height - 30), (123, grid.gap)),
+            relative_rect=pygame.Rect((grid.x + 430 + LEGEND_CELL_SIZE, height - 30), (123, LEGEND_CELL_SIZE)),
             text="-visited",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.open_cell_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 400 + grid.gap, height - 30), (50, grid.gap)),
+            relative_rect=pygame.Rect((grid.x + 230 + LEGEND_CELL_SIZE, height - 30), (50, LEGEND_CELL_SIZE)),
             text="-open",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.path_cell_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 600 + grid.gap, height - 30), (50, grid.gap)),
+            relative_rect=pygame.Rect((grid.x + 330 + LEGEND_CELL_SIZE, height - 30), (50, LEGEND_CELL_SIZE)),
             text="-path",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.wall_cell_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 200 + grid.gap, height - 30), (50, grid.gap)),
+            relative_rect=pygame.Rect((grid.x + 130 + LEGEND_CELL_SIZE, height - 30), (50, LEGEND_CELL_SIZE)),
             text="-wall",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.legend_cells = [
-            LegendCell(win, grid.x, height - 30, cell.UNVISITED_COLOR, GREY, grid),
-            LegendCell(win, grid.x + 200, height - 30, cell.WALL_COLOR, GREY, grid),
-            LegendCell(win, grid.x + 400, height - 30, cell.OPEN_COLOR, GREY, grid),
-            LegendCell(win, grid.x + 600, height - 30, cell.PATH_COLOR, GREY, grid),
-            LegendCell(win, grid.x + 800, height - 30, cell.VISITED_COLOR_1, GREY, grid),
-            LegendCell(win, grid.x + 825, height - 30, cell.VISITED_COLOR_2, GREY, grid),
+            LegendCell(win, grid.x, height - 30, cell.UNVISITED_COLOR, GREY, LEGEND_CELL_SIZE),
+            LegendCell(win, grid.x + 130, height - 30, cell.WALL_COLOR, GREY, LEGEND_CELL_SIZE),
+            LegendCell(win, grid.x + 230, height - 30, cell.OPEN_COLOR, GREY, LEGEND_CELL_SIZE),
+            LegendCell(win, grid.x + 330, height - 30, cell.PATH_COLOR, GREY, LEGEND_CELL_SIZE),
+            LegendCell(win, grid.x + 430, height - 30, cell.VISITED_COLOR_1, GREY, LEGEND_CELL_SIZE),
+            LegendCell(win, grid.x + 455, height - 30, cell.VISITED_COLOR_2, GREY, LEGEND_CELL_SIZE),
         ]
 
         self.clear_button = pygame_gui.elements.UIButton(
@@ -135,25 +150,109 @@ class GUI:
             text="Add Parcel",
             manager=ui_manager,
         )
+
+        self.brush_menu = pygame_gui.elements.UIDropDownMenu(
+            options_list=[brush for brush in brushes],
+            starting_option=brushes.WALL,
+            relative_rect=pygame.Rect(
+                (
+                    self.parcel_button.get_abs_rect().x
+                    + self.parcel_button.get_abs_rect().width
+                    + GUI_ELEMENT_OFFSET,
+                    grid.y / 2 - 15,
+                ),
+                (175, 30),
+            ),
+            manager=ui_manager,
+        )
+
+        # bottom bar menus open upwards, there's no room below them
+        self.movement_menu = pygame_gui.elements.UIDropDownMenu(
+            options_list=[movement for movement in movements],
+            starting_option=movements.FOUR_DIRECTIONS,
+            relative_rect=pygame.Rect((grid.x + 600, height - 33), (245, LEGEND_CELL_SIZE + 6)),
+            manager=ui_manager,
+            object_id=ObjectID(object_id=None, class_id="@bottom_bar_menus"),
+        )
+
+        self.heuristic_menu = pygame_gui.elements.UIDropDownMenu(
+            options_list=[heuristic for heuristic in heuristics],
+            starting_option=heuristics.DEFAULT,
+            relative_rect=pygame.Rect((grid.x + 855, height - 33), (140, LEGEND_CELL_SIZE + 6)),
+            manager=ui_manager,
+            object_id=ObjectID(object_id=None, class_id="@bottom_bar_menus"),
+        )
+
         self.speed_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 1000, height - 32), (50, grid.gap + 5)),
+            relative_rect=pygame.Rect((grid.x + 1000, height - 32), (50, LEGEND_CELL_SIZE + 5)),
             text="Speed:",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
         self.speed_slider = pygame_gui.elements.UIHorizontalSlider(
-            start_value=animation_speed,
-            value_range=(animation_speed - animation_speed / 2, animation_speed + animation_speed / 2,),
-            relative_rect=pygame.Rect((grid.x + 1050, height - 32), (200, grid.gap + 5)),
+            start_value=math.log10(animation_speed),
+            value_range=(math.log10(MIN_ANIMATION_SPEED), math.log10(MAX_ANIMATION_SPEED)),
+            relative_rect=pygame.Rect((grid.x + 1050, height - 32), (200, LEGEND_CELL_SIZE + 5)),
             manager=ui_manager,
         )
 
         self.speed_value_lable = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((grid.x + 1250, height - 32), (35, grid.gap + 5)),
+            relative_rect=pygame.Rect((grid.x + 1250, height - 32), (35, LEGEND_CELL_SIZE + 5)),
             text="x",
             manager=ui_manager,
             object_id=ObjectID(object_id=None, class_id="@legend_cell_lables"),
         )
 
+        self.update_speed_lable()
+
+        # shown over the grid when the end (or a parcel) is walled off from the start
+        self.no_path_lable = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((grid.x + grid.width / 2 - 80, grid.y + 10), (160, 30)),
+            text="No path",
+            manager=ui_manager,
+            object_id="#no_path_lable",
+        )
+        self.no_path_lable.hide()
+
+        # position in the recorded run, shown over the bottom of the grid while there is one
+        self.scrub_slider = pygame_gui.elements.UIHorizontalSlider(
+            start_value=0.0,
+            value_range=(0.0, 1.0),
+            relative_rect=pygame.Rect((grid.x + 10, grid.y + grid.height - 30), (grid.width - 20, LEGEND_CELL_SIZE + 5)),
+            manager=ui_manager,
+            click_increment=0.01,
+        )
+        self.scrub_slider.hide()
+
+
+    def get_animation_speed(self) -> int:
+
+        """Returns animation speed (steps per second) selected with the slider"""
+
+        return round(10 ** self.speed_slider.get_current_value())
+
+
+    def update_speed_lable(self) -> None:
         self.speed_value_lable.set_text(f"{round(self.speed_slider.current_percentage * 100)}%")
+
+
+    def show_no_path(self, shown: bool) -> None:
+
+        """Shows or hides the message that there is no path"""
+
+        if shown:
+            self.no_path_lable.show()
+        else:
+            self.no_path_lable.hide()
+
+
+    def show_progress(self, progress: float = None) -> None:
+
+        """Moves the scrub slider to the progress (0 to 1) of the playback, None hides it"""
+
+        if progress is None:
+            self.scrub_slider.hide()
+        else:
+            self.scrub_slider.show()
+            self.scrub_slider.set_current_value(progress)
@@ -0,0 +1,69 @@
+import numpy as np
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+from grid import Grid
+from utils import Heuristic
+
+# tables kept per grid (end and parcel with a couple of heuristics or weight scales)
+MAX_TABLES = 4
+# on bigger grids values are computed on demand, a table per goal would cost too much time and memory
+MAX_TABLE_CELLS = 1 << 22
+
+_tables_by_grid = WeakKeyDictionary()
+
+# NumPy versions of the heuristics, taking absolute row and column differences to the goal
+VECTORIZED_HEURISTICS = {
+    Heuristic.manhattan: lambda rows, cols: rows + cols,
+    Heuristic.octil: lambda rows, cols: np.maximum(rows, cols) + (2**0.5 - 1) * np.minimum(rows, cols),
+    Heuristic.chebyshev: np.maximum,
+    Heuristic.euclidean: lambda rows, cols: (rows**2 + cols**2) ** 0.5,
+}
+
+
+class HeuristicValues:
+
+    """Heuristic values of cells towards the goal computed on demand,
+        indexed by flat cell index the same way as a table"""
+
+    def __init__(self, grid: Grid, goal: int, heuristic, scale: int = 1):
+        self.columns = grid.total_columns
+        self.goal_pos = divmod(goal, grid.total_columns)
+        self.heuristic = heuristic
+        self.scale = scale
+
+    def __getitem__(self, index: int):
+        return self.scale * self.heuristic(divmod(index, self.columns), self.goal_pos)
+
+
+def compute_table(grid: Grid, goal: int, heuristic, scale: int = 1) -> memoryview:
+
+    """Returns heuristic values (multiplied by the scale) of every cell towards the goal,
+        computed in one vectorized pass, integer heuristics give integer tables"""
+
+    goal_row, goal_col = divmod(goal, grid.total_columns)
+    rows = np.abs(np.arange(grid.total_rows) - goal_row)[:, None]
+    cols = np.abs(np.arange(grid.total_columns) - goal_col)[None, :]
+
+    values = scale * VECTORIZED_HEURISTICS[heuristic](rows, cols)
+    if values.dtype.kind == "i":
+        values = values.astype(np.int32)
+    return memoryview(np.ascontiguousarray(values).ravel())
+
+
+def get_heuristic_table(grid: Grid, goal: int, heuristic=Heuristic.manhattan, scale: int = 1):
+
+    """Returns cached heuristic values of every cell towards the goal (indexed by flat cell index),
+        least recently used tables are dropped"""
+
+    if heuristic not in VECTORIZED_HEURISTICS or grid.total_rows * grid.total_columns > MAX_TABLE_CELLS:
+        return HeuristicValues(grid, goal, heuristic, scale)
+
+    key = (goal, heuristic, scale)
+    tables = _tables_by_grid.setdefault(grid, OrderedDict())
+    table = tables.get(key)
+    if table is None:
+        table = tables[key] = compute_table(grid, goal, heuristic, scale)
+        if len(tables) > MAX_TABLES:
+            tables.popitem(last=False)
+    tables.move_to_end(key)
+    return table
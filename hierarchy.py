@@ -0,0 +1,462 @@
+import numpy as np
+from heapq import heappush, heappop
+from collections import defaultdict, deque
+from weakref import WeakKeyDictionary
+from cell import Cell, WALL, DOWN, RIGHT
+from grid import Grid, FOUR_DIRECTIONS, DIAGONAL_COST
+from open_list import HeapOpenList
+from algo import Trace, astar, to_cells
+
+INF = float("inf")
+
+# clusters are squares of this many cells per side (smaller ones at the bottom and right edges)
+CLUSTER_SIZE = 16
+# open stretches of a border at least this long get a transition at both ends, shorter ones one in the middle
+MIN_DOUBLE_ENTRANCE = 6
+
+_hierarchies_by_grid = WeakKeyDictionary()
+
+
+class Hierarchy:
+
+    """Abstract graph of the grid for hierarchical pathfinding (HPA*): the grid is split into clusters,
+        open stretches of cluster borders become entrances with transitions (pairs of entrance cells
+        one move apart) and entrance cells of one cluster are connected by their shortest distances inside
+        of it. Distances and refined paths inside of a cluster are computed when a search first needs them.
+        Wall edits invalidate only clusters they touch (and entrances and distances of their neighbors)"""
+
+    def __init__(self, grid: Grid, cluster_size: int = CLUSTER_SIZE):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.cluster_rows = -(-grid.total_rows // cluster_size)
+        self.cluster_columns = -(-grid.total_columns // cluster_size)
+        self.rebuild()
+
+
+    def rebuild(self) -> None:
+
+        """Finds entrances of all clusters from scratch, throws away cached distances"""
+
+        grid, size = self.grid, self.cluster_size
+        self.movement = grid.movement
+        self.walls_version = grid.walls_version
+        self.applied_edits = len(grid.wall_edits)
+        self.walls = grid.states == WALL
+
+        # entrance cell -> {entrance cell of a neighboring cluster: cost of the move}
+        self.transitions = defaultdict(dict)
+        # cluster -> entrance cells in it
+        self.nodes = defaultdict(set)
+        # cluster -> {entrance cell: [(entrance cell, distance)]} and cluster -> {(cell, cell): path},
+        # transitions only change next to dirty clusters, whose neighbors lose these anyway
+        self.edges = {}
+        self.paths = {}
+
+        for col in range(size, grid.total_columns, size):
+            self.connect_border(True, col, 0, grid.total_rows)
+        for row in range(size, grid.total_rows, size):
+            self.connect_border(False, row, 0, grid.total_columns)
+            for col in range(size, grid.total_columns, size):
+                self.connect_corner(row, col)
+
+
+    def cluster_of(self, index: int) -> int:
+        row, col = divmod(index, self.grid.total_columns)
+        return row // self.cluster_size * self.cluster_columns + col // self.cluster_size
+
+
+    def cluster_bounds(self, cluster: int) -> tuple:
+
+        """Returns (first row, last row, first column, last column) of the cluster, last ones exclusive"""
+
+        size = self.cluster_size
+        cluster_row, cluster_col = divmod(cluster, self.cluster_columns)
+        first_row, first_col = cluster_row * size, cluster_col * size
+        return (
+            first_row, min(first_row + size, self.grid.total_rows),
+            first_col, min(first_col + size, self.grid.total_columns),
+        )
+
+
+    def add_transition(self, first: int, second: int, cost: float) -> None:
+        self.transitions[first][second] = cost
+        self.transitions[second][first] = cost
+        self.nodes[self.cluster_of(first)].add(first)
+        self.nodes[self.cluster_of(second)].add(second)
+
+
+    def remove_transition(self, first: int, second: int) -> None:
+
+        """Removes the transition, cells left without transitions stop being entrances"""
+
+        for cell, other in ((first, second), (second, first)):
+            transitions = self.transitions[cell]
+            del transitions[other]
+            if not transitions:
+                del self.transitions[cell]
+                self.nodes[self.cluster_of(cell)].discard(cell)
+
+
+    def connect_border(self, vertical: bool, line: int, first: int, last: int) -> None:
+
+        """Adds transitions across a border line between clusters, the column line (cells left of it
+            and the column itself) if vertical, row line otherwise, only for first..last cells along it"""
+
+        grid, size = self.grid, self.cluster_size
+        columns = grid.total_columns
+        if not 0 < line < (columns if vertical else grid.total_rows):
+            return
+        if vertical:
+            before = np.s_[first:last, line - 1]
+            blocked_bit, step = RIGHT, 1
+        else:
+            before = np.s_[line - 1, first:last]
+            blocked_bit, step = DOWN, columns
+
+        passable = (grid.states[before] != WALL) & (grid.adjacency_array[before] & blocked_bit == 0)
+
+        # open stretches, split where clusters along the line change
+        positions = np.arange(first, last)
+        previous = np.concatenate(([False], passable[:-1])) & (positions % size != 0)
+        following = np.concatenate((passable[1:], [False])) & ((positions + 1) % size != 0)
+        starts = positions[passable & ~previous].tolist()
+        ends = positions[passable & ~following].tolist()
+
+        for start, end in zip(starts, ends):
+            crossings = (start, end) if end - start + 1 >= MIN_DOUBLE_ENTRANCE else ((start + end) // 2,)
+            for position in crossings:
+                cell = position * columns + line - 1 if vertical else (line - 1) * columns + position
+                self.add_transition(cell, cell + step, 1)
+
+
+    def connect_corner(self, row: int, col: int) -> None:
+
+        """Adds diagonal transitions across the corner where four clusters meet (row and col are their
+            first row and column), if the movement policy allows them"""
+
+        grid = self.grid
+        if grid.movement == FOUR_DIRECTIONS:
+            return
+        for cell, offset in self.corner_moves(row, col):
+            if grid.flat_states[cell] != WALL and offset in grid.neighbor_offsets[grid.adjacency[cell]]:
+                self.add_transition(cell, cell + offset, DIAGONAL_COST)
+
+
+    def corner_moves(self, row: int, col: int) -> tuple:
+
+        """Returns both diagonal moves (cell, offset) across the corner, none at edges of the map"""
+
+        grid = self.grid
+        if not 0 < row < grid.total_rows or not 0 < col < grid.total_columns:
+            return ()
+        columns = grid.total_columns
+        return ((row - 1) * columns + col - 1, columns + 1), ((row - 1) * columns + col, columns - 1)
+
+
+    def update(self) -> None:
+
+        """Brings the graph up to date with walls: edits since the last update mark their clusters dirty,
+            a rebuild of adjacency (maze generation, clearing) is diffed against the walls seen last time"""
+
+        grid = self.grid
+        if grid.movement != self.movement:
+            self.rebuild()
+            return
+
+        dirty = set()
+        if grid.walls_version != self.walls_version:
+            for first, last in grid.row_bands():
+                walls = grid.states[first:last] == WALL
+                rows, cols = np.nonzero(walls != self.walls[first:last])
+                clusters = (rows + first) // self.cluster_size * self.cluster_columns + cols // self.cluster_size
+                dirty.update(np.unique(clusters).tolist())
+                self.walls[first:last] = walls
+            self.walls_version = grid.walls_version
+        else:
+            for index in grid.wall_edits[self.applied_edits:]:
+                self.walls.flat[index] = grid.flat_states[index] == WALL
+                dirty.add(self.cluster_of(index))
+        self.applied_edits = len(grid.wall_edits)
+
+        if len(dirty) > self.cluster_rows * self.cluster_columns // 2:
+            self.rebuild()
+        elif dirty:
+            self.invalidate(dirty)
+
+
+    def neighbor_clusters(self, cluster: int) -> list[int]:
+        cluster_row, cluster_col = divmod(cluster, self.cluster_columns)
+        return [
+            row * self.cluster_columns + col
+            for row in range(max(cluster_row - 1, 0), min(cluster_row + 2, self.cluster_rows))
+            for col in range(max(cluster_col - 1, 0), min(cluster_col + 2, self.cluster_columns))
+        ]
+
+
+    def invalidate(self, dirty: set) -> None:
+
+        """Finds entrances on all borders and corners of dirty clusters again, distances of the dirty
+            clusters and their neighbors (whose entrances on the shared borders may have changed) are dropped"""
+
+        transitions = self.transitions
+        for cluster in dirty:
+            for node in list(self.nodes.get(cluster, ())):
+                for other in list(transitions[node]):
+                    self.remove_transition(node, other)
+
+            # diagonal transitions across a corner depend on cells of the two clusters beside it
+            first_row, last_row, first_col, last_col = self.cluster_bounds(cluster)
+            for row in (first_row, last_row):
+                for col in (first_col, last_col):
+                    for cell, offset in self.corner_moves(row, col):
+                        if cell + offset in transitions.get(cell, ()):
+                            self.remove_transition(cell, cell + offset)
+
+        for cluster in dirty:
+            first_row, last_row, first_col, last_col = self.cluster_bounds(cluster)
+            self.connect_border(True, first_col, first_row, last_row)
+            self.connect_border(True, last_col, first_row, last_row)
+            self.connect_border(False, first_row, first_col, last_col)
+            self.connect_border(False, last_row, first_col, last_col)
+            for row in (first_row, last_row):
+                for col in (first_col, last_col):
+                    self.connect_corner(row, col)
+
+        for cluster in dirty:
+            for neighbor in self.neighbor_clusters(cluster):
+                self.edges.pop(neighbor, None)
+                self.paths.pop(neighbor, None)
+
+
+    def cluster_graph(self, cluster: int) -> tuple:
+
+        """Returns cells of the cluster that aren't walls as (cells, {cell: position}, moves),
+            moves of every position are (position, cost) pairs that stay inside of the cluster"""
+
+        grid = self.grid
+        flat_states, adjacency = grid.flat_states, grid.adjacency
+        neighbor_steps, step_costs = grid.neighbor_steps, grid.step_costs
+        columns = grid.total_columns
+        first_row, last_row, first_col, last_col = self.cluster_bounds(cluster)
+
+        cells = [
+            index
+            for row in range(first_row, last_row)
+            for index in range(row * columns + first_col, row * columns + last_col)
+            if flat_states[index] != WALL
+        ]
+        positions = {cell: position for position, cell in enumerate(cells)}
+        moves = [
+            [
+                (positions[cell + offset], step_costs[direction])
+                for offset, direction in neighbor_steps[adjacency[cell]]
+                if cell + offset in positions
+            ]
+            for cell in cells
+        ]
+        return cells, positions, moves
+
+
+    def local_distances(self, cluster: int, sources, targets) -> dict:
+
+        """Returns {source: {target: distance}} of paths inside of the cluster, unreachable targets are left out"""
+
+        _, positions, moves = self.cluster_graph(cluster)
+        targets = list(targets)
+        target_positions = [positions[target] for target in targets]
+        unit_costs = self.grid.movement == FOUR_DIRECTIONS
+
+        distances = {}
+        for source in sources:
+            costs, _ = graph_search(moves, positions[source], target_positions, unit_costs)
+            distances[source] = {
+                target: costs[position]
+                for target, position in zip(targets, target_positions)
+                if costs[position] != INF
+            }
+        return distances
+
+
+    def cluster_edges(self, cluster: int) -> dict:
+
+        """Returns abstract edges of entrance cells of the cluster: distances to other entrance cells
+            inside of it followed by their transitions, computed on first use"""
+
+        edges = self.edges.get(cluster)
+        if edges is None:
+            nodes = self.nodes.get(cluster, ())
+            distances = self.local_distances(cluster, nodes, nodes)
+            edges = self.edges[cluster] = {
+                node: [(other, distance) for other, distance in distances[node].items() if other != node]
+                + list(self.transitions[node].items())
+                for node in nodes
+            }
+        return edges
+
+
+    def local_path(self, source: int, target: int, cluster: int) -> list[int]:
+
+        """Returns cells of the shortest path from the source to the target inside of the cluster
+            (without the source), refined paths are kept until the cluster changes"""
+
+        paths = self.paths.setdefault(cluster, {})
+        path = paths.get((source, target))
+        if path is None:
+            cells, positions, moves = self.cluster_graph(cluster)
+            _, parents = graph_search(moves, positions[source], (positions[target],), self.grid.movement == FOUR_DIRECTIONS)
+            path = []
+            position = positions[target]
+            while position != positions[source]:
+                path.append(cells[position])
+                position = parents[position]
+            path.reverse()
+            paths[source, target] = path
+        return path
+
+
+    def find_path(self, start: int, end: int, trace: Trace = None) -> list[int]:
+
+        """A* over the abstract graph with the start and end connected to entrances of their clusters,
+            the abstract path is then refined cluster by cluster. Returns path cell indices
+            (without the start and end) or None if there is no path"""
+
+        columns = self.grid.total_columns
+        heuristic = self.grid.default_heuristic()
+        end_pos = divmod(end, columns)
+        start_cluster, end_cluster = self.cluster_of(start), self.cluster_of(end)
+
+        # temporary edges of the start and the end, a direct one if they share the cluster
+        start_targets = self.nodes.get(start_cluster, set()) | ({end} if start_cluster == end_cluster else set())
+        start_edges = [
+            (node, cost) for node, cost in self.local_distances(start_cluster, (start,), start_targets)[start].items()
+            if node != start
+        ]
+        end_edges = self.local_distances(end_cluster, (end,), self.nodes.get(end_cluster, ()))[end]
+
+        g_score, parents = {start: 0}, {start: None}
+        closed = set()
+        open_set = HeapOpenList()
+        # among equally promising nodes the deeper one goes first, open maps are full of such ties
+        open_set.push(start, (heuristic(divmod(start, columns), end_pos), 0))
+
+        while open_set:
+            current = open_set.pop()
+            if current == end:
+                break
+            closed.add(current)
+
+            neighbors = []
+            if current == start:
+                neighbors += start_edges
+            if current in self.transitions:
+                neighbors += self.cluster_edges(self.cluster_of(current))[current]
+            if current in end_edges:
+                neighbors.append((end, end_edges[current]))
+
+            for neighbor, cost in neighbors:
+                if neighbor in closed:
+                    continue
+                temp_g_score = g_score[current] + cost
+                if temp_g_score < g_score.get(neighbor, INF):
+                    g_score[neighbor] = temp_g_score
+                    parents[neighbor] = current
+                    if trace is not None and neighbor not in open_set and neighbor != end:
+                        trace.open(neighbor)
+                    open_set.push(neighbor, (temp_g_score + heuristic(divmod(neighbor, columns), end_pos), -temp_g_score))
+
+            if trace is not None:
+                if current != start:
+                    trace.visit(current)
+                trace.end_step()
+        else:
+            return None
+
+        abstract_path = [end]
+        while parents[abstract_path[-1]] is not None:
+            abstract_path.append(parents[abstract_path[-1]])
+        abstract_path.reverse()
+
+        # transitions are single moves between clusters, other abstract edges stay inside one cluster
+        path = []
+        for source, target in zip(abstract_path, abstract_path[1:]):
+            cluster = self.cluster_of(source)
+            if cluster != self.cluster_of(target):
+                path.append(target)
+            else:
+                path += self.local_path(source, target, cluster)
+
+        path.pop()
+        return path
+
+
+def graph_search(moves: list, source: int, targets, unit_costs: bool) -> tuple:
+
+    """Searches a cluster graph from the source position until all target positions are settled
+        (BFS if every move costs 1, Dijkstra otherwise), returns (costs, parents) indexed by position"""
+
+    costs = [INF] * len(moves)
+    parents = [None] * len(moves)
+    costs[source] = 0
+    remaining = set(targets)
+    remaining.discard(source)
+
+    if unit_costs:
+        queue = deque([source])
+        while queue and remaining:
+            current = queue.popleft()
+            next_cost = costs[current] + 1
+            for neighbor, _ in moves[current]:
+                if costs[neighbor] == INF:
+                    costs[neighbor] = next_cost
+                    parents[neighbor] = current
+                    remaining.discard(neighbor)
+                    queue.append(neighbor)
+    else:
+        heap = [(0, source)]
+        while heap and remaining:
+            cost, current = heappop(heap)
+            if cost > costs[current]:
+                continue
+            remaining.discard(current)
+            for neighbor, step_cost in moves[current]:
+                new_cost = cost + step_cost
+                if new_cost < costs[neighbor]:
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = current
+                    heappush(heap, (new_cost, neighbor))
+
+    return costs, parents
+
+
+def get_hierarchy(grid: Grid) -> Hierarchy:
+
+    """Returns the grid's abstract graph, brought up to date with wall edits"""
+
+    hierarchy = _hierarchies_by_grid.get(grid)
+    if hierarchy is None:
+        hierarchy = _hierarchies_by_grid[grid] = Hierarchy(grid)
+    else:
+        hierarchy.update()
+    return hierarchy
+
+
+def hpa_star(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+) -> list[Cell]:
+
+    """Hierarchical A*: searches the cached abstract graph of clusters and refines the result,
+        so long queries cost about the number of clusters along the way. Paths are near optimal
+        (entrances are fixed points of the borders), weighted maps are left to A*"""
+
+    if grid.is_weighted():
+        return astar(grid, start, end, trace)
+    if start.is_wall() or end.is_wall():
+        return None
+
+    path = get_hierarchy(grid).find_path(start.index, end.index, trace)
+    if path is None:
+        return None
+    return to_cells(grid, path)
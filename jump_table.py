@@ -0,0 +1,108 @@
+import numpy as np
+from weakref import WeakKeyDictionary
+from cell import DOWN, UP, RIGHT, LEFT
+from grid import Grid
+
+_tables_by_grid = WeakKeyDictionary()
+
+
+class JumpTable:
+
+    """Precomputed jump point search scans of a wall layout: for every cell and direction
+        (codes of grid.direction_offsets) the number of steps a scan entering the cell goes
+        before it stops. Scans stop at a jump point (stored as the distance) or in front
+        of a wall or the edge of the map (stored as -1 - distance). Computed with NumPy
+        for the whole grid at once, so a jump is a single lookup"""
+
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.walls_key = (grid.walls_version, len(grid.wall_edits))
+        self.jumps = [memoryview(distances.ravel()) for distances in self.compute()]
+
+
+    def compute(self) -> tuple:
+        adjacency = self.grid.adjacency_array
+        dtype = np.int16 if max(self.grid.grid_size) < 2**15 else np.int32
+
+        # a scan stops where a side is open but was blocked at the cell it came from (forced neighbor)
+        forced_right = np.zeros(adjacency.shape, dtype=bool)
+        forced_left = np.zeros(adjacency.shape, dtype=bool)
+        forced_down = np.zeros(adjacency.shape, dtype=bool)
+        forced_up = np.zeros(adjacency.shape, dtype=bool)
+        forced_right[:, 1:] = adjacency[:, :-1] & ~adjacency[:, 1:] & (UP | DOWN)
+        forced_left[:, :-1] = adjacency[:, 1:] & ~adjacency[:, :-1] & (UP | DOWN)
+        forced_down[1:] = adjacency[:-1] & ~adjacency[1:] & (LEFT | RIGHT)
+        forced_up[:-1] = adjacency[1:] & ~adjacency[:-1] & (LEFT | RIGHT)
+
+        right = scan_distances(forced_right, adjacency & RIGHT != 0, dtype)
+        left = scan_distances(forced_left[:, ::-1], adjacency[:, ::-1] & LEFT != 0, dtype)[:, ::-1]
+
+        # vertical scans also stop at cells, from which a horizontal scan finds a jump point
+        sideways = np.zeros(adjacency.shape, dtype=bool)
+        sideways[:, :-1] = (adjacency[:, :-1] & RIGHT == 0) & (right[:, 1:] >= 0)
+        sideways[:, 1:] |= (adjacency[:, 1:] & LEFT == 0) & (left[:, :-1] >= 0)
+        forced_down |= sideways
+        forced_up |= sideways
+
+        down = scan_distances(forced_down.T, adjacency.T & DOWN != 0, dtype).T
+        up = scan_distances(forced_up.T[:, ::-1], adjacency.T[:, ::-1] & UP != 0, dtype)[:, ::-1].T
+
+        return tuple(np.ascontiguousarray(distances) for distances in (down, up, right, left))
+
+
+    def is_valid(self) -> bool:
+
+        """Checks if walls haven't changed since the table has been computed"""
+
+        return self.walls_key == (self.grid.walls_version, len(self.grid.wall_edits))
+
+
+    def scan_length(self, index: int, direction: int) -> int:
+
+        """Returns number of steps a scan entering the cell in the direction goes, jump point or not"""
+
+        distance = self.jumps[direction][index]
+        return distance if distance >= 0 else -1 - distance
+
+
+    def scanned_cells(self, first: int, direction: int, last: int) -> list[int]:
+
+        """Returns cells passed over by a scan from the first to the last cell, vertical scans
+            include the horizontal scans done from each of their cells"""
+
+        offset = self.grid.direction_offsets[direction]
+        cells = list(range(first, last + offset, offset))
+        if direction > 1:
+            return cells
+
+        adjacency = self.grid.adjacency
+        for index in cells[:]:
+            for side in (2, 3):
+                if not adjacency[index] & (RIGHT, LEFT)[side - 2]:
+                    side_offset = self.grid.direction_offsets[side]
+                    length = self.scan_length(index + side_offset, side)
+                    cells.extend(range(index + side_offset, index + side_offset * (length + 2), side_offset))
+        return cells
+
+
+def scan_distances(forced: np.ndarray, blocked: np.ndarray, dtype: type) -> np.ndarray:
+
+    """Returns distances from every cell to the first stop of a scan along the rows
+        towards higher columns, negative (-1 - distance) if the stop isn't a jump point"""
+
+    positions = np.arange(forced.shape[1], dtype=np.int32)
+    stops = np.where(forced | blocked, positions, np.int32(forced.shape[1] - 1))
+    next_stops = np.minimum.accumulate(stops[:, ::-1], axis=1)[:, ::-1]
+    distances = (next_stops - positions).astype(dtype)
+    jump_points = np.take_along_axis(forced, next_stops, axis=1)
+    return np.where(jump_points, distances, -1 - distances)
+
+
+def get_jump_table(grid: Grid) -> JumpTable:
+
+    """Returns cached jump table of the grid, recomputed after wall edits"""
+
+    table = _tables_by_grid.get(grid)
+    if table is None or not table.is_valid():
+        table = _tables_by_grid[grid] = JumpTable(grid)
+    return table
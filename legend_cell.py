@@ -1,22 +1,23 @@
 import pygame
-from grid import Grid
 
 class LegendCell:
-    def __init__(self, win, x, y, color, frame_color, grid: Grid) -> None:
+    def __init__(self, win, x, y, color, frame_color, size: int) -> None:
         self.win = win
         self.x = x
         self.y = y
         self.color = color
-        self.width, self.height = grid.gap, grid.gap
+        self.width, self.height = size, size
         self.frame_color = frame_color
         
 
-    def draw_legend_cell(self):
+    def draw_legend_cell(self, surface=None):
 
         """Draws cell with outlines"""
         
-        pygame.draw.rect(self.win, self.color, (self.x, self.y, self.width, self.height))
-        pygame.draw.line(self.win, self.frame_color, (self.x, self.y), (self.x,  self.y + self.height))
-        pygame.draw.line(self.win, self.frame_color, (self.x + self.width, self.y), (self.x + self.width, self.y + self.height))
-        pygame.draw.line(self.win, self.frame_color, (self.x, self.y), (self.x + self.width, self.y))
-        pygame.draw.line(self.win, self.frame_color, (self.x, self.y + self.height), (self.x + self.width,  self.y + self.height))
\ No newline at end of file
+        if surface is None:
+            surface = self.win
+        pygame.draw.rect(surface, self.color, (self.x, self.y, self.width, self.height))
+        pygame.draw.line(surface, self.frame_color, (self.x, self.y), (self.x,  self.y + self.height))
+        pygame.draw.line(surface, self.frame_color, (self.x + self.width, self.y), (self.x + self.width, self.y + self.height))
+        pygame.draw.line(surface, self.frame_color, (self.x, self.y), (self.x + self.width, self.y))
+        pygame.draw.line(surface, self.frame_color, (self.x, self.y + self.height), (self.x + self.width,  self.y + self.height))
\ No newline at end of file
@@ -1,15 +1,28 @@
 import os
 import random
+import argparse
+import threading
+import functools
 import maze
 import algo
+import replanning
+import distance_field
+import tour
+import hierarchy
+import components
+import maps
 import cell
 import pygame
+import visualizer
 import pygame_gui
-from gui import GUI
-from grid import Grid
+import numpy as np
+from gui import GUI, selected_option
+from grid import Grid, MIN_WEIGHT, FOUR_DIRECTIONS, NO_CORNER_CUTTING, CORNER_CUTTING
+from utils import Heuristic
+from renderer import Renderer
+from animation import Animator, CancelToken
 from typing import Callable
 from strenum import StrEnum
-from legend_cell import LegendCell
 
 
 WIDTH, HEIGHT = 1291, 765
@@ -17,17 +30,23 @@ GRID_WIDTH, GRID_HEIGHT = 1280, 680
 GRID_SIZE = (34, 64)  # (rows, columns)
 GRID_POSITION = ((WIDTH - GRID_WIDTH) / 2, (HEIGHT - GRID_HEIGHT) / 2)
 ANIMATION_SPEED = 250
+ZOOM_STEP = 1.25  # cell size multiplier per mouse wheel step
+PAN_STEP = 100  # pixels per arrow key press
 
 
 BG_COLOR = (64, 227, 206)  # green
 ANIMATION = True
+# Ctrl+S saves here unless a map has been opened
+DEFAULT_MAP_FILE = "map" + maps.MAP_EXTENSION
+# random cells tried for a new parcel before free cells of the whole map are counted
+PARCEL_DRAWS = 32
 
 
 pygame.init()
 FPS = 240
 WIN = pygame.display.set_mode((WIDTH, HEIGHT))
 UI_MANAGER = pygame_gui.UIManager((WIDTH, HEIGHT), "gui_theme.json")
-LOGO = pygame.transform.scale(pygame.image.load(os.path.join("assets\imgs", "logo.png")).convert_alpha(), (35, 35))
+LOGO = pygame.transform.scale(pygame.image.load(os.path.join("assets", "imgs", "logo.png")).convert_alpha(), (35, 35))
 pygame.display.set_caption("Pathfinding Visualizer")
 pygame.display.set_icon(LOGO)
 
@@ -39,6 +58,12 @@ class Algorithms(StrEnum):
     BFS = "Breadth-first Search"
     GBFS = "Greedy Best-first Search"
     BBFS = "Bidirectional BFS"
+    BIDIRECTIONAL_ASTAR = "Bidirectional A*"
+    BIDIRECTIONAL_DIJKSTRA = "Bidirectional Dijkstra"
+    DSTAR_LITE = "D* Lite (Incremental)"
+    WAVEFRONT = "Wavefront Distance Field"
+    JPS = "Jump Point Search"
+    HPA = "Hierarchical A* (HPA*)"
 
 
 class Mazes(StrEnum):
@@ -48,56 +73,143 @@ class Mazes(StrEnum):
     STAIR = "Stair Pattern Maze"
 
 
+class Brushes(StrEnum):
+    WALL = "Wall Brush"
+    WEIGHT_3 = "Weight 3 Brush"
+    WEIGHT_5 = "Weight 5 Brush"
+    WEIGHT_9 = "Weight 9 Brush"
+
+
+class Movements(StrEnum):
+    FOUR_DIRECTIONS = "4 Directions"
+    NO_CORNER_CUTTING = "8 Directions, No Corner Cutting"
+    CORNER_CUTTING = "8 Directions, Corner Cutting"
+
+
+class Heuristics(StrEnum):
+    DEFAULT = "Default Heuristic"
+    MANHATTAN = "Manhattan"
+    OCTILE = "Octile"
+    CHEBYSHEV = "Chebyshev"
+    EUCLIDEAN = "Euclidean"
+
+
+ALGORITHM_FUNCTIONS = {
+    Algorithms.ASTAR: algo.astar,
+    Algorithms.DIJKSTRA: algo.dijkstra,
+    Algorithms.DFS: algo.dfs,
+    Algorithms.BFS: algo.bfs,
+    Algorithms.GBFS: algo.gbfs,
+    Algorithms.BBFS: algo.bidirectional_bfs,
+    Algorithms.BIDIRECTIONAL_ASTAR: algo.bidirectional_astar,
+    Algorithms.BIDIRECTIONAL_DIJKSTRA: algo.bidirectional_dijkstra,
+    Algorithms.DSTAR_LITE: replanning.d_star_lite,
+    Algorithms.WAVEFRONT: distance_field.wavefront,
+    Algorithms.JPS: algo.jump_point_search,
+    Algorithms.HPA: hierarchy.hpa_star,
+}
+
+MAZE_FUNCTIONS = {
+    Mazes.RECDIV: maze.recursive_division_maze_gen,
+    Mazes.RANDOM_DFS: maze.random_dfs_maze_gen,
+    Mazes.SPIRAL: maze.spiral_maze,
+    Mazes.STAIR: maze.stair_pattern_maze,
+}
+
+MOVEMENT_POLICIES = {
+    Movements.FOUR_DIRECTIONS: FOUR_DIRECTIONS,
+    Movements.NO_CORNER_CUTTING: NO_CORNER_CUTTING,
+    Movements.CORNER_CUTTING: CORNER_CUTTING,
+}
+
+# default heuristic is the tightest admissible one for the movement policy
+HEURISTIC_FUNCTIONS = {
+    Heuristics.MANHATTAN: Heuristic.manhattan,
+    Heuristics.OCTILE: Heuristic.octil,
+    Heuristics.CHEBYSHEV: Heuristic.chebyshev,
+    Heuristics.EUCLIDEAN: Heuristic.euclidean,
+}
+
+# algorithms guided by the selected heuristic
+HEURISTIC_ALGORITHMS = (Algorithms.ASTAR, Algorithms.GBFS, Algorithms.BIDIRECTIONAL_ASTAR)
+
+# traversal weight painted by each brush, the wall brush paints walls instead
+BRUSH_WEIGHTS = {
+    Brushes.WEIGHT_3: 3,
+    Brushes.WEIGHT_5: 5,
+    Brushes.WEIGHT_9: 9,
+}
+
+
 def draw(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
+    renderer: Renderer, 
     ui_manager: pygame_gui.UIManager, 
     time_delta: float, 
-    legend_cells: list[LegendCell],
 ) -> None:
     
-    """Draws stuff to the screen every frame"""
+    """Draws stuff to the screen every frame (only what has changed since the last one)"""
 
-    win.fill(BG_COLOR)
-    grid.draw_under_grid_lines()
-    grid.draw_grid_lines()
-    grid.draw_over_grid_lines()
     ui_manager.update(time_delta)
-    grid.draw_grid_frame()
-
-    for legend_cell in legend_cells:
-        legend_cell.draw_legend_cell()
+    renderer.draw_frame()
 
-    ui_manager.draw_ui(WIN)
-    pygame.display.update()
 
-
-def main() -> None:
+def main(grid_size: tuple = GRID_SIZE, map_path: str = None) -> None:
     animation_speed = 250
    
     clock = pygame.time.Clock()
-    grid = Grid(WIN, GRID_SIZE, (GRID_WIDTH, GRID_HEIGHT), GRID_POSITION)
-    gui = GUI(WIN, UI_MANAGER, grid, Algorithms, Mazes, WIDTH, HEIGHT, animation_speed)
+
+    # opened map decides the size of the grid, Ctrl+S saves it as a native map next to the opened one
+    map_file = maps.load_map(map_path) if map_path else None
+    if map_file is not None:
+        grid_size = map_file.grid_size
+        pygame.display.set_caption(f"Pathfinding Visualizer - {os.path.basename(map_path)}")
+    save_path = os.path.splitext(map_path)[0] + maps.MAP_EXTENSION if map_path else DEFAULT_MAP_FILE
+
+    grid = Grid(WIN, grid_size, (GRID_WIDTH, GRID_HEIGHT), GRID_POSITION)
+    if map_file is not None:
+        with map_file:
+            map_file.fill(grid)
+    gui = GUI(WIN, UI_MANAGER, grid, Algorithms, Mazes, Brushes, Movements, Heuristics, WIDTH, HEIGHT, animation_speed)
 
     # scales images to correct cell size
     cell.Cell.scale_cell_imgs(grid.gap, grid.gap)
+    renderer = Renderer(WIN, grid, UI_MANAGER, BG_COLOR, gui.legend_cells)
 
-    start = grid[grid.total_rows // 2][grid.total_columns // 2 - 2]
-    end = grid[grid.total_rows // 2][grid.total_columns // 2 + 2]
+    start = route_point(grid, map_file.start if map_file else None, grid.total_rows // 2, grid.total_columns // 2 - 2)
     start.make_start()
+    end = route_point(grid, map_file.end if map_file else None, grid.total_rows // 2, grid.total_columns // 2 + 2)
     end.make_end()
+    grid.center_view_on(start.row, start.col)
 
-    parcel = None
+    parcels = [grid.get_cell_by_index(index) for index in map_file.parcels] if map_file else []
 
     running = True
     start_being_dragged = False
     end_being_dragged = False
-    parcel_being_dragged = False
+    dragged_parcel = None
     algo_visualized = False
+    heatmap_shown = False
+    heatmap_field = None
+    player = None
 
     while running:
         time_delta = clock.tick(FPS) / 1000.0
-        draw(WIN, grid, UI_MANAGER, time_delta, gui.legend_cells)
+
+        # distance heatmap follows the end cell and wall edits
+        if heatmap_shown:
+            field = distance_field.get_distance_field(grid, end.index)
+            if field is not heatmap_field:
+                heatmap_field = field
+                renderer.set_heatmap(field.distances)
+
+        # recorded run plays back on the grid, the scrub slider follows it
+        if player is None:
+            gui.show_progress(None)
+        elif not player.paused:
+            player.advance(time_delta)
+            gui.show_progress(player.progress())
+
+        draw(renderer, UI_MANAGER, time_delta)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -105,12 +217,38 @@ def main() -> None:
 
             UI_MANAGER.process_events(event)
 
+            # toggle distance heatmap
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                heatmap_shown = not heatmap_shown
+                if not heatmap_shown:
+                    heatmap_field = None
+                    renderer.set_heatmap(None)
+
+            # save the map (walls, weights and route points)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_s and event.mod & pygame.KMOD_CTRL:
+                maps.save_map(save_path, grid, start.index, end.index, [parcel.index for parcel in parcels])
+                pygame.display.set_caption(f"Pathfinding Visualizer - {os.path.basename(save_path)}")
+
+            # playback of the recorded run: pause or replay, step back and forth, stop
+            if event.type == pygame.KEYDOWN and player is not None:
+                if event.key == pygame.K_SPACE:
+                    player.toggle_pause()
+                elif event.key in (pygame.K_COMMA, pygame.K_PERIOD):
+                    player.step(1 if event.key == pygame.K_PERIOD else -1)
+                    gui.show_progress(player.progress())
+                elif event.key == pygame.K_ESCAPE:
+                    player.paused = True
+
             # if left mouse button clicked
             if (
                 pygame.mouse.get_pressed()[0]
                 and grid.mouse_on_the_grid()
+                and not UI_MANAGER.get_hovering_any_element()
                 and gui.algo_menu.menu_states["closed"] == gui.algo_menu.current_state
                 and gui.maze_menu.menu_states["closed"] == gui.maze_menu.current_state
+                and gui.brush_menu.menu_states["closed"] == gui.brush_menu.current_state
+                and gui.movement_menu.menu_states["closed"] == gui.movement_menu.current_state
+                and gui.heuristic_menu.menu_states["closed"] == gui.heuristic_menu.current_state
             ):
                 mpos = pygame.mouse.get_pos()
                 row, col = grid.get_rc_of_under_mouse_cell(mpos)
@@ -119,12 +257,17 @@ def main() -> None:
                 if (
                     clicked_cell != end
                     and clicked_cell != start
-                    and clicked_cell != parcel
+                    and not clicked_cell.is_parcel()
                     and not start_being_dragged
                     and not end_being_dragged
-                    and not parcel_being_dragged
+                    and dragged_parcel is None
                 ):
-                    clicked_cell.make_wall()
+                    player = None
+                    brush_weight = BRUSH_WEIGHTS.get(selected_option(gui.brush_menu))
+                    if brush_weight is None:
+                        clicked_cell.make_wall()
+                    elif not clicked_cell.is_wall():
+                        grid.set_weight(clicked_cell.index, brush_weight)
 
                 elif clicked_cell.is_start():
                     start_being_dragged = True
@@ -132,22 +275,27 @@ def main() -> None:
                 elif clicked_cell.is_end():
                     end_being_dragged = True
 
-                elif parcel and clicked_cell.is_parcel():
-                    parcel_being_dragged = True
+                elif clicked_cell.is_parcel() and dragged_parcel is None:
+                    dragged_parcel = parcels.index(clicked_cell)
 
             # if right mouse button clicked
-            elif pygame.mouse.get_pressed()[2] and grid.mouse_on_the_grid():
+            elif pygame.mouse.get_pressed()[2] and grid.mouse_on_the_grid() and not UI_MANAGER.get_hovering_any_element():
                 mpos = pygame.mouse.get_pos()
                 row, col = grid.get_rc_of_under_mouse_cell(mpos)
                 clicked_cell = grid[row][col]
+                player = None
                 if clicked_cell.is_wall():
                     clicked_cell.reset()
+                elif clicked_cell.is_parcel():
+                    parcels.remove(clicked_cell)
+                    clicked_cell.reset()
+                grid.set_weight(clicked_cell.index, MIN_WEIGHT)
 
             # drag
             if (
                 event.type == pygame.MOUSEMOTION
                 and grid.mouse_on_the_grid()
-                and (start_being_dragged or end_being_dragged or parcel_being_dragged)
+                and (start_being_dragged or end_being_dragged or dragged_parcel is not None)
             ):
                 mpos = pygame.mouse.get_pos()
                 row, col = grid.get_rc_of_under_mouse_cell(mpos)
@@ -161,8 +309,8 @@ def main() -> None:
                         start = grid[row][col]
                         start.make_start()
                         grid.clear(start_end_except=True, barrier_except=True)
-                        grid.update_neighbors_for_every_cell()
-                        run_current_algorithm(gui.algo_menu, WIN, grid, start, end, animation=False, parcel=parcel)
+                        recording = run_current_algorithm(gui.algo_menu, grid, start, end, parcels, gui.heuristic_menu)
+                        player = play_recording(recording, grid, gui, animation_speed, animated=False)
 
                     elif (end_being_dragged 
                     and algo_visualized 
@@ -173,20 +321,21 @@ def main() -> None:
                         end = grid[row][col]
                         end.make_end()
                         grid.clear(start_end_except=True, barrier_except=True)
-                        grid.update_neighbors_for_every_cell()
-                        run_current_algorithm(gui.algo_menu, WIN, grid, start, end, animation=False, parcel=parcel)
+                        recording = run_current_algorithm(gui.algo_menu, grid, start, end, parcels, gui.heuristic_menu)
+                        player = play_recording(recording, grid, gui, animation_speed, animated=False)
 
-                    elif (parcel_being_dragged 
+                    elif (dragged_parcel is not None 
                     and algo_visualized 
                     and not grid[row][col].is_start() 
                     and not grid[row][col].is_end()
+                    and not grid[row][col].is_parcel()
                     ):
-                        parcel.reset()
-                        parcel = grid[row][col]
-                        parcel.make_parcel()
+                        parcels[dragged_parcel].reset()
+                        parcels[dragged_parcel] = grid[row][col]
+                        parcels[dragged_parcel].make_parcel()
                         grid.clear(start_end_except=True, barrier_except=True)
-                        grid.update_neighbors_for_every_cell()
-                        run_current_algorithm(gui.algo_menu, WIN, grid, start, end, animation=False, parcel=parcel)
+                        recording = run_current_algorithm(gui.algo_menu, grid, start, end, parcels, gui.heuristic_menu)
+                        player = play_recording(recording, grid, gui, animation_speed, animated=False)
 
 
                     elif (start_being_dragged and grid[row][col].is_unvisited()):
@@ -199,37 +348,78 @@ def main() -> None:
                         end = grid[row][col]
                         end.make_end()
 
-                    elif (parcel and parcel_being_dragged and grid[row][col].is_unvisited()):
-                        parcel.reset()
-                        parcel = grid[row][col]
-                        parcel.make_parcel()
+                    elif (dragged_parcel is not None and grid[row][col].is_unvisited()):
+                        parcels[dragged_parcel].reset()
+                        parcels[dragged_parcel] = grid[row][col]
+                        parcels[dragged_parcel].make_parcel()
+
+            # zoom around the mouse
+            if event.type == pygame.MOUSEWHEEL and grid.mouse_in_view():
+                if event.y > 0:
+                    grid.zoom(max(grid.gap + 1, round(grid.gap * ZOOM_STEP)), pygame.mouse.get_pos())
+                elif event.y < 0:
+                    grid.zoom(min(grid.gap - 1, round(grid.gap / ZOOM_STEP)), pygame.mouse.get_pos())
+
+            # pan with middle mouse button or arrow keys
+            if event.type == pygame.MOUSEMOTION and event.buttons[1]:
+                grid.pan(-event.rel[0], -event.rel[1])
+
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    grid.pan(-PAN_STEP, 0)
+                elif event.key == pygame.K_RIGHT:
+                    grid.pan(PAN_STEP, 0)
+                elif event.key == pygame.K_UP:
+                    grid.pan(0, -PAN_STEP)
+                elif event.key == pygame.K_DOWN:
+                    grid.pan(0, PAN_STEP)
 
             # drop
             if event.type == pygame.MOUSEBUTTONUP:
                 start_being_dragged = False
                 end_being_dragged = False
-                parcel_being_dragged = False
+                dragged_parcel = None
 
             # visualize algorithm 
             if event.type == pygame_gui.UI_BUTTON_PRESSED:
                 if event.ui_element == gui.visualize_button:
                     grid.clear(start_end_except=True, barrier_except=True)
-                    grid.update_neighbors_for_every_cell()
-                    draw(WIN, grid, UI_MANAGER, time_delta, gui.legend_cells)
-                    run_current_algorithm(gui.algo_menu, WIN, grid, start, end, ANIMATION, animation_speed, parcel)
-                    algo_visualized = True
+                    gui.show_no_path(False)
+                    draw(renderer, UI_MANAGER, time_delta)
+                    player = None
+                    animator = Animator(animation_speed) if ANIMATION else None
+                    recording, window_closed = run_job(
+                        lambda: run_current_algorithm(
+                            gui.algo_menu, grid, start, end, parcels, gui.heuristic_menu, animator and animator.token,
+                        ),
+                        renderer, gui, animator,
+                    )
+                    animation_speed = gui.get_animation_speed()
+                    if window_closed:
+                        running = False
+                    elif not (animator and animator.token.cancelled):
+                        player = play_recording(recording, grid, gui, animation_speed, ANIMATION)
+                        algo_visualized = True
 
                 # generate maze 
                 if event.ui_element == gui.generate_button:
                     grid.clear(start_end_except=True)
-                    draw(WIN, grid, UI_MANAGER, time_delta, gui.legend_cells)
-                    generate_current_maze(gui.maze_menu, WIN, grid, ANIMATION, animation_speed)
+                    player = None
+                    draw(renderer, UI_MANAGER, time_delta)
+                    animator = Animator(animation_speed) if ANIMATION else None
+                    _, window_closed = run_job(lambda: generate_current_maze(gui.maze_menu, grid, animator), renderer, gui, animator)
                     algo_visualized = False
+                    animation_speed = gui.get_animation_speed()
+                    if window_closed:
+                        running = False
+                    gui.show_no_path(False)
 
                 # clear everything on the grid 
                 if event.ui_element == gui.clear_everything_button:
                     grid.clear(start_end_except=True)
                     algo_visualized = False
+                    player = None
+                    gui.show_no_path(False)
 
                     # reset start and end positions
                     start.reset()
@@ -243,117 +433,236 @@ def main() -> None:
                 if event.ui_element == gui.clear_button:
                     grid.clear(start_end_except=True, barrier_except=True)
                     algo_visualized = False
+                    player = None
+                    gui.show_no_path(False)
 
-                # add/remove parcell
+                # add parcel, parcels are removed with right click
                 if event.ui_element == gui.parcel_button:
-                    if parcel:
-                        parcel.reset()
-                        parcel = None
-                        gui.parcel_button.set_text("Add Parcel")
-                    else:
-                        available_parcel_cells = [cell for row in grid.raw_grid 
-                        for cell in row if not cell.is_start() and not cell.is_end()]
-                        
-                        parcel = random.choice(available_parcel_cells)
-                        parcel.make_parcel() 
-                        gui.parcel_button.set_text("Remove Parcel")
+                    parcel = random_free_cell(grid, start)
+                    if parcel is not None:
+                        parcel.make_parcel()
+                        parcels.append(parcel)
+                        player = None
 
 
+            # movement policy changes neighbors of every cell, the old visualization doesn't hold anymore
+            if event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED and event.ui_element == gui.movement_menu:
+                grid.set_movement(MOVEMENT_POLICIES[selected_option(gui.movement_menu)])
+                grid.clear(start_end_except=True, barrier_except=True)
+                algo_visualized = False
+                player = None
+                gui.show_no_path(False)
+
             # animation speed slider
             if event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
                 if event.ui_element == gui.speed_slider:
-                    animation_speed = gui.speed_slider.current_value
-                    gui.speed_value_lable.set_text(f"{round(gui.speed_slider.current_percentage * 100)}%")
+                    animation_speed = gui.get_animation_speed()
+                    gui.update_speed_lable()
+                    if player is not None:
+                        player.speed = animation_speed
+
+                # scrubbing pauses the playback at the chosen point of the run
+                if event.ui_element == gui.scrub_slider and player is not None:
+                    player.paused = True
+                    player.seek(round(event.value * len(player.recording)))
 
     pygame.quit()
 
 
-def run_current_algorithm(
-    algo_menu: pygame_gui.elements.UIDropDownMenu,
-    win: pygame.surface.Surface,
-    grid: Grid,
-    start: cell.Cell,
-    end: cell.Cell,
-    animation: bool,
-    animation_speed: int = 0,
-    parcel: cell.Cell = None,
-) -> None:
+def route_point(grid: Grid, index: int, row: int, col: int) -> cell.Cell:
+
+    """Returns the cell of a route point stored in the map, without one the cell at (row, col)
+        or the first free cell after it if that one is taken (imported maps have no route points)"""
+
+    if index is not None:
+        return grid.get_cell_by_index(index)
+
+    index = row * grid.total_columns + col
+    states = grid.states.reshape(-1)
+    free = np.flatnonzero(states[index:] == cell.UNVISITED)
+    if len(free):
+        return grid.get_cell_by_index(index + int(free[0]))
+    return grid.get_cell_by_index(int(np.flatnonzero(states == cell.UNVISITED)[0]))
+
 
-    """Determines which algorithm is selected and calls it's function"""
+def random_free_cell(grid: Grid, start: cell.Cell) -> cell.Cell:
 
-    if algo_menu.selected_option == Algorithms.ASTAR:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.astar)
+    """Returns a random cell reachable from the start that isn't a wall, an endpoint or a parcel,
+        None if there is no such cell. A few random draws usually find one, only if they don't
+        free cells are counted band by band and one of them is picked"""
 
-    elif algo_menu.selected_option == Algorithms.DIJKSTRA:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.dijkstra)
+    components_index = components.get_components(grid)
+    for _ in range(PARCEL_DRAWS):
+        index = random.randrange(grid.total_rows * grid.total_columns)
+        state = grid.flat_states[index]
+        if state != cell.WALL and state < cell.START and components_index.same_component(start.index, index):
+            return grid.get_cell_by_index(index)
 
-    elif algo_menu.selected_option == Algorithms.DFS:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.dfs)
+    root = components_index.find(components_index.label(start.index))
+    def free_cells(first: int, last: int) -> np.ndarray:
+        states = grid.states[first:last]
+        return (states < cell.START) & (components_index.labels_of_rows(first, last) == root)
 
-    elif algo_menu.selected_option == Algorithms.GBFS:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.gbfs)
+    counts = [int(np.count_nonzero(free_cells(first, last))) for first, last in grid.row_bands()]
+    if not sum(counts):
+        return None
+    chosen = random.randrange(sum(counts))
+    for (first, last), count in zip(grid.row_bands(), counts):
+        if chosen < count:
+            return grid.get_cell_by_index(first * grid.total_columns + int(np.flatnonzero(free_cells(first, last))[chosen]))
+        chosen -= count
 
-    elif algo_menu.selected_option == Algorithms.BFS:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.bfs)
 
-    elif algo_menu.selected_option == Algorithms.BBFS:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.bidirectional_bfs)
+def run_job(job: Callable, renderer: Renderer, gui: GUI, animator: Animator = None) -> tuple:
 
-    else:
-        run_algorithm(win, grid, start, end, animation, animation_speed, parcel, algo.astar)
+    """Runs the job (search recorded for playback or maze generation animated by the animator) in a worker
+        thread, keeping the window responsive meanwhile: frames handed over by the worker are drawn here while it waits,
+        Escape or closing the window cancel the job and the speed slider changes its speed on the fly.
+        Returns what the job returned and whether the window has been closed (then the worker isn't
+        waited for, it's a daemon thread), without animation the job just runs here"""
+
+    if animator is None:
+        return job(), False
+
+    outcome = {}
+
+    def work():
+        try:
+            outcome["result"] = job()
+        except BaseException as error:
+            outcome["error"] = error
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+
+    clock = pygame.time.Clock()
+    time_delta = 0
+    while worker.is_alive():
+        for event in pygame.event.get():
+            UI_MANAGER.process_events(event)
+            if event.type == pygame.QUIT:
+                animator.token.cancel()
+                return None, True
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                animator.token.cancel()
+            if event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED and event.ui_element == gui.speed_slider:
+                animator.set_speed(gui.get_animation_speed())
+                gui.update_speed_lable()
+
+        UI_MANAGER.update(time_delta)
+        frame_rate = animator.next_frame(timeout=1 / animator.fps)
+        if frame_rate is None:
+            # the worker may be changing the grid right now, only the UI is drawn
+            renderer.draw_frame(cells=False)
+            time_delta = clock.tick() / 1000.0
+        else:
+            renderer.draw_frame()
+            animator.frame_drawn()
+            time_delta = clock.tick(frame_rate) / 1000.0
+
+    worker.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result"), False
+
+
+def run_current_algorithm(
+    algo_menu: pygame_gui.elements.UIDropDownMenu,
+    grid: Grid,
+    start: cell.Cell,
+    end: cell.Cell,
+    parcels: list[cell.Cell] = (),
+    heuristic_menu: pygame_gui.elements.UIDropDownMenu = None,
+    token: CancelToken = None,
+) -> visualizer.Recording:
+
+    """Determines which algorithm (and heuristic, if it uses one) is selected and calls it's function,
+        returns recording of the run, None if there is no path or the token has cancelled the search"""
+
+    current_algorithm = ALGORITHM_FUNCTIONS.get(selected_option(algo_menu), algo.astar)
+    heuristic = HEURISTIC_FUNCTIONS.get(selected_option(heuristic_menu)) if heuristic_menu else None
+    if heuristic is not None and selected_option(algo_menu) in HEURISTIC_ALGORITHMS:
+        current_algorithm = functools.partial(current_algorithm, heuristic=heuristic)
+    return run_algorithm(grid, start, end, parcels, current_algorithm, token)
 
 
 def run_algorithm(
-    win: pygame.surface.Surface, 
     grid: Grid, 
     start: cell.Cell, 
     end: cell.Cell, 
-    animation: bool, 
-    animation_speed: int, 
-    parcel: cell.Cell, 
+    parcels: list[cell.Cell], 
     current_algorithm: Callable,
-) -> None:
+    token: CancelToken = None,
+) -> visualizer.Recording:
 
-    """Runs selected algorithm in one or two steps based on parcel presence"""
+    """Runs selected algorithm once per leg of the route through all parcels (visited in the cheapest
+        order) and records exploration of every leg (legs alternate visited colors) and the path.
+        Returns None without searching if the end or a parcel can't be reached from the start,
+        also if the token is cancelled (searches check it after every step)"""
     
-    if parcel:
-        first_path_half = current_algorithm(win, grid, start, parcel, animation, animation_speed)
-        cell.Cell.visited_color = cell.VISITED_COLOR_2
-        second_path_half = current_algorithm(win, grid, parcel, end, animation, animation_speed)
-        cell.Cell.visited_color = cell.VISITED_COLOR_1
-        if first_path_half and second_path_half:
-            algo.animate_path(win,  first_path_half + second_path_half, grid, animation)
-    else:
-        path = current_algorithm(win, grid, start, end, animation, animation_speed)
-        if path:
-            algo.animate_path(win, path, grid, animation)
+    if not components.reachable(grid, start.index, end.index, *(parcel.index for parcel in parcels)):
+        return None
+
+    waypoints = tour.plan_tour(grid, start, parcels, end) if parcels else [start, end]
+    recording = visualizer.Recording()
+
+    path = []
+    for leg, (source, target) in enumerate(zip(waypoints, waypoints[1:])):
+        trace = algo.Trace(token)
+        try:
+            leg_path = current_algorithm(grid, source, target, trace)
+        except algo.SearchCancelled:
+            return None
+        recording.add_trace(trace, (cell.VISITED_1, cell.VISITED_2)[leg % 2])
+        if path is not None and leg_path is not None:
+            path += leg_path
+        else:
+            path = None
+
+    if path is not None:
+        recording.add_path([path_cell.index for path_cell in path])
+    return recording
+
+
+def play_recording(
+    recording: visualizer.Recording,
+    grid: Grid,
+    gui: GUI,
+    animation_speed: int,
+    animated: bool,
+) -> visualizer.Player:
+
+    """Starts playback of the recorded run, without animation the whole run is shown right away.
+        Returns None and shows that there is no path if there is no recording"""
+
+    gui.show_no_path(recording is None)
+    if recording is None:
+        return None
+
+    player = visualizer.Player(recording, grid, animation_speed)
+    if not animated:
+        player.seek(len(recording))
+    gui.show_progress(player.progress())
+    return player
 
 
 def generate_current_maze(
     maze_menu: pygame_gui.elements.UIDropDownMenu,
-    win: pygame.surface.Surface,
     grid: Grid,
-    animation: bool,
-    animation_speed: int = 0,
+    animator: Animator = None,
 ) -> None:
 
     """Calls maze generation function based on selected option"""
 
-    if maze_menu.selected_option == Mazes.RECDIV:
-        maze.recursive_division_maze_gen(win, grid, animation, animation_speed)
-
-    elif maze_menu.selected_option == Mazes.RANDOM_DFS:
-        maze.random_dfs_maze_gen(win, grid, animation, animation_speed)
-
-    elif maze_menu.selected_option == Mazes.SPIRAL:
-        maze.spiral_maze(win, grid, animation, animation_speed)
-
-    elif maze_menu.selected_option == Mazes.STAIR:
-        maze.stair_pattern_maze(win, grid, animation, animation_speed)
-
-    else:
-        maze.recursive_division_maze_gen(win, grid, animation, animation_speed)
+    current_maze = MAZE_FUNCTIONS.get(selected_option(maze_menu), maze.recursive_division_maze_gen)
+    current_maze(grid, animator)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Pathfinding Visualizer")
+    parser.add_argument("--size", default="{}x{}".format(*GRID_SIZE), help="grid size as ROWSxCOLUMNS")
+    parser.add_argument("--map", help=f"open a saved ({maps.MAP_EXTENSION}) or MovingAI (.map) map, its size overrides --size")
+    args = parser.parse_args()
+
+    rows, columns = args.size.lower().split("x")
+    main((int(rows), int(columns)), args.map)
@@ -0,0 +1,202 @@
+import os
+import mmap
+import struct
+import numpy as np
+from cell import WALL, START, END, PARCEL
+from grid import Grid
+
+# native map files: header, parcel indices, walls packed 8 cells per byte row by row,
+# terrain costs packed 2 cells per byte row by row (only if the map is weighted)
+MAP_EXTENSION = ".pfmap"
+MAGIC = b"PFMP"
+VERSION = 1
+# magic, version, flags, rows, columns, start, end (flat indices, -1 if not set), number of parcels
+HEADER = struct.Struct("<4sHHIIqqI")
+PARCEL_INDEX = struct.Struct("<q")
+HAS_TERRAIN = 1
+NO_CELL = -1
+
+# MovingAI benchmark maps: out of bounds, trees and water can't be entered, everything else can
+MOVING_AI_EXTENSION = ".map"
+MOVING_AI_BLOCKED = b"@OTW"
+
+
+class MapFile:
+
+    """Map opened from a file: size and route points, walls as rows of packed bits and terrain
+        as rows of packed costs (None if the map isn't weighted). Native files are memory-mapped,
+        their bits are only read (chunk by chunk) when they're put into a grid"""
+
+    def __init__(
+        self,
+        grid_size: tuple,
+        walls: np.ndarray,
+        terrain: np.ndarray = None,
+        start: int = None,
+        end: int = None,
+        parcels: list[int] = (),
+        memory: mmap.mmap = None,
+    ):
+        self.grid_size = grid_size
+        self.walls = walls
+        self.terrain = terrain
+        self.start = start
+        self.end = end
+        self.parcels = list(parcels)
+        self.memory = memory
+
+
+    def fill(self, grid: Grid) -> None:
+
+        """Puts walls, terrain and route points of the map into the grid of the same size in place
+            of everything on it. Chunks of rows without walls (or weights) aren't written, so open parts
+            of the map stay unallocated in the grid"""
+
+        if grid.grid_size != self.grid_size:
+            raise ValueError(f"map of size {self.grid_size} doesn't fit grid of size {grid.grid_size}")
+
+        with grid.bulk_edit():
+            grid.clear_weights()
+            self.fill_bands(grid)
+            for index, state in [(self.start, START), (self.end, END)] + [(parcel, PARCEL) for parcel in self.parcels]:
+                if index is not None:
+                    grid.flat_states[index] = state
+        grid.all_dirty = True
+
+
+    def fill_bands(self, grid: Grid) -> None:
+
+        """Writes walls and terrain of the map over the grid, one chunk of rows at a time,
+            only cells that change are written"""
+
+        columns = grid.total_columns
+        for first, last in grid.row_bands():
+            band = grid.states[first:last]
+            bits = self.walls[first:last]
+            if bits.any():
+                states = np.unpackbits(bits, axis=1, count=columns, bitorder="little") * np.uint8(WALL)
+                np.copyto(band, states, where=band != states)
+            elif band.any():
+                band[band != 0] = 0
+
+            if self.terrain is not None:
+                packed = self.terrain[first:last]
+                if packed.any():
+                    costs = np.empty((last - first, packed.shape[1] * 2), dtype=np.uint8)
+                    costs[:, ::2], costs[:, 1::2] = packed & 0x0F, packed >> 4
+                    costs = costs[:, :columns]
+                    band = grid.terrain[first:last]
+                    np.copyto(band, costs, where=costs != 0)
+                    counts = np.bincount(costs.ravel(), minlength=len(grid.terrain_counts))
+                    for cost, count in enumerate(counts.tolist()):
+                        grid.terrain_counts[cost] += count
+                    grid.terrain_counts[0] -= costs.size
+
+
+    def close(self) -> None:
+        # views into the mapped file have to be gone before it can be closed
+        self.walls = self.terrain = None
+        if self.memory is not None:
+            self.memory.close()
+            self.memory = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def save_map(path: str, grid: Grid, start: int = None, end: int = None, parcels: list[int] = ()) -> None:
+
+    """Writes walls, terrain and route points (flat indices) of the grid into a native map file,
+        chunk by chunk, so the grid is never copied whole"""
+
+    rows, columns = grid.grid_size
+    weighted = grid.is_weighted()
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, HAS_TERRAIN if weighted else 0, rows, columns,
+            NO_CELL if start is None else start, NO_CELL if end is None else end, len(parcels),
+        ))
+        for parcel in parcels:
+            file.write(PARCEL_INDEX.pack(parcel))
+
+        for first, last in grid.row_bands():
+            file.write(np.packbits(grid.states[first:last] == WALL, axis=1, bitorder="little").tobytes())
+
+        if weighted:
+            for first, last in grid.row_bands():
+                costs = grid.terrain[first:last]
+                if columns % 2:
+                    costs = np.pad(costs, ((0, 0), (0, 1)))
+                file.write((costs[:, ::2] | costs[:, 1::2] << 4).tobytes())
+
+
+def read_map(path: str) -> MapFile:
+
+    """Opens a native map file, its walls and terrain stay in the memory-mapped file"""
+
+    with open(path, "rb") as file:
+        memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        magic, version, flags, rows, columns, start, end, parcel_count = HEADER.unpack_from(memory)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} isn't a map file of version {VERSION}")
+
+        offset = HEADER.size
+        parcels = [PARCEL_INDEX.unpack_from(memory, offset + i * PARCEL_INDEX.size)[0] for i in range(parcel_count)]
+        offset += parcel_count * PARCEL_INDEX.size
+
+        wall_bytes = (columns + 7) // 8
+        walls = np.frombuffer(memory, dtype=np.uint8, count=rows * wall_bytes, offset=offset).reshape(rows, wall_bytes)
+        offset += rows * wall_bytes
+
+        terrain = None
+        if flags & HAS_TERRAIN:
+            terrain_bytes = (columns + 1) // 2
+            terrain = np.frombuffer(memory, dtype=np.uint8, count=rows * terrain_bytes, offset=offset).reshape(rows, terrain_bytes)
+    except (ValueError, struct.error):
+        memory.close()
+        raise
+
+    return MapFile(
+        (rows, columns), walls, terrain,
+        None if start == NO_CELL else start, None if end == NO_CELL else end, parcels,
+        memory,
+    )
+
+
+def read_moving_ai_map(path: str) -> MapFile:
+
+    """Imports a MovingAI benchmark map (type, height and width lines, "map", then one line of
+        characters per row), blocked cells become walls. The map has no route points"""
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    header, separator, body = data.partition(b"\nmap")
+    if not separator:
+        raise ValueError(f"{path} isn't a MovingAI map")
+    fields = dict(line.split(None, 1) for line in header.decode().splitlines() if line.strip())
+    rows, columns = int(fields["height"]), int(fields["width"])
+
+    cells = np.frombuffer(body, dtype=np.uint8)
+    cells = cells[(cells != ord("\n")) & (cells != ord("\r"))]
+    if len(cells) < rows * columns:
+        raise ValueError(f"{path} has fewer than {rows}x{columns} cells")
+
+    walls = np.isin(cells[:rows * columns], np.frombuffer(MOVING_AI_BLOCKED, dtype=np.uint8)).reshape(rows, columns)
+    return MapFile((rows, columns), np.packbits(walls, axis=1, bitorder="little"))
+
+
+def load_map(path: str) -> MapFile:
+
+    """Opens a native or MovingAI map file, based on its extension"""
+
+    if os.path.splitext(path)[1].lower() == MOVING_AI_EXTENSION:
+        return read_moving_ai_map(path)
+    return read_map(path)
@@ -1,9 +1,9 @@
 import random
-import pygame
 from grid import Grid
 from copy import deepcopy
-from utils import aborted
+from animation import Animator
 from itertools import cycle
+from functools import wraps
 
 
 class RoomCoordinates:
@@ -14,28 +14,35 @@ class RoomCoordinates:
         self.right = grid.total_columns - 2
 
 
-def random_dfs_maze_gen(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
-    animation: bool, 
-    speed: int = 0
-) -> None:
+def bulk_wall_edit(maze_gen):
+
+    """Makes maze generator change walls without incremental adjacency updates,
+        adjacency is rebuilt once after the generator finishes (or gets aborted)"""
+
+    @wraps(maze_gen)
+    def wrapper(grid: Grid, *args, **kwargs):
+        with grid.bulk_edit():
+            return maze_gen(grid, *args, **kwargs)
+
+    return wrapper
+
+
+@bulk_wall_edit
+def random_dfs_maze_gen(grid: Grid, animator: Animator = None) -> None:
     
-    grid.update_neighbors_for_every_cell()
     grid.make_all_cells_wall(start_end_except=True)
-    grid.draw_over_grid_lines()
-    pygame.display.update()
+    if animator and not animator.frame():
+        return
     start_maze_cell = grid[0][0]
     visited_set = {start_maze_cell}
     stack = [start_maze_cell]
-    clock = pygame.time.Clock()
 
     while len(stack) > 0:
-        if aborted():
-            return
-
         current = stack.pop()
-        neighbors = [neighbor for neighbor in current.neighbors if neighbor not in visited_set]
+        neighbors = [
+            neighbor for neighbor in current.neighbor_by_direction.values()
+            if neighbor is not None and neighbor not in visited_set
+        ]
 
         if len(neighbors) > 0:
             random_index = random.randint(0, len(neighbors) - 1)
@@ -53,32 +60,26 @@ def random_dfs_maze_gen(
                 and not current.is_parcel()
             ):
                 current.reset()
-                if animation:
-                    current.draw(win, animation)
-                    pygame.display.update()
-                    clock.tick(speed)
+                if animator and not animator.step():
+                    return
 
 
-def recursive_division_maze_gen(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
-    animation: bool, 
-    speed: int = 0
-) -> None:
+@bulk_wall_edit
+def recursive_division_maze_gen(grid: Grid, animator: Animator = None) -> None:
     
-    grid.update_neighbors_for_every_cell()
     coordinates = RoomCoordinates(grid)
-    draw_outside_border(win, grid, animation, speed)
-    recursive_division(win, grid, coordinates, animation, speed)
+    if draw_outside_border(grid, animator):
+        recursive_division(grid, coordinates, animator)
 
 
 def recursive_division(
-    win: pygame.surface.Surface,
     grid: Grid,
     coordinates: RoomCoordinates,
-    animation: bool,
-    speed: int = 0,
-) -> None:
+    animator: Animator = None,
+) -> bool:
+
+    """Divides the room with a wall with one passage and recurses into both halves,
+        returns False if the animation has been aborted"""
 
     if (coordinates.bottom - coordinates.top) < (coordinates.right - coordinates.left):
         horizontal = False
@@ -96,31 +97,34 @@ def recursive_division(
         available_idxes = get_available_indxes(grid, coordinates, horizontal)
 
         if len(available_idxes) == 0:
-            return
+            return True
 
     if len(available_idxes) == 1:
         wall_idx = available_idxes.pop()
     else:
         wall_idx = available_idxes[len(available_idxes) // 2]
 
-    build_wall(win, grid, horizontal, wall_idx, coordinates, animation, speed)
-    carve_path(win, grid, horizontal, wall_idx, coordinates, animation)
+    if not build_wall(grid, horizontal, wall_idx, coordinates, animator):
+        return False
+    carve_path(grid, horizontal, wall_idx, coordinates)
 
     if horizontal:
         coordinates_copy = deepcopy(coordinates)
         coordinates.top = wall_idx + 1
-        recursive_division(win, grid, coordinates, animation, speed)
+        if not recursive_division(grid, coordinates, animator):
+            return False
 
         coordinates_copy.bottom = wall_idx - 1
-        recursive_division(win, grid, coordinates_copy, animation, speed)
+        return recursive_division(grid, coordinates_copy, animator)
 
     else:
         coordinates_copy = deepcopy(coordinates)
         coordinates.left = wall_idx + 1
-        recursive_division(win, grid, coordinates, animation, speed)
+        if not recursive_division(grid, coordinates, animator):
+            return False
 
         coordinates_copy.right = wall_idx - 1
-        recursive_division(win, grid, coordinates_copy, animation, speed)
+        return recursive_division(grid, coordinates_copy, animator)
 
 
 def get_available_indxes(grid: Grid, coordinates: RoomCoordinates, horizontal: bool) -> list[int]:
@@ -149,49 +153,37 @@ def get_available_indxes(grid: Grid, coordinates: RoomCoordinates, horizontal: b
 
 
 def build_wall(
-    win: pygame.surface.Surface,
     grid: Grid,
     horizontal: bool,
     index: int,
     coordinates: RoomCoordinates,
-    animation: bool,
-    speed: int = 0,
-) -> None:
+    animator: Animator = None,
+) -> bool:
     
-    """Draws randomly located wall"""
-
-    clock = pygame.time.Clock()
+    """Draws randomly located wall, returns False if the animation has been aborted"""
 
     if horizontal:
         for j in range(coordinates.left, coordinates.right + 1):
             if not grid[index][j].is_start() and not grid[index][j].is_end() and not grid[index][j].is_parcel():
                 grid[index][j].make_wall()
-            if aborted():
-                return
-            if animation:
-                grid[index][j].draw(win)
-                pygame.display.update()
-                clock.tick(speed)
+            if animator and not animator.step():
+                return False
 
     else:
         for i in range(coordinates.top, coordinates.bottom + 1):
             if not grid[i][index].is_start() and not grid[i][index].is_end() and not grid[i][index].is_parcel():
                 grid[i][index].make_wall()
-            if aborted():
-                return
-            if animation:
-                grid[i][index].draw(win)
-                pygame.display.update()
-                clock.tick(speed)
+            if animator and not animator.step():
+                return False
+
+    return True
 
 
 def carve_path(
-    win: pygame.surface.Surface,
     grid: Grid,
     horizontal: bool,
     index: int,
     coordinates: RoomCoordinates,
-    animation: bool,
 ) -> None:
 
     """Carves path in randomly located wall"""
@@ -200,37 +192,22 @@ def carve_path(
         rand_idx = random.randint(coordinates.left, coordinates.right)
         if not grid[index][rand_idx].is_start() and not grid[index][rand_idx].is_end() and not grid[index][rand_idx].is_parcel():
             grid[index][rand_idx].reset()
-        if animation:
-            grid[index][rand_idx].draw(win, animation)
-            pygame.display.update()
 
     else:
         rand_idx = random.randint(coordinates.top, coordinates.bottom)
         if not grid[rand_idx][index].is_start() and not grid[rand_idx][index].is_end() and not grid[rand_idx][index].is_parcel():
             grid[rand_idx][index].reset()
-        if animation:
-            grid[rand_idx][index].draw(win, animation)
-            pygame.display.update()
 
 
-def draw_outside_border(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
-    animation: bool, 
-    speed: int = 0
-) -> None:
+def draw_outside_border(grid: Grid, animator: Animator = None) -> bool:
     
-    """Changing color of border cells to wall color"""
-
-    clock = pygame.time.Clock()
+    """Changing color of border cells to wall color, returns False if the animation has been aborted"""
 
     for cell in grid[0]:  # top border
         if not cell.is_start() and not cell.is_end():
             cell.make_wall()
-        if animation:
-            cell.draw(win)
-            pygame.display.update()
-            clock.tick(speed)
+        if animator and not animator.step():
+            return False
 
     for i in range(grid.total_rows):  # right border
         if (
@@ -238,51 +215,38 @@ def draw_outside_border(
             and not grid[i][grid.total_columns - 1].is_end()
         ):
             grid[i][grid.total_columns - 1].make_wall()
-        if animation:
-            grid[i][grid.total_columns - 1].draw(win)
-            pygame.display.update()
-            clock.tick(speed)
+        if animator and not animator.step():
+            return False
 
     bottom_border = grid[grid.total_rows - 1][:]  # bottom border
     bottom_border.reverse()
     for cell in bottom_border:
         if not cell.is_start() and not cell.is_end():
             cell.make_wall()
-        if animation:
-            cell.draw(win)
-            pygame.display.update()
-            clock.tick(speed)
+        if animator and not animator.step():
+            return False
 
     left_border = [grid[i][0] for i in range(grid.total_rows)]  # left border
     left_border.reverse()
     for cell in left_border:
         if not cell.is_start() and not cell.is_end():
             cell.make_wall()
-        if animation:
-            cell.draw(win)
-            pygame.display.update()
-            clock.tick(speed)
+        if animator and not animator.step():
+            return False
 
+    return True
 
-def spiral_maze(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
-    animation: bool, 
-    speed: int = 0
-) -> None:
+
+@bulk_wall_edit
+def spiral_maze(grid: Grid, animator: Animator = None) -> None:
     
-    grid.update_neighbors_by_direction_for_every_cell()
     grid.make_all_cells_wall(start_end_except=True)
-    grid.draw_over_grid_lines()
     current = grid[0][0]
     directions = cycle(["right", "down", "left", "up"])
     if not current.is_start() and not current.is_end():
         current.reset()
-    if animation:
-        current.draw(win, animation)
-        pygame.display.update()
-
-    clock = pygame.time.Clock()
+    if animator and not animator.frame():
+        return
 
     while True:
         direction = next(directions)
@@ -294,10 +258,6 @@ def spiral_maze(
         neighbor = None
 
         while True:
-
-            if aborted():
-                return
-
             current = current.neighbor_by_direction[direction]
 
             if not current.is_start() and not current.is_end() and not current.is_parcel():
@@ -305,10 +265,8 @@ def spiral_maze(
 
             neighbor = current.neighbor_by_direction[direction]
 
-            if animation:
-                current.draw(win, animation)
-                pygame.display.update()
-                clock.tick(speed)
+            if animator and not animator.step():
+                return
 
             if (
                 neighbor.neighbor_by_direction[direction] != None
@@ -338,18 +296,9 @@ def spiral_maze(
     ):
         grid[grid.total_rows - 1][grid.total_columns - 2].reset()
 
-    grid.draw_over_grid_lines()
-
-
-def stair_pattern_maze(
-    win: pygame.surface.Surface, 
-    grid: Grid, 
-    animation: bool, 
-    speed: int = 0
-) -> None:
-    grid.update_neighbors_by_direction_for_every_cell()
-    grid.draw_over_grid_lines()
 
+@bulk_wall_edit
+def stair_pattern_maze(grid: Grid, animator: Animator = None) -> None:
     row = grid.total_rows - 1
     col = 0
 
@@ -357,13 +306,8 @@ def stair_pattern_maze(
 
     direction_flag = True
 
-    clock = pygame.time.Clock()
-
     while (col != grid.total_columns - 2):
         
-        if aborted():
-            return
-        
         if direction_flag:
             row -= 1
         else: 
@@ -379,14 +323,5 @@ def stair_pattern_maze(
         current_cell = grid[row][col]
         current_cell.make_wall()
 
-        if animation:
-            current_cell.draw(win, animation)
-            pygame.display.update()
-            clock.tick(speed)
-
-        
-    
-
-    
-
-
+        if animator and not animator.step():
+            return
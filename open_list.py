@@ -0,0 +1,118 @@
+from heapq import heappush, heappop
+from collections import deque
+
+
+class HeapOpenList:
+
+    """Binary heap open list without locking. Decrease-key pushes a new entry,
+        outdated entries are skipped when they reach the top (lazy deletion).
+        Cells with equal priority are popped in insertion order"""
+
+    def __init__(self):
+        self.heap = []
+        self.priority = {}
+        self.count = 0
+
+    def push(self, cell: int, priority) -> None:
+
+        """Inserts the cell or lowers its priority if it's already open"""
+
+        self.priority[cell] = priority
+        self.count += 1
+        heappush(self.heap, (priority, self.count, cell))
+
+    def pop(self) -> int:
+
+        """Removes and returns the open cell with the lowest priority"""
+
+        heap, priority = self.heap, self.priority
+        while heap:
+            cell_priority, _, cell = heappop(heap)
+            if priority.get(cell) == cell_priority:
+                del priority[cell]
+                return cell
+        raise IndexError("pop from an empty open list")
+
+    def peek(self) -> tuple:
+
+        """Returns (priority, cell) of the open cell with the lowest priority without removing it"""
+
+        heap, priority = self.heap, self.priority
+        while heap:
+            cell_priority, _, cell = heap[0]
+            if priority.get(cell) == cell_priority:
+                return cell_priority, cell
+            heappop(heap)
+        raise IndexError("peek into an empty open list")
+
+    def remove(self, cell: int) -> None:
+
+        """Removes the cell from the open list if it's there"""
+
+        self.priority.pop(cell, None)
+
+    def __contains__(self, cell: int) -> bool:
+        return cell in self.priority
+
+    def __len__(self) -> int:
+        return len(self.priority)
+
+
+class BucketOpenList:
+
+    """Bucket (Dial's) open list for integer priorities: one FIFO bucket per priority
+        and a pointer to the lowest non-empty one, so push and pop are O(1) on
+        grids with small integer step costs. Decrease-key and lazy deletion work like in HeapOpenList"""
+
+    def __init__(self):
+        self.buckets = []
+        self.priority = {}
+        self.current = 0
+
+    def push(self, cell: int, priority: int) -> None:
+
+        """Inserts the cell or lowers its priority if it's already open"""
+
+        self.priority[cell] = priority
+        buckets = self.buckets
+        while len(buckets) <= priority:
+            buckets.append(deque())
+        buckets[priority].append(cell)
+        if priority < self.current:
+            self.current = priority
+
+    def pop(self) -> int:
+
+        """Removes and returns the open cell with the lowest priority"""
+
+        buckets, priority = self.buckets, self.priority
+        while self.current < len(buckets):
+            bucket = buckets[self.current]
+            while bucket:
+                cell = bucket.popleft()
+                if priority.get(cell) == self.current:
+                    del priority[cell]
+                    return cell
+            self.current += 1
+        raise IndexError("pop from an empty open list")
+
+    def peek(self) -> tuple:
+
+        """Returns (priority, cell) of the open cell with the lowest priority without removing it"""
+
+        buckets, priority = self.buckets, self.priority
+        while self.current < len(buckets):
+            bucket = buckets[self.current]
+            while bucket:
+                cell = bucket[0]
+                if priority.get(cell) == self.current:
+                    return self.current, cell
+                bucket.popleft()
+            self.current += 1
+        raise IndexError("peek into an empty open list")
+
+    def __contains__(self, cell: int) -> bool:
+        return cell in self.priority
+
+    def __len__(self) -> int:
+        return len(self.priority)
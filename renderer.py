@@ -0,0 +1,288 @@
+import pygame
+import pygame_gui
+import numpy as np
+from grid import Grid, MIN_WEIGHT, MAX_WEIGHT
+from legend_cell import LegendCell
+from cell import Cell, STATE_COLORS, UNVISITED_COLOR, GREY, WALL, START, END, PARCEL
+
+# above this many changed cells it's cheaper to redraw the whole view at once
+MAX_DIRTY_RECTS = 256
+# cells smaller than this are drawn without grid lines
+MIN_LINED_CELL_SIZE = 4
+# opacity of the distance heatmap overlay
+HEATMAP_ALPHA = 160
+# heatmap color of unreachable cells, they are left uncovered
+HEATMAP_COLORKEY = (0, 0, 0)
+# weighted cells are blended towards this color, the heaviest ones by TERRAIN_SHADE
+TERRAIN_COLOR = (139, 90, 43) # brown
+TERRAIN_SHADE = 0.75
+
+
+def terrain_cell_colors() -> np.ndarray:
+
+    """Returns colors of cells indexed by state and terrain cost, open, visited and path cells
+        get darker towards the terrain color the heavier they are, walls and images don't change"""
+
+    state_colors = np.array(STATE_COLORS + (UNVISITED_COLOR,) * 3, dtype=np.float64)
+    shade = np.linspace(0, TERRAIN_SHADE, MAX_WEIGHT - MIN_WEIGHT + 1)[:, None]
+    colors = state_colors[:, None] * (1 - shade) + np.array(TERRAIN_COLOR) * shade
+    colors[WALL] = state_colors[WALL]
+    colors[START:] = state_colors[START:, None]
+    return colors.round().astype(np.uint8)
+
+
+class Renderer:
+
+    """Draws the window incrementally: background and legend are rendered once into an offscreen
+        scene, cells are drawn only inside of the grid's view and afterwards only changed cells
+        and the UI are redrawn and only their rectangles are pushed to the display"""
+
+    def __init__(
+        self,
+        win: pygame.surface.Surface,
+        grid: Grid,
+        ui_manager: pygame_gui.UIManager,
+        bg_color: tuple,
+        legend_cells: list[LegendCell],
+    ):
+        self.win = win
+        self.grid = grid
+        self.ui_manager = ui_manager
+        self.bg_color = bg_color
+        self.legend_cells = legend_cells
+        self.grid_rect = pygame.Rect(grid.x, grid.y, grid.width + 1, grid.height + 1)
+        self.scene = pygame.Surface(win.get_size()).convert()
+        self.cell_colors = terrain_cell_colors()
+        self.tiles = self.init_tiles()
+        self.ui_rects = []
+        self.heatmap_distances = None
+        self.heatmap = None
+        self.heatmap_view = None
+        self.redraw_everything()
+
+
+    def init_tiles(self) -> dict:
+
+        """Pre-renders one cell sized tile per cell state, non-wall tiles carry
+            their top and left grid lines so cells look divided and walls look connected,
+            tiles of weighted cells are keyed by (state, terrain cost) and rendered when first needed"""
+
+        gap = self.grid.gap
+        if Cell.point_a_img is not None and Cell.point_a_img.get_width() != gap:
+            Cell.scale_cell_imgs(gap, gap)
+
+        images = {START: Cell.point_a_img, END: Cell.point_b_img, PARCEL: Cell.point_parcel_img}
+        tiles = {}
+
+        for state in list(range(len(STATE_COLORS))) + list(images):
+            tile = pygame.Surface((gap, gap)).convert()
+            if state in images:
+                tile.fill(UNVISITED_COLOR)
+                if images[state] is not None:
+                    tile.blit(images[state], (0, 0))
+            else:
+                tile.fill(STATE_COLORS[state])
+            self.draw_tile_lines(tile, state)
+            tiles[state] = tile
+
+        self.tile_size = gap
+        return tiles
+
+
+    def draw_tile_lines(self, tile: pygame.Surface, state: int) -> None:
+        gap = tile.get_width()
+        if state != WALL and gap >= MIN_LINED_CELL_SIZE:
+            pygame.draw.line(tile, GREY, (0, 0), (gap, 0))
+            pygame.draw.line(tile, GREY, (0, 0), (0, gap))
+
+
+    def get_tile(self, state: int, cost: int) -> pygame.Surface:
+        if not cost or state == WALL or state >= START:
+            return self.tiles[state]
+
+        tile = self.tiles.get((state, cost))
+        if tile is None:
+            tile = self.tiles[state, cost] = pygame.Surface((self.tile_size, self.tile_size)).convert()
+            tile.fill(self.cell_colors[state, cost].tolist())
+            self.draw_tile_lines(tile, state)
+        return tile
+
+
+    def redraw_everything(self) -> None:
+
+        """Rebuilds the whole scene, next frame pushes the whole window to the display"""
+
+        self.scene.fill(self.bg_color)
+        self.draw_all_cells()
+
+        for legend_cell in self.legend_cells:
+            legend_cell.draw_legend_cell(self.scene)
+
+        self.full_update = True
+
+
+    def draw_all_cells(self) -> None:
+
+        """Draws every visible cell of the grid into the scene, cells are colored as one
+            NumPy image, so it costs the same for any map size"""
+
+        grid = self.grid
+        gap = grid.gap
+        if self.tile_size != gap:
+            self.tiles = self.init_tiles()
+
+        first_row, last_row, first_col, last_col = grid.visible_cells()
+        visible = grid.states[first_row:last_row, first_col:last_col]
+        terrain = grid.terrain[first_row:last_row, first_col:last_col]
+
+        pixels = self.cell_colors[visible, terrain].repeat(gap, axis=0).repeat(gap, axis=1)
+        if gap >= MIN_LINED_CELL_SIZE:
+            not_wall = visible != WALL
+            pixels[::gap][not_wall.repeat(gap, axis=1)] = GREY
+            pixels[:, ::gap][not_wall.repeat(gap, axis=0)] = GREY
+
+        self.scene.set_clip(self.grid_rect)
+        self.scene.fill(self.bg_color, self.grid_rect)
+        if pixels.size:
+            self.scene.blit(pygame.surfarray.make_surface(pixels.transpose(1, 0, 2)), grid.cell_screen_position(first_row, first_col))
+
+        # start, end and parcel images
+        for index in np.flatnonzero(visible >= START).tolist():
+            row, col = divmod(index, last_col - first_col)
+            self.scene.blit(self.tiles[visible[row, col]], grid.cell_screen_position(first_row + row, first_col + col))
+
+        # right and bottom border lines of the map
+        left, top = grid.cell_screen_position(0, 0)
+        right, bottom = grid.cell_screen_position(grid.total_rows, grid.total_columns)
+        pygame.draw.line(self.scene, GREY, (right, top), (right, bottom))
+        pygame.draw.line(self.scene, GREY, (left, bottom), (right, bottom))
+
+        self.scene.set_clip(None)
+        grid.draw_grid_frame(self.scene)
+
+        grid.dirty_cells.clear()
+        grid.all_dirty = False
+
+
+    def draw_dirty_cells(self) -> list[pygame.Rect]:
+
+        """Draws cells changed since the last frame into the scene and returns their rectangles"""
+
+        grid = self.grid
+
+        if grid.all_dirty or len(grid.dirty_cells) > MAX_DIRTY_RECTS or self.tile_size != grid.gap:
+            self.draw_all_cells()
+            return [self.grid_rect]
+
+        if not grid.dirty_cells:
+            return []
+
+        flat_states, flat_terrain, gap = grid.flat_states, grid.flat_terrain, grid.gap
+        first_row, last_row, first_col, last_col = grid.visible_cells()
+        rects = []
+
+        # top row of cells is overlapped by the grid frame, which has to stay on top
+        self.scene.set_clip(self.grid_rect.x, self.grid_rect.y + 1, self.grid_rect.width, self.grid_rect.height - 1)
+        for index in grid.dirty_cells:
+            row, col = divmod(index, grid.total_columns)
+            if first_row <= row < last_row and first_col <= col < last_col:
+                position = grid.cell_screen_position(row, col)
+                self.scene.blit(self.get_tile(flat_states[index], flat_terrain[index]), position)
+                rects.append(pygame.Rect(position, (gap, gap)).clip(self.grid_rect))
+        self.scene.set_clip(None)
+        grid.dirty_cells.clear()
+
+        return rects
+
+
+    def set_heatmap(self, distances: np.ndarray = None) -> None:
+
+        """Shows distances of cells (rows x columns, negative for unreachable cells) as a color
+            overlay from red (near) to blue (far) over the grid, None hides the overlay"""
+
+        self.full_update = True
+        self.heatmap_distances = distances
+        self.heatmap = None
+
+
+    def update_heatmap(self) -> None:
+
+        """Renders the heatmap of visible cells, again only if the view has changed"""
+
+        grid = self.grid
+        view = (grid.gap, grid.view_x, grid.view_y)
+        if self.heatmap is not None and self.heatmap_view == view:
+            return
+
+        distances = self.heatmap_distances
+        first_row, last_row, first_col, last_col = grid.visible_cells()
+        visible = distances[first_row:last_row, first_col:last_col]
+
+        scale = max(int(distances.max()), 1)
+        ratio = np.clip(visible, 0, None) / scale
+        colors = np.empty(visible.shape + (3,), dtype=np.uint8)
+        colors[..., 0] = 255 * (1 - ratio)
+        colors[..., 1] = 64
+        colors[..., 2] = 255 * ratio
+        colors[visible < 0] = HEATMAP_COLORKEY
+
+        pixels = colors.repeat(grid.gap, axis=0).repeat(grid.gap, axis=1)
+        heatmap = pygame.surfarray.make_surface(pixels.transpose(1, 0, 2)).convert()
+        heatmap.set_colorkey(HEATMAP_COLORKEY)
+        heatmap.set_alpha(HEATMAP_ALPHA)
+
+        self.heatmap = heatmap
+        self.heatmap_position = grid.cell_screen_position(first_row, first_col)
+        self.heatmap_view = view
+
+
+    def draw_heatmap(self, rects: list[pygame.Rect] = None) -> None:
+
+        """Draws the heatmap overlay to the window, only inside of given rectangles if any"""
+
+        if self.heatmap_distances is None:
+            return
+        self.update_heatmap()
+
+        for rect in [self.grid_rect] if rects is None else rects:
+            if rect.colliderect(self.grid_rect):
+                self.win.set_clip(rect.clip(self.grid_rect))
+                self.win.blit(self.heatmap, self.heatmap_position)
+        self.win.set_clip(None)
+
+
+    def get_ui_rects(self) -> list[pygame.Rect]:
+
+        """Returns screen rectangles currently covered by UI elements"""
+
+        root_container = self.ui_manager.get_root_container()
+        return [
+            sprite.rect.copy() for sprite in self.ui_manager.get_sprite_group().sprites()
+            if sprite is not root_container and sprite.visible and sprite.image is not None
+        ]
+
+
+    def draw_frame(self, cells: bool = True) -> None:
+
+        """Pushes changed cells and the UI to the display, only the UI without cells
+            (the grid may be getting changed by a job in a worker thread meanwhile)"""
+
+        rects = self.draw_dirty_cells() if cells else []
+        ui_rects = self.get_ui_rects()
+
+        if self.full_update:
+            self.win.blit(self.scene, (0, 0))
+            self.draw_heatmap()
+            self.ui_manager.draw_ui(self.win)
+            pygame.display.update()
+            self.full_update = False
+        else:
+            # UI from the previous frame is covered with the scene, so closed menus disappear
+            rects += self.ui_rects + ui_rects
+            for rect in rects:
+                self.win.blit(self.scene, rect, rect)
+            self.draw_heatmap(rects)
+            self.ui_manager.draw_ui(self.win)
+            pygame.display.update(rects)
+
+        self.ui_rects = ui_rects
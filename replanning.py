@@ -0,0 +1,252 @@
+from collections import OrderedDict, deque
+from weakref import WeakKeyDictionary
+from cell import Cell, WALL
+from grid import Grid
+from open_list import HeapOpenList
+from algo import Trace, astar, to_cells
+
+INF = float("inf")
+# diagonal steps cost sqrt(2), so sums of the same steps added in another order can differ in the last bits,
+# keys are rounded to this many decimals to keep such ties equal in the open list and in comparisons
+KEY_DECIMALS = 9
+
+# planners kept per grid, one per root cell (parcel legs and both drag directions fit in)
+MAX_PLANNERS = 4
+# endpoints of recent queries, a new planner is rooted at the one that keeps being queried
+ENDPOINT_HISTORY = 8
+
+_planners_by_grid = WeakKeyDictionary()
+
+
+class DStarLite:
+
+    """D* Lite planner rooted at one cell: it searches from the root towards the query cell
+        and keeps its g/rhs values between queries. Moving the query cell or toggling walls
+        only repairs the part of the search that has become inconsistent. Values are kept
+        only for cells the search has touched, every other cell has g and rhs of INF"""
+
+    def __init__(self, grid: Grid, root: int):
+        self.grid = grid
+        self.root = root
+        self.reset()
+
+
+    def reset(self) -> None:
+
+        """Throws away the search state, next query searches from scratch"""
+
+        self.g = {}
+        self.rhs = {self.root: 0}
+        self.km = 0
+        self.source = None
+        self.source_pos = None
+        self.heuristic = self.grid.default_heuristic()
+        self.walls_version = self.grid.walls_version
+        self.applied_edits = len(self.grid.wall_edits)
+        self.open_set = HeapOpenList()
+        self.open_set.push(self.root, self.calculate_key(self.root))
+
+
+    def calculate_key(self, index: int) -> tuple:
+        g_rhs = min(self.g.get(index, INF), self.rhs.get(index, INF))
+        if self.source_pos is None:
+            return round(g_rhs, KEY_DECIMALS), round(g_rhs, KEY_DECIMALS)
+        heuristic = self.heuristic(divmod(index, self.grid.total_columns), self.source_pos)
+        return round(g_rhs + heuristic + self.km, KEY_DECIMALS), round(g_rhs, KEY_DECIMALS)
+
+
+    def update_vertex(self, index: int) -> None:
+
+        """Recomputes rhs of the cell from its neighbors and requeues it if it's inconsistent"""
+
+        grid = self.grid
+        g, rhs = self.g, self.rhs
+
+        if index != self.root:
+            if grid.flat_states[index] == WALL:
+                rhs.pop(index, None)
+            else:
+                rhs[index] = min(
+                    (
+                        g.get(index + offset, INF) + grid.step_costs[direction]
+                        for offset, direction in grid.neighbor_steps[grid.adjacency[index]]
+                    ),
+                    default=INF,
+                )
+
+        if g.get(index, INF) != rhs.get(index, INF):
+            self.open_set.push(index, self.calculate_key(index))
+        else:
+            self.open_set.remove(index)
+
+
+    def move_source(self, source: int) -> None:
+
+        """Moves the query cell, keys already in the open list stay valid thanks to km"""
+
+        source_pos = divmod(source, self.grid.total_columns)
+        first_source = self.source_pos is None
+        if not first_source:
+            self.km += self.heuristic(self.source_pos, source_pos)
+        self.source = source
+        self.source_pos = source_pos
+
+        # keys queued before the first query were computed without the heuristic
+        if first_source:
+            for index in list(self.open_set.priority):
+                self.open_set.push(index, self.calculate_key(index))
+
+
+    def apply_wall_edits(self) -> None:
+
+        """Repairs the search around walls toggled since the last query,
+            starts over if the grid's adjacency has been rebuilt in the meantime"""
+
+        grid = self.grid
+        if grid.walls_version != self.walls_version or grid.flat_states[self.root] == WALL:
+            source = self.source
+            self.reset()
+            if source is not None:
+                self.move_source(source)
+            return
+
+        edits = grid.wall_edits[self.applied_edits:]
+        self.applied_edits = len(grid.wall_edits)
+
+        for index in dict.fromkeys(edits):
+            self.update_vertex(index)
+            for neighbor in grid.neighbor_indices(index):
+                self.update_vertex(neighbor)
+
+
+    def compute_shortest_path(self, trace: Trace = None) -> None:
+
+        """Expands inconsistent cells until the query cell is consistent and nothing cheaper is queued"""
+
+        grid, g, rhs = self.grid, self.g, self.rhs
+        open_set, source = self.open_set, self.source
+
+        while open_set and (open_set.peek()[0] < self.calculate_key(source) or rhs.get(source, INF) != g.get(source, INF)):
+            old_key, current = open_set.peek()
+            new_key = self.calculate_key(current)
+
+            if old_key < new_key:
+                open_set.push(current, new_key)
+                continue
+
+            open_set.pop()
+            if g.get(current, INF) > rhs.get(current, INF):
+                g[current] = rhs[current]
+            else:
+                g.pop(current)
+                self.update_vertex(current)
+
+            for neighbor in grid.neighbor_indices(current):
+                if trace is not None and neighbor not in open_set and neighbor not in g and neighbor != source:
+                    trace.open(neighbor)
+                self.update_vertex(neighbor)
+
+            if trace is not None:
+                if current != self.root and current != source:
+                    trace.visit(current)
+                trace.end_step()
+
+
+    def path_from(self, source: int, trace: Trace = None) -> list[int]:
+
+        """Returns cell indices of the shortest path from the source to the root
+            (without both of them) or None if there is no path"""
+
+        self.apply_wall_edits()
+        if source != self.source:
+            self.move_source(source)
+        self.compute_shortest_path(trace)
+
+        if source not in self.g:
+            return None
+        return self.descend(source)
+
+
+    def descend(self, source: int) -> list[int]:
+
+        """Follows the cheapest neighbors from the source down to the root and returns the cells
+            in between. Once the source is consistent every step lowers g, so the descent ends"""
+
+        g, grid = self.g, self.grid
+        path = []
+        current = source
+        while current != self.root:
+            offset, _ = min(
+                grid.neighbor_steps[grid.adjacency[current]],
+                key=lambda step: g.get(current + step[0], INF) + grid.step_costs[step[1]],
+            )
+            if not g.get(current + offset, INF) < g[current]:
+                raise RuntimeError(f"D* Lite values around cell {current} are inconsistent")
+            current += offset
+            path.append(current)
+
+        path.pop()
+        return path
+
+
+class PlannerCache:
+
+    """Recently used planners of one grid keyed by their root cell"""
+
+    def __init__(self):
+        self.planners = OrderedDict()
+        self.endpoints = deque(maxlen=ENDPOINT_HISTORY)
+
+
+    def query(self, grid: Grid, start: int, end: int, trace: Trace = None) -> list[int]:
+
+        """Returns path cell indices from start to end (without both of them) or None,
+            reusing a planner rooted at either endpoint, so dragging the other one is incremental"""
+
+        if end in self.planners:
+            path = self.get_planner(grid, end).path_from(start, trace)
+
+        elif start in self.planners:
+            path = self.get_planner(grid, start).path_from(end, trace)
+            if path is not None:
+                path.reverse()
+
+        else:
+            # the endpoint that has been queried before is most likely the one staying in place
+            root = start if start in self.endpoints and end not in self.endpoints else end
+            path = self.get_planner(grid, root).path_from(end if root == start else start, trace)
+            if path is not None and root == start:
+                path.reverse()
+
+        self.endpoints.extend((start, end))
+        return path
+
+
+    def get_planner(self, grid: Grid, root: int) -> DStarLite:
+        if root not in self.planners:
+            self.planners[root] = DStarLite(grid, root)
+            if len(self.planners) > MAX_PLANNERS:
+                self.planners.popitem(last=False)
+        self.planners.move_to_end(root)
+        return self.planners[root]
+
+
+def d_star_lite(
+    grid: Grid,
+    start: Cell,
+    end: Cell,
+    trace: Trace = None,
+) -> list[Cell]:
+
+    """D* Lite with search state kept between calls on the same grid: after endpoint moves
+        or wall edits only the affected part of the previous search is expanded again.
+        Planners only track walls, so weighted grids are searched by plain A*"""
+
+    if grid.is_weighted():
+        return astar(grid, start, end, trace)
+
+    planners = _planners_by_grid.setdefault(grid, PlannerCache())
+    path = planners.query(grid, start.index, end.index, trace)
+    if path is None:
+        return None
+    return to_cells(grid, path)
@@ -0,0 +1,51 @@
+from weakref import WeakKeyDictionary
+from grid import Grid
+from storage import zeroed_buffer
+
+# parent direction code of cells the path starts from
+NO_PARENT = 255
+MAX_GENERATION = 2**32 - 2
+
+_scratch_by_grid = WeakKeyDictionary()
+
+
+class SearchScratch:
+
+    """Flat per-cell buffers reused by all searches on one grid: costs (integer ones and real ones
+        for diagonal moves), parent direction codes and stamps. Instead of clearing the buffers before every search, touched cells
+        are stamped with the search generation and values of cells stamped by an older
+        search are treated as unset, so setup cost doesn't depend on grid size"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.stamps = zeroed_buffer(size, "I")
+        self.costs = zeroed_buffer(size, "i")
+        self.real_costs = zeroed_buffer(size, "d")
+        self.parents = zeroed_buffer(size)
+        self.generation = 0
+
+
+    def new_search(self) -> int:
+
+        """Starts a new search and returns its generation: cells stamped with it are reached,
+            cells stamped with generation + 1 are closed"""
+
+        self.generation += 2
+        if self.generation >= MAX_GENERATION:
+            self.stamps = zeroed_buffer(self.size, "I")
+            self.generation = 2
+        return self.generation
+
+
+def get_scratch(grid: Grid, slot: int = 0) -> SearchScratch:
+
+    """Returns scratch buffers of the grid, allocated on first use,
+        searches that need several independent buffers (bidirectional) use several slots"""
+
+    size = grid.total_rows * grid.total_columns
+    scratches = _scratch_by_grid.setdefault(grid, [])
+    while len(scratches) <= slot:
+        scratches.append(SearchScratch(size))
+    if scratches[slot].size != size:
+        scratches[slot] = SearchScratch(size)
+    return scratches[slot]
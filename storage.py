@@ -0,0 +1,23 @@
+import mmap
+from array import array
+
+# memory of zeroed buffers is handed out by the system in chunks of this many bytes
+CHUNK_SIZE = mmap.PAGESIZE
+
+
+def zeroed_buffer(length: int, typecode: str = "B"):
+
+    """Returns zero filled buffer of length items (typecode as in the array module) backed by
+        anonymous memory: a chunk is allocated only on the first write into it and untouched
+        chunks all share one zero page, so huge maps cost memory only where they are used.
+        Supports item access, slicing and the buffer protocol (NumPy views)"""
+
+    size = max(length, 1) * array(typecode).itemsize
+    if hasattr(mmap, "MAP_PRIVATE"):
+        # shared anonymous memory would get allocated on reads as well
+        memory = mmap.mmap(-1, size, flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+    else:
+        memory = mmap.mmap(-1, size)
+    if typecode == "B":
+        return memory
+    return memoryview(memory).cast(typecode)
@@ -0,0 +1,168 @@
+import os
+import sys
+import random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import algo
+import grid as grid_module
+import maps
+import replanning
+import components
+from cell import WALL, UNVISITED
+from grid import Grid, MAX_WEIGHT, FOUR_DIRECTIONS, NO_CORNER_CUTTING, CORNER_CUTTING
+from batch import path_cost
+
+ROWS, COLUMNS = 20, 24
+TRIALS = 60
+EDITS = 40
+
+
+def route_cost(grid: Grid, start: int, end: int, path: list) -> float:
+    if path is None:
+        return None
+    return path_cost(grid, [start] + [cell.index for cell in path] + [end])
+
+
+@pytest.mark.parametrize("movement", (FOUR_DIRECTIONS, NO_CORNER_CUTTING, CORNER_CUTTING))
+def test_incremental_replans_match_fresh_search(movement):
+
+    """Wall toggles and endpoint moves repaired by D* Lite give paths as cheap as a fresh Dijkstra's search"""
+
+    for seed in range(TRIALS):
+        rng = random.Random(seed)
+        grid = Grid(None, (ROWS, COLUMNS), (COLUMNS, ROWS), (0, 0))
+        grid.set_movement(movement)
+        for index in range(ROWS * COLUMNS):
+            if rng.random() < 0.25:
+                grid.flat_states[index] = WALL
+        grid.update_neighbors_for_every_cell()
+
+        free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL]
+        start, end = rng.sample(free, 2)
+        for _ in range(EDITS):
+            action = rng.random()
+            if action < 0.6:
+                index = rng.randrange(ROWS * COLUMNS)
+                if index not in (start, end):
+                    cell = grid.get_cell_by_index(index)
+                    cell.reset() if cell.is_wall() else cell.make_wall()
+            else:
+                free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL and index not in (start, end)]
+                if action < 0.8:
+                    start = rng.choice(free)
+                else:
+                    end = rng.choice(free)
+
+            start_cell, end_cell = grid.get_cell_by_index(start), grid.get_cell_by_index(end)
+            replanned = route_cost(grid, start, end, replanning.d_star_lite(grid, start_cell, end_cell))
+            fresh = route_cost(grid, start, end, algo.dijkstra(grid, start_cell, end_cell))
+            assert replanned == pytest.approx(fresh), f"seed {seed}"
+
+
+@pytest.mark.parametrize("movement", (FOUR_DIRECTIONS, CORNER_CUTTING))
+def test_weighted_replans_match_fresh_search(movement):
+
+    """Weight edits between queries give D* Lite paths as cheap as a fresh Dijkstra's search"""
+
+    for seed in range(TRIALS // 4):
+        rng = random.Random(seed)
+        grid = Grid(None, (ROWS, COLUMNS), (COLUMNS, ROWS), (0, 0))
+        grid.set_movement(movement)
+        for index in range(ROWS * COLUMNS):
+            if rng.random() < 0.2:
+                grid.flat_states[index] = WALL
+        grid.update_neighbors_for_every_cell()
+
+        free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL]
+        start, end = rng.sample(free, 2)
+        start_cell, end_cell = grid.get_cell_by_index(start), grid.get_cell_by_index(end)
+        for _ in range(EDITS // 4):
+            # a query before the weights, so cached planners meet the weighted grid
+            replanning.d_star_lite(grid, start_cell, end_cell)
+            for index in rng.sample(free, 30):
+                grid.set_weight(index, rng.randint(1, MAX_WEIGHT))
+
+            replanned = route_cost(grid, start, end, replanning.d_star_lite(grid, start_cell, end_cell))
+            fresh = route_cost(grid, start, end, algo.dijkstra(grid, start_cell, end_cell))
+            assert replanned == pytest.approx(fresh), f"seed {seed}"
+            grid.clear_weights()
+
+
+def random_grid(rng: random.Random, movement: int, weighted: bool) -> Grid:
+    grid = Grid(None, (ROWS, COLUMNS), (COLUMNS, ROWS), (0, 0))
+    grid.set_movement(movement)
+    for index in range(ROWS * COLUMNS):
+        if rng.random() < 0.25:
+            grid.flat_states[index] = WALL
+        elif weighted and rng.random() < 0.3:
+            grid.set_weight(index, rng.randint(1, MAX_WEIGHT))
+    grid.update_neighbors_for_every_cell()
+    return grid
+
+
+@pytest.mark.parametrize("movement", (FOUR_DIRECTIONS, NO_CORNER_CUTTING, CORNER_CUTTING))
+@pytest.mark.parametrize("weighted", (False, True))
+def test_jps_and_bidirectional_paths_cost_as_much_as_astar(movement, weighted):
+
+    """Jump point search and both bidirectional searches find paths as cheap as A*"""
+
+    for seed in range(TRIALS):
+        rng = random.Random(seed)
+        grid = random_grid(rng, movement, weighted)
+        free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL]
+        start, end = rng.sample(free, 2)
+        start_cell, end_cell = grid.get_cell_by_index(start), grid.get_cell_by_index(end)
+
+        expected = route_cost(grid, start, end, algo.astar(grid, start_cell, end_cell))
+        for search in (algo.jump_point_search, algo.bidirectional_astar, algo.bidirectional_dijkstra):
+            cost = route_cost(grid, start, end, search(grid, start_cell, end_cell))
+            assert cost == pytest.approx(expected), f"{search.__name__}, seed {seed}"
+
+
+def test_saved_map_loads_back(tmp_path):
+
+    """Walls, terrain and route points survive saving and loading a native map file"""
+
+    rng = random.Random(0)
+    grid = random_grid(rng, FOUR_DIRECTIONS, weighted=True)
+    free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL]
+    start, end, *parcels = rng.sample(free, 5)
+    path = str(tmp_path / ("saved" + maps.MAP_EXTENSION))
+    maps.save_map(path, grid, start, end, parcels)
+
+    loaded = Grid(None, (ROWS, COLUMNS), (COLUMNS, ROWS), (0, 0))
+    with maps.load_map(path) as map_file:
+        assert (map_file.start, map_file.end, map_file.parcels) == (start, end, parcels)
+        map_file.fill(loaded)
+
+    assert ((loaded.states == WALL) == (grid.states == WALL)).all()
+    assert (loaded.terrain == grid.terrain).all()
+    assert loaded.terrain_counts == grid.terrain_counts
+
+
+def test_components_follow_bulk_edits(monkeypatch):
+
+    """Reachability answered by the component index matches a search after bulk edits
+        and after single wall toggles (bands of a few rows, so components cross band borders)"""
+
+    monkeypatch.setattr(grid_module, "BAND_CELLS", 3 * COLUMNS)
+    for seed in range(TRIALS // 4):
+        rng = random.Random(seed)
+        grid = random_grid(rng, FOUR_DIRECTIONS, weighted=False)
+        components.get_components(grid)
+
+        for _ in range(EDITS // 4):
+            if rng.random() < 0.5:
+                with grid.bulk_edit():
+                    for index in rng.sample(range(ROWS * COLUMNS), 20):
+                        grid.flat_states[index] = WALL if grid.flat_states[index] != WALL else UNVISITED
+            else:
+                cell = grid.get_cell_by_index(rng.randrange(ROWS * COLUMNS))
+                cell.reset() if cell.is_wall() else cell.make_wall()
+
+            free = [index for index in range(ROWS * COLUMNS) if grid.flat_states[index] != WALL]
+            start, end = rng.sample(free, 2)
+            found = algo.bfs(grid, grid.get_cell_by_index(start), grid.get_cell_by_index(end)) is not None
+            assert components.reachable(grid, start, end) == found, f"seed {seed}"
@@ -0,0 +1,177 @@
+from itertools import combinations
+from cell import Cell
+from grid import Grid
+from algo import start_search, search_costs
+
+# leg cost between waypoints that can't reach each other
+UNREACHABLE = float("inf")
+# up to this many parcels the visiting order is exact, above it's nearest neighbor improved by 2-opt
+MAX_EXACT_PARCELS = 10
+
+
+def distances_to_targets(grid: Grid, source: int, targets: list[int]) -> list[float]:
+
+    """Returns costs of shortest paths from the source to every target, found by one Dijkstra
+        search stopped once all targets are settled, UNREACHABLE for targets it can't get to"""
+
+    adjacency, neighbor_steps = grid.adjacency, grid.neighbor_steps
+    terrain, move_costs = grid.flat_terrain, grid.move_costs
+
+    scratch, generation = start_search(grid, source)
+    distance, open_list_type = search_costs(grid, scratch)
+    stamps = scratch.stamps
+    closed = generation + 1
+
+    remaining = set(targets)
+    settled = {}
+    open_set = open_list_type()
+    open_set.push(source, 0)
+
+    while open_set and remaining:
+        current = open_set.pop()
+        stamps[current] = closed
+        current_distance = distance[current]
+        if current in remaining:
+            remaining.discard(current)
+            settled[current] = current_distance
+
+        for offset, direction in neighbor_steps[adjacency[current]]:
+            neighbor = current + offset
+            if stamps[neighbor] == closed:
+                continue
+            alt_distance = current_distance + move_costs[direction][terrain[neighbor]]
+            if stamps[neighbor] < generation or alt_distance < distance[neighbor]:
+                stamps[neighbor] = generation
+                distance[neighbor] = alt_distance
+                open_set.push(neighbor, alt_distance)
+
+    return [settled.get(target, UNREACHABLE) for target in targets]
+
+
+def distance_matrix(grid: Grid, waypoints: list[int]) -> list[list[float]]:
+
+    """Returns leg costs between waypoints (start first, end last) indexed [from][to],
+        one search per waypoint a leg can start from covers all legs going out of it,
+        legs that are never taken (into the start, out of the end) are UNREACHABLE"""
+
+    matrix = [[UNREACHABLE] * len(waypoints) for _ in waypoints]
+    targets = waypoints[1:]
+    for i, source in enumerate(waypoints[:-1]):
+        matrix[i][1:] = distances_to_targets(grid, source, targets)
+        matrix[i][i] = 0
+    return matrix
+
+
+def route_cost(matrix: list[list[float]], route: list[int]) -> float:
+    return sum(matrix[a][b] for a, b in zip(route, route[1:]))
+
+
+def exact_order(matrix: list[list[float]]) -> list[int]:
+
+    """Returns the cheapest route from the first to the last waypoint through all others,
+        dynamic programming over subsets of visited waypoints (Held-Karp)"""
+
+    stops = len(matrix) - 2
+    if stops == 0:
+        return [0, 1]
+    end = stops + 1
+
+    # best[subset][last]: cost of the cheapest route from the start through the subset ending at last
+    best = [[UNREACHABLE] * stops for _ in range(1 << stops)]
+    previous = [[-1] * stops for _ in range(1 << stops)]
+    for stop in range(stops):
+        best[1 << stop][stop] = matrix[0][stop + 1]
+
+    for subset in range(1, 1 << stops):
+        costs = best[subset]
+        for last in range(stops):
+            cost = costs[last]
+            if cost == UNREACHABLE or not subset & (1 << last):
+                continue
+            row = matrix[last + 1]
+            for stop in range(stops):
+                if subset & (1 << stop):
+                    continue
+                extended = subset | (1 << stop)
+                alt_cost = cost + row[stop + 1]
+                if alt_cost < best[extended][stop]:
+                    best[extended][stop] = alt_cost
+                    previous[extended][stop] = last
+
+    full = (1 << stops) - 1
+    last = min(range(stops), key=lambda stop: best[full][stop] + matrix[stop + 1][end])
+    route = [end]
+    subset = full
+    while last != -1:
+        route.append(last + 1)
+        subset, last = subset ^ (1 << last), previous[subset][last]
+    route.append(0)
+    route.reverse()
+    return route
+
+
+def nearest_neighbor_order(matrix: list[list[float]]) -> list[int]:
+
+    """Returns route from the first to the last waypoint always going to the closest unvisited waypoint"""
+
+    end = len(matrix) - 1
+    unvisited = set(range(1, end))
+    route = [0]
+    while unvisited:
+        row = matrix[route[-1]]
+        closest = min(unvisited, key=lambda stop: (row[stop], stop))
+        unvisited.remove(closest)
+        route.append(closest)
+    route.append(end)
+    return route
+
+
+def two_opt(matrix: list[list[float]], route: list[int]) -> list[int]:
+
+    """Improves the route by reversing parts of it while that makes it cheaper, the first and the last
+        waypoints stay in place. Costs may differ by direction (weights are paid on entering a cell),
+        so both directions of every part are summed up front"""
+
+    route = route[:]
+    improved = True
+    while improved:
+        improved = False
+        forward, backward = [0], [0]
+        for a, b in zip(route, route[1:]):
+            forward.append(forward[-1] + matrix[a][b])
+            backward.append(backward[-1] + matrix[b][a])
+
+        for i, j in combinations(range(1, len(route) - 1), 2):
+            before, first, last, after = route[i - 1], route[i], route[j], route[j + 1]
+            old_cost = matrix[before][first] + forward[j] - forward[i] + matrix[last][after]
+            new_cost = matrix[before][last] + backward[j] - backward[i] + matrix[first][after]
+            if new_cost < old_cost - 1e-9:
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+                break
+
+    return route
+
+
+def visiting_order(matrix: list[list[float]]) -> list[int]:
+
+    """Returns order of waypoints (indices into the matrix) from the start to the end
+        through all parcels with the lowest total cost, exact for few parcels"""
+
+    # unreachable legs are replaced with a cost higher than any route, so orders still compare
+    finite = [cost for row in matrix for cost in row if cost != UNREACHABLE]
+    penalty = sum(finite) + 1
+    matrix = [[penalty if cost == UNREACHABLE else cost for cost in row] for row in matrix]
+
+    if len(matrix) - 2 <= MAX_EXACT_PARCELS:
+        return exact_order(matrix)
+    return two_opt(matrix, nearest_neighbor_order(matrix))
+
+
+def plan_tour(grid: Grid, start: Cell, parcels: list[Cell], end: Cell) -> list[Cell]:
+
+    """Returns waypoints (start, every parcel, end) in the order they should be visited"""
+
+    waypoints = [start] + list(parcels) + [end]
+    matrix = distance_matrix(grid, [waypoint.index for waypoint in waypoints])
+    return [waypoints[i] for i in visiting_order(matrix)]
@@ -1,19 +1,3 @@
-import pygame
-
-
-def aborted() -> bool:
-
-    """Checks if function has been aborted"""
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                return True
-
-
 class Heuristic:
 
     """Class with basic heuristics"""
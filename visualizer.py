@@ -0,0 +1,174 @@
+import numpy as np
+from array import array
+from cell import OPEN, UNVISITED, PATH, START, END, PARCEL
+from grid import Grid
+from algo import Trace
+
+PATH_ANIMATION_SPEED = 100
+# cells keeping their state through the whole playback
+FIXED_STATES = (START, END, PARCEL)
+
+
+class Recording:
+
+    """Visualized run (exploration of every leg of the route and the path) as a flat array of cell indices
+        next to the state every event gives its cell (open, visited in the leg's color or path), 5 bytes
+        per event. Events are grouped into frames, one per expansion or path cell, so the run can be
+        replayed, stepped and scrubbed without running the search again"""
+
+    def __init__(self):
+        self.cells = array("I")
+        self.states = bytearray()
+        # end event of every frame
+        self.frame_ends = array("I")
+        # first frame of the path, cells left open are reset when it starts
+        self.path_frame = None
+
+
+    def add_trace(self, trace: Trace, visited_state: int) -> None:
+
+        """Appends exploration recorded by a search, expanded and scanned cells get the visited state"""
+
+        offset = len(self.cells)
+        codes = np.frombuffer(trace.codes, dtype=np.uint8)
+        self.cells.extend(trace.cells)
+        self.states.extend(np.where(codes == Trace.OPEN, OPEN, visited_state).astype(np.uint8).tobytes())
+
+        ends = np.frombuffer(trace.steps, dtype=np.uint32)
+        if len(trace) and (len(ends) == 0 or ends[-1] != len(trace)):
+            ends = np.append(ends, len(trace))
+        self.frame_ends.extend((ends + offset).astype(np.uint32).tolist())
+
+
+    def add_path(self, path: list[int]) -> None:
+
+        """Appends the path (flat indices), one cell per frame"""
+
+        self.path_frame = len(self.frame_ends)
+        for index in path:
+            self.cells.append(index)
+            self.states.append(PATH)
+            self.frame_ends.append(len(self.cells))
+
+
+    def frame_start(self, frame: int) -> int:
+        return self.frame_ends[frame - 1] if frame > 0 else 0
+
+
+    def apply(self, grid: Grid, first_frame: int, last_frame: int) -> None:
+
+        """Shows frames first_frame..last_frame - 1 on top of the grid showing the frames before them"""
+
+        if first_frame >= last_frame:
+            return
+        if self.path_frame is not None and first_frame <= self.path_frame < last_frame:
+            self.apply_events(grid, self.frame_start(first_frame), self.frame_start(self.path_frame))
+            reset_opened_cells(grid)
+            first_frame = self.path_frame
+        self.apply_events(grid, self.frame_start(first_frame), self.frame_start(last_frame))
+
+
+    def apply_events(self, grid: Grid, first: int, last: int) -> None:
+        if first >= last:
+            return
+        cells = np.frombuffer(self.cells, dtype=np.uint32)[first:last]
+        states = np.frombuffer(self.states, dtype=np.uint8)[first:last]
+
+        # only the last event of every cell counts (a cell opened and visited in the batch ends up visited)
+        last_events = len(cells) - 1 - np.unique(cells[::-1], return_index=True)[1]
+        cells, states = cells[last_events], states[last_events]
+
+        flat_states = grid.states.reshape(-1)
+        changed = ~np.isin(flat_states[cells], FIXED_STATES)
+        cells = cells[changed]
+        flat_states[cells] = states[changed]
+        grid.dirty_cells.update(cells.tolist())
+
+
+    def show(self, grid: Grid, frame: int) -> None:
+
+        """Shows the run as it was after the frames before the given one, from a grid cleared of visualization"""
+
+        grid.clear(start_end_except=True, barrier_except=True)
+        self.apply(grid, 0, frame)
+
+
+    def __len__(self):
+        return len(self.frame_ends)
+
+
+class Player:
+
+    """Plays the recording on the grid: exploration at the given speed (frames per second), the path
+        at PATH_ANIMATION_SPEED. Can be paused, stepped and scrubbed to any frame"""
+
+    def __init__(self, recording: Recording, grid: Grid, speed: int):
+        self.recording = recording
+        self.grid = grid
+        self.speed = speed
+        self.position = 0
+        self.paused = False
+        # part of a frame left over from the last advance
+        self.pending = 0.0
+
+
+    def advance(self, seconds: float) -> None:
+
+        """Shows frames due in the seconds passed since the last call"""
+
+        if self.paused or self.finished():
+            return
+        path_frame = self.recording.path_frame
+        speed = PATH_ANIMATION_SPEED if path_frame is not None and self.position >= path_frame else self.speed
+        self.pending += seconds * speed
+        frames = int(self.pending)
+        self.pending -= frames
+        self.seek(self.position + frames)
+
+
+    def seek(self, frame: int) -> None:
+
+        """Shows the run as it was after the frames before the given one"""
+
+        frame = min(max(frame, 0), len(self.recording))
+        if frame >= self.position:
+            self.recording.apply(self.grid, self.position, frame)
+        else:
+            self.recording.show(self.grid, frame)
+        self.position = frame
+
+
+    def step(self, frames: int) -> None:
+
+        """Pauses playback and moves it by the number of frames (back if negative)"""
+
+        self.paused = True
+        self.seek(self.position + frames)
+
+
+    def toggle_pause(self) -> None:
+
+        """Pauses or resumes playback, a finished one starts again"""
+
+        if self.finished():
+            self.seek(0)
+            self.paused = False
+        else:
+            self.paused = not self.paused
+
+
+    def finished(self) -> bool:
+        return self.position == len(self.recording)
+
+
+    def progress(self) -> float:
+        return self.position / len(self.recording) if len(self.recording) else 1.0
+
+
+def reset_opened_cells(grid: Grid) -> None:
+
+    """Resets open cells that are left after the animation"""
+
+    opened = np.flatnonzero(grid.states == OPEN)
+    grid.states.flat[opened] = UNVISITED
+    grid.dirty_cells.update(opened.tolist())